@@ -0,0 +1,284 @@
+"""
+End to end benchmark of tsccm commands against mock Tenable.SC hosts.
+
+Starts ``benchmarks/mock_server.py`` hosts in this process, runs every
+command as ``python -m tsccm ...`` in a fresh interpreter and reports
+median wall time, peak RSS of tsccm process and cost of its phases, as seen
+by mock hosts:
+
+- startup - from process start to first request (interpreter, imports,
+  credentials, first TLS handshake),
+- login - time hosts spent answering ``system`` and ``token`` (login and
+  logout) requests,
+- fetch - time hosts spent answering other requests (latency included),
+- client - everything else after first request (TLS, JSON parsing,
+  transform, render, logout and exit).
+
+login and fetch are measured as union of request intervals, so requests of
+many hosts processed at the same time are not counted twice.
+
+tsccm runs with null keyring backend and fresh cache directory, so
+benchmark neither touches OS Credential Manager nor reuses responses or
+sessions of previous runs. Options after ``--`` are passed to every tsccm
+command, e.g. ``-- --keep-session``.
+
+Usage:
+
+    python benchmarks/end_to_end.py [--hosts 10] [--port 8443] [--records 1000] [--latency 0.05]
+        [--parallel 1] [--runs 3] [--command "user --list"] [--output results.json]
+        [--baseline results.json] [-- tsccm options]
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import mock_server
+
+COMMANDS = [
+    "server --status",
+    "user --list",
+    "group --list",
+    "scan --list",
+    "scan-result --list",
+    "policy --list",
+    "credential --list",
+    "role --list",
+    "audit-file --list",
+    "asset --list",
+    "asset --overlap",
+    "repository --list",
+    "snapshot",
+]
+
+# commands which have their own --format or don't have it at all
+NO_FORMAT_COMMANDS = {"server", "snapshot"}
+
+PHASES = ["startup", "login", "fetch", "client"]
+
+LOGIN_ENDPOINTS = {"system", "token"}
+
+
+def union(intervals):
+    """total length of (start, end) intervals, overlaps counted once"""
+    total = 0
+    end = None
+    for start, finish in sorted(intervals):
+        if end is None or start > end:
+            total += finish - start
+            end = finish
+        elif finish > end:
+            total += finish - end
+            end = finish
+    return total
+
+
+def run(args, env, cwd):
+    """runs tsccm, returns its exit code, wall time, peak RSS and output size"""
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=stdout,
+            stderr=stderr,
+            env=env,
+            cwd=cwd,
+        )
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            finished = time.perf_counter()
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+            peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+            finished = time.perf_counter()
+            peak_rss = None
+
+        if process.returncode:
+            stderr.seek(0)
+            sys.stderr.write(stderr.read().decode(errors="replace")[-2000:])
+        return process.returncode, started, finished, peak_rss, stdout.tell()
+
+
+def measure(mock, command, addresses, args, extra):
+    """one run of tsccm command, returns its measurements"""
+    name = command.split()[0]
+    tsccm = [sys.executable, "-m", "tsccm", *shlex.split(command)]
+    for address in addresses:
+        tsccm += ["--address", address]
+    tsccm += ["--port", str(args.port), "-u", "benchmark", "-p", "benchmark", "-k"]
+    tsccm += ["--parallel", str(args.parallel)]
+    if name not in NO_FORMAT_COMMANDS:
+        tsccm += ["--format", args.format]
+
+    with tempfile.TemporaryDirectory() as directory:
+        if name == "snapshot":
+            tsccm += ["--output-dir", os.path.join(directory, "snapshot")]
+        env = dict(
+            os.environ,
+            PYTHON_KEYRING_BACKEND="keyring.backends.null.Keyring",
+            TSCCM_CACHE_DIR=os.path.join(directory, "cache"),
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        mock.requests_clear()
+        returncode, started, finished, peak_rss, output_size = run(
+            tsccm + extra, env, root
+        )
+        requests = mock.requests_clear()
+
+    if returncode:
+        raise SystemExit("FAIL: {} exited with {}".format(command, returncode))
+
+    intervals = [(r.started, r.finished) for r in requests]
+    first_request = min((r.started for r in requests), default=finished)
+    login = union(
+        (r.started, r.finished) for r in requests if r.endpoint in LOGIN_ENDPOINTS
+    )
+    fetch = union(
+        (r.started, r.finished) for r in requests if r.endpoint not in LOGIN_ENDPOINTS
+    )
+    startup = first_request - started
+    return {
+        "wall": finished - started,
+        "peak_rss": peak_rss,
+        "requests": len(requests),
+        "received": sum(r.size for r in requests),
+        "output": output_size,
+        "startup": startup,
+        "login": login,
+        "fetch": fetch,
+        "client": max(finished - started - startup - union(intervals), 0),
+    }
+
+
+def median(runs, key):
+    values = [run[key] for run in runs if run[key] is not None]
+    return statistics.median(values) if values else None
+
+
+def report(results, baseline):
+    header = "{:<20} {:>8} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+        "command",
+        "wall s",
+        "RSS MiB",
+        "startup",
+        "login",
+        "fetch",
+        "client",
+        "requests",
+        "vs base",
+    )
+    print(header)
+    print("-" * len(header))
+    for command, runs in results.items():
+        wall = median(runs, "wall")
+        peak_rss = median(runs, "peak_rss")
+        change = ""
+        if command in baseline:
+            base = median(baseline[command], "wall")
+            change = "{:+.0%}".format(wall / base - 1)
+        print(
+            "{:<20} {:>8.3f} {:>8} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9} {:>8}".format(
+                command,
+                wall,
+                "n/a" if peak_rss is None else "{:.1f}".format(peak_rss / 2**20),
+                *(median(runs, phase) for phase in PHASES),
+                median(runs, "requests"),
+                change,
+            )
+        )
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        extra = argv[argv.index("--") + 1 :]
+        argv = argv[: argv.index("--")]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=10, help="number of mock hosts")
+    parser.add_argument(
+        "--port", type=int, default=8443, help="port of every mock host"
+    )
+    parser.add_argument(
+        "--records", type=int, default=1000, help="records in every list response"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="up to that many random seconds added to latency",
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=1, help="tsccm --parallel value"
+    )
+    parser.add_argument(
+        "--format",
+        default="table",
+        choices=["table", "csv", "json", "ndjson"],
+        help="tsccm --format value",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="runs of every command")
+    parser.add_argument(
+        "--command",
+        action="append",
+        help="tsccm command to run, can be repeated (default: all list commands)",
+    )
+    parser.add_argument("--output", help="save measurements of every run as JSON")
+    parser.add_argument(
+        "--baseline", help="JSON saved by --output to compare wall time with"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    mock = mock_server.MockTenableSC(args.records, args.latency, args.jitter)
+    addresses = mock_server.hosts(args.hosts)
+    with tempfile.TemporaryDirectory() as directory:
+        mock.start(addresses, args.port, *mock_server.certificate(directory))
+
+    results = {}
+    try:
+        for command in args.command or COMMANDS:
+            results[command] = [
+                measure(mock, command, addresses, args, extra) for _ in range(args.runs)
+            ]
+    finally:
+        mock.stop()
+
+    print(
+        "{} hosts, {} records, {:.3f} s latency, --parallel {}, --format {}, "
+        "median of {} runs".format(
+            args.hosts,
+            args.records,
+            args.latency,
+            args.parallel,
+            args.format,
+            args.runs,
+        )
+    )
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
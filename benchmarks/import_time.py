@@ -0,0 +1,96 @@
+"""
+Import time benchmark of tsccm CLI.
+
+Runs ``python -X importtime -c "import tsccm.__main__"`` in a fresh
+interpreter and fails (exit code 1) if importing the CLI takes longer than
+the budget or if any of heavy dependencies is loaded at import time.
+
+Usage:
+
+    python benchmarks/import_time.py [--budget-ms 150] [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULE = "tsccm.__main__"
+
+# dependencies which have to be imported only on the code path which needs them
+LAZY_MODULES = [
+    "pandas",
+    "tabulate",
+    "keyring",
+    "tenable",
+    "oauthlib",
+    "requests",
+    "certstore",
+    "pyarrow",
+    "numpy",
+    "httpx",
+]
+
+
+def import_time(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+
+    cumulative_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imported.add(name.strip().split(".")[0])
+        # top level entries of tsccm package cover everything it imports
+        if name.startswith(" tsccm"):
+            cumulative_us += int(cumulative)
+
+    return cumulative_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=150,
+        help="maximum median import time of tsccm CLI in milliseconds",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="number of measurements")
+    args = parser.parse_args()
+
+    timings = []
+    imported = set()
+    for _ in range(args.runs):
+        timing, imported = import_time(MODULE)
+        timings.append(timing)
+
+    median = statistics.median(timings)
+    print(
+        "import {}: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms, budget {:.1f} ms".format(
+            MODULE, median, min(timings), max(timings), args.budget_ms
+        )
+    )
+
+    failed = False
+    eager = sorted(imported.intersection(LAZY_MODULES))
+    if eager:
+        print("FAIL: imported at startup: {}".format(", ".join(eager)))
+        failed = True
+    if median > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
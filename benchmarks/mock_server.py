@@ -0,0 +1,647 @@
+"""
+Mock Tenable.SC REST API for benchmarks.
+
+Serves synthetic responses of endpoints used by ``TscApi`` (``token`` login
+and logout, ``status``, ``system``, ``user``, ``group``, ``scan``,
+``scanResult``, ``policy``, ``credential``, ``role``, ``auditFile``,
+``asset``, ``repository``, vulndetails ``analysis``, ``plugin`` and ``scanResult/{id}/download``) over
+HTTPS with self-signed certificate, so tsccm has to be run with
+``--insecure``.
+
+Every simulated host listens on its own loopback address (127.0.0.1,
+127.0.0.2, ...) and the same port, as tsccm uses one ``--port`` for all
+addresses. Linux routes whole 127.0.0.0/8 to loopback, on macOS addresses
+other than 127.0.0.1 have to be added first, e.g.
+``sudo ifconfig lo0 alias 127.0.0.2``.
+
+Usage:
+
+    python benchmarks/mock_server.py [--hosts 1] [--port 8443] [--records 100] [--latency 0]
+        [--max-concurrent 4] [--error-rate 0.1] [--download-size 1048576]
+
+``--max-concurrent`` answers requests above that many at once per host with
+429, ``--error-rate`` answers that fraction of requests with 503, as
+overloaded Tenable.SC does. ``--download-size`` is size of ``.nessus`` file
+in zip archive of every scan result download, which honours ``Range``
+header. Every login gets its own token, requests of sessions ended by
+``MockTenableSC.sessions_expire()`` are answered with 401.
+"""
+
+import argparse
+import collections
+import functools
+import io
+import json
+import os
+import random
+import re
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# all synthetic times are relative to it, so responses are the same every run
+NOW = 1700000000
+
+# endpoints which return {"usable": [...], "manageable": [...]} instead of list
+USABLE_MANAGEABLE = {
+    "scan",
+    "scanResult",
+    "policy",
+    "credential",
+    "auditFile",
+    "asset",
+}
+
+ENDPOINTS = [
+    "status",
+    "system",
+    "user",
+    "group",
+    "scan",
+    "scanResult",
+    "policy",
+    "credential",
+    "role",
+    "auditFile",
+    "asset",
+    "repository",
+]
+
+DOWNLOAD = re.compile(r"scanResult/(\d+)/download")
+
+# one handled request, times are time.perf_counter() of server process
+Request = collections.namedtuple(
+    "Request", ["host", "method", "endpoint", "started", "finished", "size"]
+)
+
+
+def hosts(count):
+    """loopback addresses of simulated hosts"""
+    return ["127.0.{}.{}".format(i // 254, i % 254 + 1) for i in range(count)]
+
+
+def certificate(directory):
+    """self-signed certificate and key for 127.0.0.0/8, returns their paths"""
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+    except ImportError:
+        subprocess.run(
+            [
+                "openssl",
+                "req",
+                "-x509",
+                "-newkey",
+                "rsa:2048",
+                "-nodes",
+                "-days",
+                "1",
+                "-subj",
+                "/CN=tsccm-benchmark",
+                "-keyout",
+                key_path,
+                "-out",
+                cert_path,
+            ],
+            check=True,
+            capture_output=True,
+        )
+        return cert_path, key_path
+
+    import datetime
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "tsccm-benchmark")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(hours=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    return cert_path, key_path
+
+
+def record(endpoint, i):
+    """synthetic record number i of endpoint, with fields tsccm asks for"""
+    rng = random.Random("{}-{}".format(endpoint, i))
+    owner = {
+        "id": str(i % 7 + 1),
+        "username": "owner{}".format(i % 7 + 1),
+        "firstname": "",
+        "lastname": "",
+    }
+    data = {
+        "id": str(i),
+        "name": "{} {}".format(endpoint, i),
+        "description": "",
+        "createdTime": str(NOW - i * 3600),
+        "modifiedTime": str(NOW - i * 60),
+        "owner": owner,
+    }
+    if endpoint == "user":
+        data.update(
+            username="user{}".format(i),
+            firstname="First{}".format(i),
+            lastname="Last{}".format(i),
+            role={"id": "3", "name": "Security Manager", "description": ""},
+            # some users have never logged in
+            lastLogin=str(NOW - rng.randrange(86400 * 90)) if i % 10 else "0",
+            locked="false",
+            failedLogins=str(rng.randrange(3)),
+        )
+    elif endpoint == "group":
+        data.update(userCount=str(rng.randrange(50)))
+    elif endpoint == "scan":
+        data.update(
+            schedule={
+                "id": str(i),
+                "type": rng.choice(["ical", "template", "dependent", "now"]),
+                "enabled": rng.choice(["true", "false"]),
+                "repeatRule": "FREQ=WEEKLY;INTERVAL=1;BYDAY=MO",
+                "start": "TZID=Europe/Warsaw:20231101T220000",
+                "nextRun": NOW + rng.randrange(86400 * 7),
+            }
+        )
+    elif endpoint == "scanResult":
+        running = i % 20 == 0
+        start = NOW - i * 1800
+        data.update(
+            status="Running" if running else "Completed",
+            importStatus="No Results" if running else "Finished",
+            totalIPs=str(rng.randrange(1, 1024)),
+            scannedIPs=str(rng.randrange(1, 1024)),
+            startTime=str(start),
+            # running scan has no finishTime and no duration yet
+            finishTime="-1" if running else str(start + rng.randrange(60, 7200)),
+            scanDuration="-1" if running else str(rng.randrange(60, 7200)),
+        )
+    elif endpoint == "policy":
+        data.update(policyTemplate={"id": "1", "name": "Advanced Scan"})
+    elif endpoint == "credential":
+        data.update(
+            type=rng.choice(["windows", "ssh", "snmp"]),
+            typeFields={"authType": rng.choice(["password", "publicKey", "kerberos"])},
+        )
+    elif endpoint == "role":
+        data.update(organizationCounts=str(rng.randrange(5)))
+    elif endpoint == "auditFile":
+        data.update(
+            filename="audit{}.audit".format(i),
+            originalFilename="CIS_Benchmark_{}.audit".format(i),
+        )
+    elif endpoint == "asset":
+        # every fifth asset list is dynamic, defined by rules instead of IPs
+        static = i % 5 != 0
+        data.update(type="static" if static else "dynamic", typeFields={})
+        if static:
+            # networks of up to millions of addresses, overlapping next lists
+            data["typeFields"]["definedIPs"] = ",".join(
+                [
+                    "10.{}.0.0/{}".format(i % 256, 12 if i % 100 == 1 else 16),
+                    "192.168.{}.1-{}".format(i % 256, rng.randrange(2, 255)),
+                    "172.16.{}.{}".format(i % 16, i % 254 + 1),
+                ]
+                + (["2001:db8:{:x}::/64".format(i)] if i % 10 == 1 else [])
+            )
+    elif endpoint == "repository":
+        ipv6 = i % 4 == 0
+        data.update(
+            type="Local",
+            dataFormat="IPv6" if ipv6 else "IPv4",
+            typeFields={
+                "ipRange": (
+                    "2001:db8::/32"
+                    if ipv6
+                    else "10.{}.0.0/{},192.168.0.0/16".format(
+                        i % 16 * 16, rng.choice([8, 12])
+                    )
+                )
+            },
+        )
+    return data
+
+
+PLUGIN_FAMILIES = [
+    "Windows",
+    "Ubuntu Local Security Checks",
+    "Web Servers",
+    "General",
+    "Misc.",
+    "Databases",
+]
+
+
+def plugin(i):
+    """synthetic plugin number i, every next one modified a minute earlier"""
+    rng = random.Random("plugin-{}".format(i))
+    family = rng.randrange(len(PLUGIN_FAMILIES))
+    return {
+        "id": str(10000 + i),
+        "name": "{} {} {} vulnerability".format(
+            rng.choice(["Apache", "OpenSSL", "Microsoft", "Oracle", "nginx"]),
+            rng.randrange(1, 10),
+            rng.choice(["Remote Code Execution", "Denial of Service", "XSS"]),
+        ),
+        "family": {
+            "id": str(family),
+            "name": PLUGIN_FAMILIES[family],
+            "type": "active",
+        },
+        "type": "remote",
+        "riskFactor": rng.choice(["None", "Low", "Medium", "High", "Critical"]),
+        "pluginPubDate": str(NOW - i * 3600),
+        "pluginModDate": str(NOW - i * 60),
+        "modifiedTime": str(NOW - i * 60),
+    }
+
+
+def vuln(i):
+    """synthetic vulndetails analysis result number i"""
+    rng = random.Random("vuln-{}".format(i))
+    severity = rng.choice(["Info", "Low", "Medium", "High", "Critical"])
+    host = i // 50
+    return {
+        "pluginID": str(10000 + i % 5000),
+        "pluginName": "Plugin {}".format(i % 5000),
+        "severity": {"id": "0", "name": severity, "description": ""},
+        "ip": "10.{}.{}.{}".format(host // 65536 % 256, host // 256 % 256, host % 256),
+        "uuid": "",
+        "port": str(rng.choice([0, 22, 80, 443, 445, 3389])),
+        "protocol": "TCP",
+        "dnsName": "host{}.example.com".format(host),
+        "netbiosName": "EXAMPLE\\HOST{}".format(host),
+        "family": {"id": "1", "name": "General", "type": "active"},
+        "repository": {"id": "1", "name": "Repository", "dataFormat": "IPv4"},
+        "firstSeen": str(NOW - rng.randrange(86400 * 365)),
+        "lastSeen": str(NOW - rng.randrange(86400 * 7)),
+        "vprScore": "{:.1f}".format(rng.uniform(0, 10)),
+        "cvssV3BaseScore": "{:.1f}".format(rng.uniform(0, 10)),
+        "exploitAvailable": rng.choice(["Yes", "No"]),
+        "cve": "CVE-2023-{}".format(i % 50000),
+        "patchPubDate": rng.choice(["-1", str(NOW - rng.randrange(86400 * 365))]),
+        "hasBeenMitigated": "0",
+        "pluginText": "<plugin_output>{}</plugin_output>".format("x" * 200),
+    }
+
+
+class MockTenableSC:
+    """simulated Tenable.SC hosts sharing records count, latency and request log"""
+
+    def __init__(
+        self,
+        records=100,
+        latency=0,
+        jitter=0,
+        max_concurrent=None,
+        error_rate=0,
+        download_size=1024 * 1024,
+    ):
+        self.records = records
+        self.download_size = download_size
+        self.latency = latency
+        self.jitter = jitter
+        self.max_concurrent = max_concurrent
+        self.error_rate = error_rate
+        self.in_flight = collections.Counter()
+        self.requests = []
+        self.requests_lock = threading.Lock()
+        self.servers = []
+        # payloads of token requests, and tokens of sessions which ended
+        self.logins = []
+        self.expired = set()
+
+    def envelope(self, response, error_code=0, error_msg=""):
+        return json.dumps(
+            {
+                "type": "regular",
+                "response": response,
+                "error_code": error_code,
+                "error_msg": error_msg,
+                "warnings": [],
+                "timestamp": NOW,
+            }
+        ).encode()
+
+    @functools.lru_cache(maxsize=None)
+    def body(self, endpoint, fields=None, start_time=None, end_time=None):
+        # bodies are built once, so benchmark measures tsccm not this server
+        if endpoint == "status":
+            return self.envelope(
+                {"jobd": "Running", "licensedIPs": "100000", "activeIPs": "42000"}
+            )
+        if endpoint == "system":
+            return self.envelope({"version": "6.4.0", "buildID": "202401010000"})
+
+        records = (record(endpoint, i) for i in range(1, self.records + 1))
+        if start_time is not None:
+            records = (r for r in records if int(r["startTime"]) >= start_time)
+        if end_time is not None:
+            records = (r for r in records if int(r["startTime"]) <= end_time)
+        if fields:
+            # Tenable.SC always returns id
+            keep = set(fields.split(",")) | {"id"}
+            records = ({k: v for k, v in r.items() if k in keep} for r in records)
+        records = list(records)
+        if endpoint in USABLE_MANAGEABLE:
+            return self.envelope({"usable": records, "manageable": records})
+        return self.envelope(records)
+
+    @functools.lru_cache(maxsize=None)
+    def scan_result_file(self, scan_result_id):
+        """zip archive with .nessus file of scan result, as Tenable.SC sends it"""
+        rng = random.Random(scan_result_id)
+        lines = ['<?xml version="1.0" ?>\n<NessusClientData_v2>\n']
+        size = len(lines[0])
+        while size < self.download_size:
+            line = '<ReportItem port="{}" pluginID="{}">{:x}</ReportItem>\n'.format(
+                rng.randrange(65536), rng.randrange(10000, 200000), rng.getrandbits(128)
+            )
+            lines.append(line)
+            size += len(line)
+        lines.append("</NessusClientData_v2>\n")
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as f:
+            # fixed time, so every build of archive has the same bytes
+            info = zipfile.ZipInfo(
+                "{}.nessus".format(scan_result_id), (2023, 11, 14, 0, 0, 0)
+            )
+            f.writestr(info, "".join(lines), zipfile.ZIP_DEFLATED)
+        return archive.getvalue()
+
+    @functools.lru_cache(maxsize=None)
+    def plugins(self, since=None):
+        """plugins sorted by id, only those modified since given time if given"""
+        plugins = (plugin(i) for i in range(1, self.records + 1))
+        if since is not None:
+            plugins = (p for p in plugins if int(p["modifiedTime"]) >= since)
+        return list(plugins)
+
+    def overloaded(self, host, change):
+        """
+        changes requests in flight of host, returns 429 if there are too many,
+        503 for error_rate of requests, None otherwise
+        """
+        with self.requests_lock:
+            self.in_flight[host] += change
+            if change < 0:
+                return None
+            if self.max_concurrent and self.in_flight[host] > self.max_concurrent:
+                return 429
+        if random.random() < self.error_rate:
+            return 503
+        return None
+
+    def log(self, request):
+        with self.requests_lock:
+            self.requests.append(request)
+
+    def login(self, payload):
+        """token of new session"""
+        with self.requests_lock:
+            self.logins.append(payload)
+            return 1234567890 + len(self.logins)
+
+    def sessions_expire(self):
+        """end all sessions, their requests are answered with 401 as
+        Tenable.SC does after idle timeout"""
+        with self.requests_lock:
+            self.expired.update(
+                str(1234567890 + i) for i in range(1, len(self.logins) + 1)
+            )
+
+    def requests_clear(self):
+        with self.requests_lock:
+            requests, self.requests = self.requests, []
+        return requests
+
+    def start(self, addresses, port, cert_path, key_path):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        for address in addresses:
+            server = ThreadingHTTPServer((address, port), handler(self))
+            server.daemon_threads = True
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+
+def handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send(self, status, body, headers=(), content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for header in headers:
+                self.send_header(*header)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def handle_request(self):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            endpoint = url.path.rsplit("/rest/", 1)[-1].strip("/")
+            query = parse_qs(url.query)
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or "{}") if length else {}
+
+            host = self.server.server_address[0]
+            overloaded = mock.overloaded(host, 1)
+            try:
+                delay = mock.latency + random.uniform(0, mock.jitter)
+                if delay:
+                    time.sleep(delay)
+                if overloaded:
+                    body = mock.envelope({}, overloaded, "Server overloaded")
+                    self.send(overloaded, body)
+                elif self.headers.get("X-SecurityCenter") in mock.expired and not (
+                    endpoint == "token" and self.command == "POST"
+                ):
+                    body = mock.envelope({}, 74, "Invalid token")
+                    self.send(401, body)
+                else:
+                    body = self.respond(endpoint, query, payload)
+            finally:
+                mock.overloaded(host, -1)
+            mock.log(
+                Request(
+                    host,
+                    self.command,
+                    endpoint,
+                    started,
+                    time.perf_counter(),
+                    len(body),
+                )
+            )
+
+        def respond(self, endpoint, query, payload):
+            headers = ()
+            content_type = "application/json"
+            download = DOWNLOAD.fullmatch(endpoint)
+            if download and self.command == "POST":
+                body = mock.scan_result_file(int(download.group(1)))
+                total = len(body)
+                status = 200
+                content_type = "application/zip"
+                ranged = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if ranged and int(ranged.group(1)) < total:
+                    start = int(ranged.group(1))
+                    body = body[start:]
+                    status = 206
+                    headers = [
+                        (
+                            "Content-Range",
+                            "bytes {}-{}/{}".format(start, total - 1, total),
+                        )
+                    ]
+            elif endpoint == "token" and self.command == "POST":
+                body = mock.envelope(
+                    {"token": mock.login(payload), "unassociatedCert": "false"}
+                )
+                headers = [("Set-Cookie", "TNS_SESSIONID={}; path=/".format("0" * 32))]
+                status = 200
+            elif endpoint == "token" and self.command == "DELETE":
+                body = mock.envelope({})
+                status = 200
+            elif endpoint == "analysis" and self.command == "POST":
+                # every analysis query returns the same records vulnerabilities
+                start = int(payload["query"]["startOffset"])
+                end = min(int(payload["query"]["endOffset"]), mock.records)
+                results = [vuln(i) for i in range(start, end)]
+                body = mock.envelope(
+                    {
+                        "totalRecords": str(mock.records),
+                        "returnedRecords": len(results),
+                        "startOffset": str(start),
+                        "endOffset": str(end),
+                        "results": results,
+                    }
+                )
+                status = 200
+            elif endpoint == "plugin" and self.command == "GET":
+                start = int(query.get("startOffset", ["0"])[0])
+                end = int(query.get("endOffset", ["50"])[0])
+                since = query.get("since", [None])[0]
+                plugins = mock.plugins(int(since) if since is not None else None)
+                body = mock.envelope(plugins[start:end])
+                status = 200
+            elif endpoint in ENDPOINTS and self.command == "GET":
+                start_time = query.get("startTime", [None])[0]
+                end_time = query.get("endTime", [None])[0]
+                body = mock.body(
+                    endpoint,
+                    query.get("fields", [None])[0],
+                    int(start_time) if start_time is not None else None,
+                    int(end_time) if end_time is not None else None,
+                )
+                status = 200
+            else:
+                body = mock.envelope(
+                    {}, 146, "Invalid parameters specified: {}".format(self.path)
+                )
+                status = 404
+
+            self.send(status, body, headers, content_type)
+            return body
+
+        do_GET = do_POST = do_PATCH = do_DELETE = handle_request
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=1, help="number of hosts")
+    parser.add_argument("--port", type=int, default=8443, help="port of every host")
+    parser.add_argument(
+        "--records", type=int, default=100, help="records in every list response"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="up to that many random seconds added to latency",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=None,
+        help="requests per host above which are answered with 429",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="fraction of requests answered with 503",
+    )
+    parser.add_argument(
+        "--download-size",
+        type=int,
+        default=1024 * 1024,
+        help="bytes of .nessus file of every scan result download",
+    )
+    args = parser.parse_args()
+
+    mock = MockTenableSC(
+        args.records,
+        args.latency,
+        args.jitter,
+        args.max_concurrent,
+        args.error_rate,
+        args.download_size,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        addresses = hosts(args.hosts)
+        mock.start(addresses, args.port, *certificate(directory))
+    print(
+        "serving {} on port {}, Ctrl+C to stop".format(" ".join(addresses), args.port),
+        file=sys.stderr,
+    )
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
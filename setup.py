@@ -21,6 +21,7 @@ setuptools.setup(
     url="https://github.com/LimberDuck/tsccm",
     packages=setuptools.find_packages(),
     install_requires=required,
+    extras_require={"parquet": ["pyarrow>=14.0.0"], "async": ["httpx>=0.25.0"]},
     entry_points={"console_scripts": ["tsccm = tsccm.__main__:main"]},
     classifiers=[
         "Programming Language :: Python :: 3.13",
@@ -0,0 +1,29 @@
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def certificate(tmp_path_factory):
+    from mock_server import certificate
+
+    return certificate(str(tmp_path_factory.mktemp("certificate")))
+
+
+@pytest.fixture
+def mock(certificate):
+    """MockTenableSC on 127.0.0.1 with 100 records, its port is mock.port"""
+    from mock_server import MockTenableSC
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    mock = MockTenableSC(records=100)
+    mock.start(["127.0.0.1"], port, *certificate)
+    mock.port = port
+    yield mock
+    mock.stop()
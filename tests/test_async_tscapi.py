@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import httpx  # noqa: E402
+
+from tsccm.modules.tscapi import (  # noqa: E402
+    AsyncApiError,
+    AsyncEngine,
+    AsyncTscApi,
+    TscApi,
+    async_json,
+)
+
+
+def requests_of(mock):
+    return [(request.method, request.endpoint) for request in mock.requests_clear()]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_login_and_logout(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True)
+        await sccon.login("admin", "secret")
+        users = await sccon.user_get()
+        await sccon.logout()
+        return sccon, users
+
+    sccon, users = run(main())
+    assert len(users["response"]) == 100
+    assert requests_of(mock) == [
+        ("POST", "token"),
+        ("GET", "user"),
+        ("DELETE", "token"),
+    ]
+    # the same login as pyTenable, other sessions of user stay open
+    assert mock.logins == [{"username": "admin", "password": "secret"}]
+    assert sccon.client is None
+    assert not sccon.logged_in
+
+
+def test_api_keys_have_no_session(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True)
+        await sccon.login(access_key="access", secret_key="secret")
+        await sccon.status_get()
+        await sccon.logout()
+
+    run(main())
+    assert requests_of(mock) == [("GET", "status")]
+
+
+def test_relogin_when_session_ends(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True, relogin=True)
+        await sccon.login("admin", "secret")
+        await sccon.role_get()
+        mock.sessions_expire()
+        roles = await sccon.role_get()
+        await sccon.logout()
+        return sccon, roles
+
+    sccon, roles = run(main())
+    assert len(roles["response"]) == 100
+    assert sccon.logins == 2
+    assert requests_of(mock) == [
+        ("POST", "token"),
+        ("GET", "role"),
+        ("GET", "role"),
+        ("POST", "token"),
+        ("GET", "role"),
+        ("DELETE", "token"),
+    ]
+
+
+def test_ended_session_without_relogin_fails(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True)
+        await sccon.login("admin", "secret")
+        mock.sessions_expire()
+        try:
+            await sccon.role_get()
+        finally:
+            await sccon.client.aclose()
+
+    with pytest.raises(AsyncApiError) as error:
+        run(main())
+    assert error.value.code == 401
+
+
+def test_pages(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True)
+        await sccon.login("admin", "secret")
+        analysis = [
+            len(page) async for page in sccon.analysis_pages(page_size=30, parallel=2)
+        ]
+        limited = [
+            len(page)
+            async for page in sccon.analysis_pages(page_size=30, start=10, end=75)
+        ]
+        plugins = [
+            [plugin["id"] for plugin in page]
+            async for page in sccon.plugin_pages(page_size=40, parallel=2)
+        ]
+        windows = [
+            scan_result["id"]
+            async for scan_result in sccon.scan_results_windows(
+                1700000000 - 100 * 1800, 1700000000, 7200, parallel=3
+            )
+        ]
+        await sccon.logout()
+        return analysis, limited, plugins, windows
+
+    analysis, limited, plugins, windows = run(main())
+    assert analysis == [30, 30, 30, 10]
+    assert limited == [30, 30, 5]
+    assert [len(page) for page in plugins] == [40, 40, 20]
+    assert plugins[0][0] == "10001" and plugins[-1][-1] == "10100"
+    # windows of 4 scan results, oldest first, ids in order within window
+    assert windows == [
+        str(i) for first in range(97, 0, -4) for i in range(first, first + 4)
+    ]
+
+
+def test_same_responses_as_tscapi(mock):
+    async def main():
+        sccon = AsyncTscApi("127.0.0.1", mock.port, insecure=True)
+        await sccon.login("admin", "secret")
+        responses = [
+            await sccon.scan_results_get(fields=["id", "status"]),
+            await sccon.credential_get(),
+            await sccon.plugin_get(0, 10, since=1700000000 - 300),
+            await sccon.analysis_get(0, 5),
+        ]
+        await sccon.logout()
+        return responses
+
+    sccon = TscApi("127.0.0.1", mock.port, insecure=True)
+    sccon.login("admin", "secret")
+    expected = [
+        sccon.scan_results_get(fields=["id", "status"]),
+        sccon.credential_get(),
+        sccon.plugin_get(0, 10, since=1700000000 - 300),
+        sccon.analysis_get(0, 5),
+    ]
+    sccon.logout()
+    assert run(main()) == expected
+
+
+def test_engine_runs_clients_for_threads(mock):
+    engine = AsyncEngine(insecure=True)
+    try:
+        sccon = engine.tscapi("127.0.0.1", mock.port)
+        sccon.login("admin", "secret")
+        assert sccon.logged_in
+        assert len(sccon.group_get()["response"]) == 100
+        pages = [len(page) for page in sccon.analysis_pages(page_size=60)]
+        sccon.logout()
+    finally:
+        engine.close()
+    assert pages == [60, 40]
+    assert requests_of(mock)[-1] == ("DELETE", "token")
+
+
+def test_error_code_of_success_response_is_error():
+    request = httpx.Request("GET", "https://127.0.0.1/rest/user")
+    response = httpx.Response(
+        200,
+        json={"response": "", "error_code": 146, "error_msg": "Invalid parameters"},
+        request=request,
+    )
+    with pytest.raises(AsyncApiError, match="Invalid parameters"):
+        async_json(response)
+
+    response = httpx.Response(
+        200, json={"response": [], "error_code": 0}, request=request
+    )
+    assert async_json(response) == {"response": [], "error_code": 0}
@@ -0,0 +1,223 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+import tsccm.__main__ as main
+
+
+class Keyring:
+    """OS Credential Manager which remembers what is saved in it"""
+
+    def __init__(self):
+        self.saved = {}
+
+    def get_password(self, address, username):
+        return self.saved.get((address, username))
+
+    def set_password(self, address, username, password):
+        self.saved[address, username] = password
+
+
+@pytest.fixture
+def keyring(monkeypatch):
+    keyring = Keyring()
+    monkeypatch.setattr(main, "vault", lambda: keyring)
+    main.vault_get.cache_clear()
+    main.credential_resolver.cache_clear()
+    yield keyring
+    main.vault_get.cache_clear()
+    main.credential_resolver.cache_clear()
+
+
+@pytest.fixture
+def tsccm(mock, keyring, tmp_path, monkeypatch):
+    """runs tsccm command against mock, returns its result"""
+    monkeypatch.setenv("TSCCM_CACHE_DIR", str(tmp_path / "cache"))
+    for name in ("TSCCM_PASSWORD", "TSCCM_SECRET_KEY", "TSCCM_ACCESS_KEY"):
+        monkeypatch.delenv(name, raising=False)
+
+    def tsccm(*args, env=None):
+        return CliRunner().invoke(
+            main.cli,
+            [*args, "-u", "tester", "--port", str(mock.port), "-k"],
+            env=env,
+            catch_exceptions=False,
+        )
+
+    return tsccm
+
+
+def test_secret_key_from_environment_is_not_saved(tsccm, keyring):
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "127.0.0.1",
+        env={"TSCCM_ACCESS_KEY": "access", "TSCCM_SECRET_KEY": "secret"},
+    )
+
+    assert result.exit_code == 0, result.output
+    assert keyring.saved == {}
+
+
+def test_given_secret_key_is_saved(tsccm, keyring):
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "127.0.0.1",
+        "--access-key",
+        "access",
+        "--secret-key",
+        "secret",
+    )
+
+    assert result.exit_code == 0, result.output
+    assert keyring.saved == {("127.0.0.1", "access"): "secret"}
+
+
+@pytest.mark.parametrize("parallel", ["1", "2"])
+def test_json_of_all_addresses_is_one_document(tsccm, parallel):
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "127.0.0.1",
+        "-a",
+        "127.0.0.1",
+        "-p",
+        "password",
+        "-f",
+        "json",
+        "--parallel",
+        parallel,
+    )
+
+    assert result.exit_code == 0, result.output
+    rows = json.loads(result.stdout)
+    assert len(rows) == 2 * 100
+    assert {row["address"] for row in rows} == {"127.0.0.1"}
+
+
+def test_json_written_to_output_is_one_document(tsccm, tmp_path):
+    output = tmp_path / "repositories.json"
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "127.0.0.1",
+        "-p",
+        "password",
+        "-f",
+        "json",
+        "-o",
+        str(output),
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(json.loads(output.read_text())) == 100
+
+
+def test_json_without_rows_is_empty_array(tsccm):
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "127.0.0.1",
+        "-p",
+        "password",
+        "-f",
+        "json",
+        "--limit",
+        "0",
+    )
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.stdout) == []
+
+
+def test_failure_of_address_is_not_part_of_json(tsccm):
+    # address which isn't valid in URL fails before any request
+    result = tsccm(
+        "repository",
+        "--list",
+        "-a",
+        "[::9",
+        "-a",
+        "127.0.0.1",
+        "-p",
+        "password",
+        "-f",
+        "json",
+        "--parallel",
+        "2",
+    )
+
+    assert len(json.loads(result.stdout)) == 100
+    assert "[::9" in result.stderr
+
+
+@pytest.mark.parametrize("format", ["table", "csv"])
+def test_analysis_rows_are_numbered_from_offset(tsccm, format):
+    result = tsccm(
+        "analysis",
+        "-a",
+        "127.0.0.1",
+        "-p",
+        "password",
+        "-f",
+        format,
+        "--offset",
+        "10",
+        "--limit",
+        "5",
+    )
+
+    assert result.exit_code == 0, result.output
+    lines = result.stdout.splitlines()[2:7]
+    separator = None if format == "table" else ","
+    assert [line.split(separator)[0] for line in lines] == [
+        "11",
+        "12",
+        "13",
+        "14",
+        "15",
+    ]
+
+
+class Connection:
+    def __init__(self):
+        self.logged_out = False
+
+    def logout(self):
+        self.logged_out = True
+
+
+@pytest.mark.parametrize("parallel", [1, 2])
+def test_unexpected_failure_of_address_keeps_output_of_others(parallel, capsys):
+    connections = {}
+
+    def connect(one_address):
+        connections[one_address] = Connection()
+        return connections[one_address]
+
+    def task(sccon, one_address, out):
+        print(one_address, "first", file=out)
+        if one_address == "10.0.0.1":
+            raise KeyError("response")
+        print(one_address, "last", file=out)
+
+    def run(one_address, out):
+        return main.run_on_address(one_address, connect, task, out)
+
+    results = main.run_all(run, ["10.0.0.1", "10.0.0.2"], parallel)
+
+    assert results == [False, True]
+    assert capsys.readouterr().out.splitlines() == [
+        "10.0.0.1 first",
+        "Tenable.sc API via 10.0.0.1 failed: KeyError: 'response'",
+        "10.0.0.2 first",
+        "10.0.0.2 last",
+    ]
+    assert all(sccon.logged_out for sccon in connections.values())
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from tsccm.modules.credentials import (
+    CommandProvider,
+    CredentialResolver,
+    EnvironmentProvider,
+    FileProvider,
+    environment_name,
+)
+
+
+def test_environment_name_of_address():
+    assert environment_name("TSCCM_PASSWORD", "192.168.1.10") == (
+        "TSCCM_PASSWORD_192_168_1_10"
+    )
+    assert environment_name("TSCCM_PASSWORD", "sc.example.com") == (
+        "TSCCM_PASSWORD_SC_EXAMPLE_COM"
+    )
+
+
+def test_environment_of_address_before_common_one(monkeypatch):
+    monkeypatch.setenv("TSCCM_PASSWORD", "common")
+    monkeypatch.setenv("TSCCM_PASSWORD_10_0_0_1", "own")
+    provider = EnvironmentProvider()
+    assert provider("10.0.0.1", "admin") == "own"
+    assert provider("10.0.0.2", "admin") == "common"
+
+
+@pytest.fixture
+def netrc_file(tmp_path):
+    path = tmp_path / "netrc"
+    path.write_text(
+        "machine 10.0.0.1 login admin password secret1\n"
+        "machine 10.0.0.2 login other password secret2\n"
+    )
+    path.chmod(0o600)
+    return str(path)
+
+
+def test_file_provider_matches_address_and_login(netrc_file):
+    provider = FileProvider(netrc_file)
+    assert provider("10.0.0.1", "admin") == "secret1"
+    assert provider("10.0.0.2", "admin") is None
+    assert provider("10.0.0.3", "admin") is None
+
+
+@pytest.mark.skipif(os.name != "posix", reason="permissions of POSIX")
+def test_file_provider_refuses_file_of_other_users(netrc_file):
+    os.chmod(netrc_file, 0o644)
+    with pytest.raises(ValueError, match="chmod 600"):
+        FileProvider(netrc_file)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX shell")
+def test_command_provider_gets_address_and_username():
+    provider = CommandProvider('echo "$TSCCM_USERNAME@$TSCCM_ADDRESS"; echo second')
+    assert provider("10.0.0.1", "admin") == "admin@10.0.0.1"
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX shell")
+def test_command_provider_failure():
+    with pytest.raises(ValueError, match="failed for 10.0.0.1"):
+        CommandProvider("echo nope >&2; exit 3")("10.0.0.1", "admin")
+
+
+def test_resolver_uses_first_provider_which_has_secret():
+    calls = []
+
+    def provider(name, secrets):
+        def lookup(address, username):
+            calls.append((name, address))
+            return secrets.get(address)
+
+        return name, lookup
+
+    resolver = CredentialResolver(
+        [
+            provider("first", {"10.0.0.1": "one"}),
+            provider("second", {"10.0.0.1": "ignored", "10.0.0.2": "two"}),
+        ]
+    )
+    found = resolver.resolve(["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.1"], "admin")
+    assert found == {
+        "10.0.0.1": ("one", "first"),
+        "10.0.0.2": ("two", "second"),
+        "10.0.0.3": (None, None),
+    }
+    assert sorted(calls) == [
+        ("first", "10.0.0.1"),
+        ("first", "10.0.0.2"),
+        ("first", "10.0.0.3"),
+        ("second", "10.0.0.2"),
+        ("second", "10.0.0.3"),
+    ]
+
+    # every address and username is looked up once
+    resolver.resolve(["10.0.0.1", "10.0.0.3"], "admin")
+    assert len(calls) == 5
+
+
+def test_resolver_without_addresses():
+    assert CredentialResolver([]).resolve([], "admin") == {}
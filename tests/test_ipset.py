@@ -0,0 +1,136 @@
+import ipaddress
+import itertools
+import random
+
+import pytest
+
+from tsccm.modules.ipset import (
+    IPV6_OFFSET,
+    IPSet,
+    interval_parse,
+    interval_text,
+    overlaps,
+)
+
+
+def test_interval_parse_address_network_and_ranges():
+    assert interval_parse("10.0.0.1") == (167772161, 167772161)
+    assert interval_parse("10.0.0.0/24") == (167772160, 167772415)
+    assert interval_parse("10.0.0.5/24") == (167772160, 167772415)
+    assert interval_parse("10.0.0.1-10.0.0.50") == (167772161, 167772210)
+    assert interval_parse("10.0.0.1-50") == (167772161, 167772210)
+
+
+def test_interval_parse_ipv6_after_all_ipv4():
+    first, last = interval_parse("::/127")
+    assert (first, last) == (IPV6_OFFSET, IPV6_OFFSET + 1)
+    assert interval_parse("255.255.255.255")[1] < first
+
+
+@pytest.mark.parametrize(
+    "text", ["10.0.0.9-10.0.0.1", "10.0.0.1-::1", "10.0.0.300", "foo"]
+)
+def test_interval_parse_invalid(text):
+    with pytest.raises(ValueError):
+        interval_parse(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["10.0.0.1", "10.0.0.0/24", "10.0.0.1-10.0.0.50", "2001:db8::/64", "::1-::3"],
+)
+def test_interval_text_round_trip(text):
+    assert interval_text(*interval_parse(text)) == text
+
+
+def test_interval_text_unaligned_power_of_two_is_range():
+    assert interval_text(*interval_parse("10.0.0.1-10.0.0.4")) == "10.0.0.1-10.0.0.4"
+
+
+def test_parse_merges_overlapping_and_adjacent():
+    ip_set = IPSet.parse("10.0.0.0/25, 10.0.0.128-255\n10.0.0.7 10.0.1.0/24")
+    assert str(ip_set) == "10.0.0.0/23"
+    assert ip_set.count == 512
+
+
+def test_last_ipv4_and_first_ipv6_are_not_merged():
+    ip_set = IPSet.parse("255.255.255.255,::")
+    assert [*ip_set.intervals()] == [
+        (IPV6_OFFSET - 1, IPV6_OFFSET - 1),
+        (IPV6_OFFSET, IPV6_OFFSET),
+    ]
+
+
+def test_empty():
+    assert not IPSet.parse("")
+    assert not IPSet.parse(None)
+    assert IPSet.parse("").count == 0
+    assert str(IPSet()) == ""
+
+
+def test_count_of_ipv6_network_is_exact():
+    assert IPSet.parse("2001:db8::/32").count == 2**96
+
+
+def test_contains():
+    ip_set = IPSet.parse("10.0.0.0/24,192.168.1.1-192.168.1.9,2001:db8::/64")
+    assert "10.0.0.255" in ip_set
+    assert "10.0.1.0" not in ip_set
+    assert "192.168.1.9" in ip_set
+    assert "192.168.1.10" not in ip_set
+    assert "2001:db8::ffff" in ip_set
+    assert "9.255.255.255" not in ip_set
+    assert interval_parse("10.0.0.1")[0] in ip_set
+
+
+def test_intersection_and_union():
+    a = IPSet.parse("10.0.0.0/24,10.0.2.0/24")
+    b = IPSet.parse("10.0.0.128-10.0.2.10")
+    assert str(a & b) == "10.0.0.128/25,10.0.2.0-10.0.2.10"
+    assert str(a | b) == "10.0.0.0-10.0.2.255"
+    assert a.overlaps(b)
+    assert not a.overlaps(IPSet.parse("10.0.1.0/24"))
+    assert a & b <= a
+    assert not a <= b
+
+
+def test_equality():
+    assert IPSet.parse("10.0.0.0/31") == IPSet.parse("10.0.0.1,10.0.0.0")
+    assert IPSet.parse("10.0.0.0/31") != IPSet.parse("10.0.0.0")
+
+
+def test_overlaps_counts_common_addresses_of_pairs():
+    ip_sets = [
+        IPSet.parse("10.0.0.0/24"),
+        IPSet.parse("10.0.0.100-10.0.1.50"),
+        IPSet.parse("10.0.1.0/24"),
+        IPSet.parse("192.168.0.1"),
+    ]
+    assert overlaps(ip_sets) == {(0, 1): 156, (1, 2): 51}
+
+
+def test_overlaps_matches_pairwise_intersection():
+    rng = random.Random(0)
+
+    def random_set():
+        intervals = []
+        for _ in range(rng.randrange(1, 6)):
+            first = rng.randrange(0, 1000)
+            intervals.append((first, first + rng.randrange(0, 200)))
+        return IPSet(intervals)
+
+    ip_sets = [random_set() for _ in range(30)]
+    expected = {}
+    for i, j in itertools.combinations(range(len(ip_sets)), 2):
+        count = (ip_sets[i] & ip_sets[j]).count
+        if count:
+            expected[(i, j)] = count
+    assert overlaps(ip_sets) == expected
+
+
+def test_matches_ipaddress_collapse():
+    networks = ["10.0.0.0/25", "10.0.0.128/25", "10.0.3.0/24", "10.0.2.0/24"]
+    collapsed = ipaddress.collapse_addresses(
+        ipaddress.ip_network(network) for network in networks
+    )
+    assert str(IPSet.parse(",".join(networks))) == ",".join(map(str, collapsed))
@@ -0,0 +1,382 @@
+import asyncio
+import math
+
+import pytest
+
+from tsccm.modules import scheduler
+from tsccm.modules.scheduler import (
+    FAILED,
+    THROTTLED,
+    AsyncScheduler,
+    CircuitBreaker,
+    CircuitOpenError,
+    ConcurrencyLimit,
+    Scheduler,
+    TokenBucket,
+)
+
+
+class Clock:
+    """time.monotonic() of scheduler module which moves only when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+class Flaky:
+    """function which raises given exceptions one by one, then returns result"""
+
+    def __init__(self, *exceptions, result="ok"):
+        self.exceptions = list(exceptions)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.exceptions:
+            raise self.exceptions.pop(0)
+        return self.result
+
+
+class Throttled(Exception):
+    pass
+
+
+class Failed(Exception):
+    pass
+
+
+def retryable(exception):
+    if isinstance(exception, Throttled):
+        return THROTTLED
+    if isinstance(exception, Failed):
+        return FAILED
+    return None
+
+
+def test_token_bucket_burst_then_rate(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.1)
+
+    clock.now += 0.1
+    assert bucket.take() == 0
+    assert bucket.take() > 0
+
+
+def test_token_bucket_does_not_save_more_than_burst(clock):
+    bucket = TokenBucket(rate=1, burst=3)
+    clock.now += 3600
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(1)
+
+
+def test_concurrency_limit_is_halved_when_throttled():
+    limit = ConcurrencyLimit(8)
+    for _ in range(6):
+        limit.acquire()
+    limit.release(throttled=True)
+    # halved from calls in flight, not from maximum
+    assert limit.limit == 3
+    assert limit.active == 5
+    assert limit.full()
+
+
+def test_concurrency_limit_grows_back_up_to_maximum():
+    limit = ConcurrencyLimit(4)
+    limit.limit = 2
+    limit.acquire()
+    limit.release()
+    assert limit.limit == pytest.approx(2.5)
+
+    for _ in range(20):
+        limit.acquire()
+        limit.release()
+    assert limit.limit == 4
+
+
+def test_concurrency_limit_never_goes_below_one():
+    limit = ConcurrencyLimit(4)
+    limit.acquire()
+    limit.release(throttled=True)
+    limit.acquire()
+    limit.release(throttled=True)
+    assert limit.limit == 1
+    assert not limit.full()
+
+
+def test_concurrency_limit_without_maximum_is_never_full():
+    limit = ConcurrencyLimit()
+    for _ in range(1000):
+        limit.acquire()
+    assert limit.limit == math.inf
+    assert not limit.full()
+
+
+def test_circuit_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, open_seconds=30)
+    for _ in range(2):
+        breaker.failure()
+        breaker.check()
+    breaker.failure()
+    with pytest.raises(CircuitOpenError, match="3 failures in a row"):
+        breaker.check()
+
+
+def test_circuit_breaker_success_resets_failures(clock):
+    breaker = CircuitBreaker(threshold=2)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.check()
+
+
+def test_circuit_breaker_half_open_lets_one_call_try(clock):
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.failure()
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    clock.now += 1
+    breaker.check()
+    # others wait until the one which tries is done
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.success()
+    breaker.check()
+    breaker.check()
+
+
+def test_circuit_breaker_failed_try_opens_it_again(clock):
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.failure()
+    clock.now += 30
+    breaker.check()
+    breaker.failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 30
+    breaker.check()
+
+
+def test_scheduler_retries_until_success():
+    function = Flaky(Failed(), Throttled())
+    calls = Scheduler(retries=3, retryable=retryable, backoff=0)
+    assert calls.call(function) == "ok"
+    assert function.calls == 3
+    assert calls.breaker.failures == 0
+
+
+def test_scheduler_gives_up_after_retries():
+    function = Flaky(*[Failed() for _ in range(10)])
+    calls = Scheduler(retries=2, retryable=retryable, backoff=0)
+    with pytest.raises(Failed):
+        calls.call(function)
+    assert function.calls == 3
+
+
+def test_scheduler_does_not_retry_other_errors():
+    function = Flaky(ValueError("bad request"))
+    calls = Scheduler(retries=3, retryable=retryable, backoff=0)
+    with pytest.raises(ValueError):
+        calls.call(function)
+    assert function.calls == 1
+    assert calls.slots.active == 0
+
+
+def test_scheduler_throttled_lowers_limit_and_not_breaker():
+    function = Flaky(Throttled())
+    calls = Scheduler(max_in_flight=8, retryable=retryable, backoff=0)
+    calls.call(function)
+    assert calls.slots.limit < 8
+    assert calls.breaker.failures == 0
+    assert calls.slots.active == 0
+
+
+def test_scheduler_stops_calling_host_which_keeps_failing(clock):
+    breaker = CircuitBreaker(threshold=2, open_seconds=30)
+    calls = Scheduler(retries=5, retryable=retryable, backoff=0, breaker=breaker)
+    function = Flaky(*[Failed() for _ in range(10)])
+    with pytest.raises(CircuitOpenError):
+        calls.call(function)
+    assert function.calls == 2
+
+    with pytest.raises(CircuitOpenError):
+        calls.call(function)
+    assert function.calls == 2
+
+
+def test_scheduler_passes_arguments():
+    calls = Scheduler()
+    assert calls.call(lambda a, b=0: a + b, 1, b=2) == 3
+
+
+def test_scheduler_times_waits():
+    phases = []
+
+    def timed(phase, detail=None):
+        phases.append((phase, detail))
+        return scheduler.contextlib.nullcontext()
+
+    calls = Scheduler(rate=1000, retryable=retryable, backoff=0, timed=timed)
+    calls.call(Flaky(Failed()))
+    assert phases == [
+        ("wait", "in flight"),
+        ("wait", "rate"),
+        ("wait", "retry"),
+        ("wait", "in flight"),
+        ("wait", "rate"),
+    ]
+
+
+def test_scheduler_delay_is_capped():
+    calls = Scheduler(backoff=1, backoff_max=5)
+    assert all(0 <= calls.delay(attempt) <= 5 for attempt in range(20))
+
+
+def test_async_scheduler_retries_coroutines():
+    function = Flaky(Failed(), Throttled())
+
+    async def coroutine():
+        return function()
+
+    calls = AsyncScheduler(rate=1000, retries=3, retryable=retryable, backoff=0)
+    assert asyncio.run(calls.call(coroutine)) == "ok"
+    assert function.calls == 3
+    assert calls.slots.active == 0
+
+
+def test_async_scheduler_gives_up_after_retries():
+    function = Flaky(*[Failed() for _ in range(10)])
+
+    async def coroutine():
+        return function()
+
+    calls = AsyncScheduler(retries=1, retryable=retryable, backoff=0)
+    with pytest.raises(Failed):
+        asyncio.run(calls.call(coroutine))
+    assert function.calls == 2
+
+
+def test_async_scheduler_limits_coroutines_in_flight():
+    in_flight = []
+    active = 0
+
+    async def coroutine():
+        nonlocal active
+        active += 1
+        in_flight.append(active)
+        await asyncio.sleep(0)
+        active -= 1
+
+    async def main():
+        calls = AsyncScheduler(max_in_flight=2)
+        await asyncio.gather(*(calls.call(coroutine) for _ in range(10)))
+
+    asyncio.run(main())
+    assert max(in_flight) == 2
+
+
+class NotFound(Exception):
+    pass
+
+
+def open_breaker(clock):
+    """breaker which has just let one call try if host is back"""
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    breaker.failure()
+    clock.now += 30
+    return breaker
+
+
+def test_circuit_breaker_check_tells_which_call_tries(clock):
+    breaker = CircuitBreaker(threshold=1, open_seconds=30)
+    assert breaker.check() is False
+    breaker.failure()
+    clock.now += 30
+    assert breaker.check() is True
+    breaker.settle()
+    assert breaker.check() is True
+
+
+def test_try_refused_by_host_closes_circuit(clock):
+    calls = Scheduler(
+        retryable=retryable,
+        answered=lambda e: isinstance(e, NotFound),
+        backoff=0,
+        breaker=open_breaker(clock),
+    )
+    with pytest.raises(NotFound):
+        calls.call(Flaky(NotFound()))
+    assert calls.call(Flaky()) == "ok"
+    assert calls.breaker.opened_at is None
+
+
+def test_try_throttled_by_host_closes_circuit(clock):
+    calls = Scheduler(retries=0, retryable=retryable, breaker=open_breaker(clock))
+    with pytest.raises(Throttled):
+        calls.call(Flaky(Throttled()))
+    assert calls.breaker.opened_at is None
+    calls.call(Flaky())
+
+
+def test_try_with_other_error_lets_next_call_try(clock):
+    calls = Scheduler(retryable=retryable, breaker=open_breaker(clock))
+    with pytest.raises(ValueError):
+        calls.call(Flaky(ValueError("unexpected")))
+    # circuit stays open, but is not stuck with try which never ended
+    assert calls.breaker.opened_at is not None
+    assert calls.call(Flaky()) == "ok"
+
+
+def test_interrupted_try_lets_next_call_try(clock):
+    calls = Scheduler(retryable=retryable, breaker=open_breaker(clock))
+    with pytest.raises(KeyboardInterrupt):
+        calls.call(Flaky(KeyboardInterrupt()))
+    assert calls.slots.active == 0
+    assert calls.call(Flaky()) == "ok"
+
+
+def test_cancelled_try_lets_next_call_try(clock):
+    calls = AsyncScheduler(retryable=retryable, breaker=open_breaker(clock))
+
+    async def forever():
+        await asyncio.Event().wait()
+
+    async def ok():
+        return "ok"
+
+    async def main():
+        task = asyncio.ensure_future(calls.call(forever))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await calls.call(ok)
+
+    assert asyncio.run(main()) == "ok"
+    assert calls.slots.active == 0
+
+
+def test_refused_request_resets_failures():
+    calls = Scheduler(
+        retries=0, retryable=retryable, answered=lambda e: isinstance(e, NotFound)
+    )
+    with pytest.raises(Failed):
+        calls.call(Flaky(Failed()))
+    with pytest.raises(NotFound):
+        calls.call(Flaky(NotFound()))
+    assert calls.breaker.failures == 0
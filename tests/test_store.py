@@ -0,0 +1,65 @@
+import pytest
+
+from tsccm.modules.store import Store
+
+
+def scan_result(id, status="Completed", start=1000, finish=2000, imported="Finished"):
+    return {
+        "id": str(id),
+        "status": status,
+        "importStatus": imported,
+        "startTime": str(start),
+        "finishTime": str(finish),
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return Store(str(tmp_path / "store.sqlite"))
+
+
+def test_save_counts_added_and_changed(store):
+    first = [scan_result(1), scan_result(2)]
+    assert store.save("scanResult", "10.0.0.1", first) == (2, 0)
+    second = [scan_result(1), scan_result(2, finish=3000)]
+    assert store.save("scanResult", "10.0.0.1", second) == (0, 1)
+    assert [r["id"] for r in store.records("scanResult", "10.0.0.1")] == ["1", "2"]
+
+
+def test_nothing_stored_has_no_watermark(store):
+    assert store.scan_results_since("10.0.0.1") is None
+
+
+def test_watermark_is_latest_finish_time_of_address(store):
+    store.save(
+        "scanResult",
+        "10.0.0.1",
+        [scan_result(1, finish=2000), scan_result(2, start=2500, finish=3000)],
+    )
+    store.save("scanResult", "10.0.0.2", [scan_result(3, finish=9000)])
+    assert store.scan_results_since("10.0.0.1") == 3000
+
+
+def test_watermark_goes_back_to_oldest_unfinished(store):
+    store.save(
+        "scanResult",
+        "10.0.0.1",
+        [
+            scan_result(1, finish=5000),
+            scan_result(2, status="Running", start=1500, finish=-1),
+            scan_result(3, start=1200, finish=4000, imported="Importing"),
+        ],
+    )
+    assert store.scan_results_since("10.0.0.1") == 1200
+
+
+def test_watermark_ignores_unfinished_without_start(store):
+    store.save(
+        "scanResult",
+        "10.0.0.1",
+        [
+            scan_result(1, finish=5000),
+            scan_result(2, status="Queued", start=-1, finish=-1),
+        ],
+    )
+    assert store.scan_results_since("10.0.0.1") == 5000
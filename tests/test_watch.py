@@ -0,0 +1,48 @@
+from tsccm.modules.watch import ADDED, CHANGED, REMOVED, Changes, Interval
+
+
+def test_first_update_adds_all_records():
+    changes = Changes()
+    records = [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}]
+    assert changes.update("10.0.0.1", records) == [(ADDED, r) for r in records]
+    assert changes.count == 2
+
+
+def test_changes_since_previous_update_of_address():
+    changes = Changes()
+    changes.update("10.0.0.1", [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}])
+    changes.update("10.0.0.2", [{"id": "1", "name": "other host"}])
+
+    found = changes.update(
+        "10.0.0.1", [{"name": "a", "id": "1"}, {"id": "2", "name": "c"}, {"id": "3"}]
+    )
+    assert found == [
+        (CHANGED, {"id": "2", "name": "c"}),
+        (ADDED, {"id": "3"}),
+    ]
+    assert changes.update("10.0.0.1", [{"id": "3"}]) == [
+        (REMOVED, {"name": "a", "id": "1"}),
+        (REMOVED, {"id": "2", "name": "c"}),
+    ]
+    assert changes.update("10.0.0.1", [{"id": "3"}]) == []
+    assert changes.count == 7
+
+
+def test_changes_by_other_key():
+    changes = Changes(key="name")
+    changes.update("10.0.0.1", [{"name": "jobd", "value": "Running"}])
+    assert changes.update("10.0.0.1", [{"name": "jobd", "value": "Stopped"}]) == [
+        (CHANGED, {"name": "jobd", "value": "Stopped"})
+    ]
+
+
+def test_interval_doubles_without_changes_up_to_maximum():
+    interval = Interval(10, 60)
+    assert [interval.next(False) for _ in range(4)] == [20, 40, 60, 60]
+    assert interval.next(True) == 10
+
+
+def test_interval_without_maximum_stays():
+    interval = Interval(30)
+    assert interval.next(False) == 30
+    assert Interval(30, 10).next(False) == 30
@@ -1,26 +1,33 @@
 from tsccm._version import __version__
-from tsccm.modules.tscapi import TscApi
 import click
-import pandas as pd
-from tabulate import tabulate
+import contextlib
 import getpass
-import keyring
-from keyring.backends import Windows, macOS
+import functools
 import platform
 import sys
-from tenable.errors import ConnectionError
-from oauthlib.oauth2.rfc6749.errors import CustomOAuth2Error
+import os
+import json
+import csv
+import io
+import re
+import shlex
+import itertools
+import tempfile
+import shutil
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from tsccm import utilities
+from tsccm.modules import schema
+from tsccm.modules.timings import TimedIterator
+from tsccm.modules.table import SAMPLE_ROWS, render
+from tsccm.modules.columnar import BATCH_SIZE
+from tsccm.modules.scheduler import DEFAULT_RETRIES, CircuitOpenError
+from tsccm.modules.aggregate import Aggregation, aggregation_parse
 from tsccm import __about__
 
 os_user = getpass.getuser().lower()
 
-if platform.system() == "Windows":
-    keyring.set_keyring(Windows.WinVaultKeyring())
-elif platform.system() == "Darwin":
-    keyring.set_keyring(macOS.Keyring())
-
 
 _login_options = [
     click.option(
@@ -47,22 +54,379 @@ _login_options = [
         show_default="current user",
     ),
     click.option("--password", "-p", help="password which you want to use to login"),
+    click.option(
+        "--access-key",
+        envvar="TSCCM_ACCESS_KEY",
+        help="API access key which you want to use to login instead of username and password",
+    ),
+    click.option(
+        "--secret-key",
+        help="API secret key of --access-key, kept in OS Credential Manager like password",
+    ),
+    click.option(
+        "--credentials-file",
+        envvar="TSCCM_CREDENTIALS_FILE",
+        type=click.Path(exists=True, dir_okay=False),
+        help="netrc file (machine ADDRESS login USERNAME password SECRET) with "
+        "passwords or secret keys, readable only by its owner",
+    ),
+    click.option(
+        "--password-command",
+        envvar="TSCCM_PASSWORD_COMMAND",
+        help="command which prints password or secret key of TSCCM_ADDRESS and "
+        "TSCCM_USERNAME environment variables, e.g. pass show tsc/$TSCCM_ADDRESS",
+    ),
+    click.option(
+        "--keep-session",
+        is_flag=True,
+        help="keep session open after run and reuse it in next runs instead of login",
+    ),
     click.option(
         "--insecure",
         "-k",
         is_flag=True,
         help="perform insecure SSL connections and transfers",
     ),
+]
+
+_format_options = [
+    click.option(
+        "--format",
+        "-f",
+        default="table",
+        type=click.Choice(
+            ["table", "csv", "json", "ndjson", "parquet", "feather", "arrow"]
+        ),
+        help="data format to display, csv, json and ndjson are streamed row by "
+        "row, json as one array of rows of all addresses with address field, parquet, feather (Arrow IPC file) and arrow (Arrow IPC stream) "
+        "are written to --output with typed time columns",
+        show_default="table",
+    ),
+]
+
+_output_options = [
+    click.option(
+        "--output",
+        "-o",
+        type=click.Path(dir_okay=False, writable=True),
+        help="file to write data to instead of stdout, needed by parquet, "
+        "feather and arrow",
+    ),
+    click.option(
+        "--compression",
+        default="zstd",
+        type=click.Choice(["zstd", "lz4", "snappy", "gzip", "none"]),
+        help="compression of parquet, feather and arrow, feather and arrow "
+        "support only zstd and lz4",
+        show_default="zstd",
+    ),
+]
+
+
+def columns_parse(ctx, param, value):
+    columns = [column.strip() for one_value in value for column in one_value.split(",")]
+    return [column for column in columns if column]
+
+
+def aggregations_parse(ctx, param, value):
+    try:
+        return [aggregation_parse(one_value) for one_value in value]
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+_aggregate_options = [
+    click.option(
+        "--group-by",
+        multiple=True,
+        callback=columns_parse,
+        help="comma separated columns to group rows of all addresses by, "
+        "host column tells address of row, e.g. host,owner, can be repeated",
+    ),
+    click.option(
+        "--aggregate",
+        "aggregations",
+        multiple=True,
+        callback=aggregations_parse,
+        help="count, or sum, min or max of column, e.g. sum:totalIPs, of every "
+        "group or of all rows of all addresses, can be repeated",
+        show_default="count with --group-by",
+    ),
+    click.option(
+        "--sort-by",
+        multiple=True,
+        callback=columns_parse,
+        help="comma separated columns to sort rows of all addresses by, "
+        "COLUMN:desc sorts in descending order, e.g. count:desc",
+    ),
+]
+
+
+def aggregation_get(entity, fields, group_by, aggregations, sort_by):
+    """rows of all addresses are put together only when they are grouped,
+    aggregated or sorted"""
+    if not group_by and not aggregations and not sort_by:
+        return None
+    aggregation = Aggregation(group_by, aggregations, sort_by)
+    try:
+        aggregation.columns(
+            [column.name for column in schema.columns_get(entity, fields)]
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    return aggregation
+
+
+def ids_parse(ctx, param, value):
+    ids = columns_parse(ctx, param, value)
+    for one_id in ids:
+        if not one_id.isdigit():
+            raise click.BadParameter("{} is not an id".format(one_id))
+    return [*dict.fromkeys(ids)]
+
+
+def fields_parse(ctx, param, value):
+    # list commands are named like schema entities, e.g. scan-result
+    entity = ctx.command.name.replace("-", "_")
+    fields = [field.strip() for one_value in value for field in one_value.split(",")]
+    fields = [field for field in fields if field]
+    try:
+        schema.columns_get(entity, fields)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return fields or None
+
+
+def ip_set_parse(ctx, param, value):
+    if not value:
+        return None
+    from tsccm.modules.ipset import IPSet
+
+    try:
+        return IPSet.parse(",".join(value))
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def analysis_filters_parse(ctx, param, value):
+    filters = []
+    for one_filter in value:
+        match = re.match(r"\s*(\w+)\s*(!=|>=|<=|~=|=)\s*(.*)$", one_filter, re.S)
+        if match is None:
+            raise click.BadParameter(
+                "{} is not NAME=VALUE (or NAME!=, >=, <=, ~=VALUE)".format(one_filter)
+            )
+        filters.append(match.groups())
+    return filters
+
+
+_fields_options = [
+    click.option(
+        "--fields",
+        "--columns",
+        multiple=True,
+        callback=fields_parse,
+        help="comma separated columns to request from Tenable.SC and display, "
+        "e.g. id,name, can be repeated",
+        show_default="all",
+    ),
+]
+
+_general_options = [
+    click.option("-v", "--verbose", count=True),
+    click.option(
+        "--timings",
+        "show_timings",
+        is_flag=True,
+        help="print time spent in every phase per address to stderr at the end",
+    ),
+    click.option(
+        "--timings-file",
+        type=click.Path(dir_okay=False, writable=True),
+        help="save timings of every phase as trace (chrome://tracing, Perfetto)",
+    ),
+]
+
+_fanout_options = [
+    click.option(
+        "--parallel",
+        "-P",
+        default=1,
+        type=click.IntRange(min=1),
+        help="number of addresses to process at the same time, each in its "
+        "own thread, also with --async",
+        show_default="1",
+    ),
+    click.option(
+        "--timeout",
+        default=None,
+        type=click.FloatRange(min=0, min_open=True),
+        help="seconds to wait for Tenable.SC API response before giving up on address",
+    ),
+    click.option(
+        "--rate-limit",
+        default=None,
+        type=click.FloatRange(min=0, min_open=True),
+        help="requests per second to every address, up to that many at once",
+    ),
+    click.option(
+        "--max-in-flight",
+        default=None,
+        type=click.IntRange(min=1),
+        help="requests to every address at the same time",
+    ),
+    click.option(
+        "--retries",
+        default=DEFAULT_RETRIES,
+        type=click.IntRange(min=0),
+        help="retries of request which got 429, 502, 503 or 504 response or "
+        "lost connection, with exponential backoff and jitter",
+        show_default=str(DEFAULT_RETRIES),
+    ),
+    click.option(
+        "--async",
+        "use_async",
+        is_flag=True,
+        envvar="TSCCM_ASYNC",
+        help="send requests of all addresses from one event loop over shared "
+        "connection pool, it doesn't replace threads of --parallel which "
+        "process addresses, so hundreds of addresses still need hundreds of "
+        "threads (needs httpx: pip install tsccm[async])",
+    ),
+]
+
+
+def cache_ttl_parse(ctx, param, value):
+    cache_ttl = {}
+    for one_ttl in value:
+        endpoint, _, seconds = one_ttl.rpartition("=")
+        try:
+            cache_ttl[endpoint or None] = int(seconds)
+        except ValueError:
+            raise click.BadParameter(
+                "{} is not SECONDS nor ENDPOINT=SECONDS".format(one_ttl)
+            )
+    return cache_ttl
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def duration_parse(ctx, param, value):
+    if value is None:
+        return None
+    number, unit = value[:-1], value[-1:].lower()
+    if unit.isdigit():
+        number, unit = value, "s"
+    try:
+        seconds = int(number) * DURATION_UNITS[unit]
+    except (KeyError, ValueError):
+        raise click.BadParameter(
+            "{} is not a duration like 3600, 30m, 12h, 7d or 2w".format(value)
+        )
+    if seconds <= 0:
+        raise click.BadParameter("{} is not a positive duration".format(value))
+    return seconds
+
+
+_cache_options = [
+    click.option(
+        "--cache-ttl",
+        multiple=True,
+        envvar="TSCCM_CACHE_TTL",
+        callback=cache_ttl_parse,
+        help="cache Tenable.SC API responses on disk for SECONDS, "
+        "use ENDPOINT=SECONDS (e.g. role=86400) to set it for one API endpoint, "
+        "cached responses are returned without login, so password isn't checked",
+    ),
+    click.option(
+        "--refresh",
+        is_flag=True,
+        help="ignore cached responses and cache fresh ones",
+    ),
+    click.option("--no-cache", is_flag=True, help="do not use response cache"),
+]
+
+
+_page_options = [
+    click.option(
+        "--limit",
+        type=click.IntRange(min=0),
+        help="print at most that many rows of every address, or of result "
+        "of --group-by/--aggregate/--sort-by",
+    ),
+    click.option(
+        "--offset",
+        default=0,
+        type=click.IntRange(min=0),
+        help="skip that many first rows",
+        show_default="0",
+    ),
+    click.option(
+        "--pager",
+        is_flag=True,
+        envvar="TSCCM_PAGER",
+        help="show output in $PAGER (less by default) when printed to terminal",
+    ),
+]
+
+# output of commands which read local store instead of Tenable.SC
+_local_output_options = [
     click.option(
         "--format",
         "-f",
         default="table",
-        help="data format to display [table,json,csv]",
+        type=click.Choice(["table", "csv", "json", "ndjson"]),
+        help="data format to display",
         show_default="table",
     ),
+    click.option(
+        "--output",
+        "-o",
+        type=click.Path(dir_okay=False, writable=True),
+        help="file to write data to instead of stdout",
+    ),
+    click.option(
+        "--pager",
+        is_flag=True,
+        envvar="TSCCM_PAGER",
+        help="show output in $PAGER (less by default) when printed to terminal",
+    ),
 ]
 
-_general_options = [click.option("-v", "--verbose", count=True)]
+# lists of IP addresses, networks and ranges, e.g. asset lists
+_ip_set_options = [
+    click.option(
+        "--contains",
+        multiple=True,
+        callback=ip_set_parse,
+        help="show lists which contain any of given comma separated IP "
+        "addresses, networks or ranges (e.g. 10.0.0.1,10.1.0.0/16), with "
+        "those they contain and their count, can be repeated",
+    ),
+    click.option(
+        "--overlap",
+        is_flag=True,
+        help="show pairs of lists of all addresses which have common IP "
+        "addresses, with their count",
+    ),
+]
+
+_watch_options = [
+    click.option(
+        "--watch",
+        callback=duration_parse,
+        help="keep session open, poll every INTERVAL (e.g. 30s or 5m) "
+        "and print only added, changed or removed rows, "
+        "as events with --format ndjson",
+    ),
+    click.option(
+        "--watch-max",
+        callback=duration_parse,
+        help="poll less often while nothing changes, "
+        "up to every INTERVAL (e.g. 10m), --watch one after change",
+    ),
+]
 
 
 def add_options(options):
@@ -74,10 +438,41 @@ def add_options(options):
     return _add_options
 
 
+# heavy dependencies (pandas, pyTenable, keyring) are imported only on the
+# code path which needs them, so --help and --version start fast
+
+
+@functools.lru_cache(maxsize=None)
+def vault():
+    import keyring
+
+    if platform.system() == "Windows":
+        from keyring.backends import Windows
+
+        keyring.set_keyring(Windows.WinVaultKeyring())
+    elif platform.system() == "Darwin":
+        from keyring.backends import macOS
+
+        keyring.set_keyring(macOS.Keyring())
+
+    return keyring
+
+
+@functools.lru_cache(maxsize=None)
+def vault_get(address, username):
+    # every address and username is looked up in OS Credential Manager once
+    return vault().get_password(address, username)
+
+
+def vault_set(address, username, password):
+    vault().set_password(address, username, password)
+    vault_get.cache_clear()
+
+
 def set_vault_password(address, username, password):
-    password_from_vault = keyring.get_password(address, username)
+    password_from_vault = vault_get(address, username)
     if password_from_vault is None:
-        keyring.set_password(address, username, password)
+        vault_set(address, username, password)
         if platform.system() == "Windows":
             print("Credentials successfully saved to Windows Credential Manager.")
             print(
@@ -109,7 +504,7 @@ def set_vault_password(address, username, password):
         )
 
         if vault_update_answer == "yes":
-            keyring.set_password(address, username, password)
+            vault_set(address, username, password)
             if platform.system() == "Windows":
                 print("Credentials successfully saved to Windows Credential Manager.")
                 print(
@@ -132,7 +527,7 @@ def get_vault_password(address, username, verbose):
     if platform.system() == "Windows" or platform.system() == "Darwin":
         if verbose:
             print("Looking for password in OS Credential Manager")
-        password_from_vault = keyring.get_password(address, username)
+        password_from_vault = vault_get(address, username)
         if password_from_vault:
             password = password_from_vault
             if verbose:
@@ -144,36 +539,857 @@ def get_vault_password(address, username, verbose):
     return password
 
 
-def password_check(address, username, password, verbose):
-    if not password:
-        password = get_vault_password(address, username, verbose)
+def password_prompt(address, username, prompt="password"):
+    password = click.prompt(
+        "{} of {} @ {}".format(prompt, username, address),
+        hide_input=True,
+        confirmation_prompt=True,
+    )
+    set_vault_password(address, username, password)
+    return password
+
+
+@functools.lru_cache(maxsize=None)
+def credential_resolver(env, credentials_file, password_command, verbose):
+    """providers in order of use, same resolver is used by commands of shell"""
+    from tsccm.modules.credentials import (
+        CommandProvider,
+        CredentialResolver,
+        EnvironmentProvider,
+        FileProvider,
+    )
+
+    providers = [("environment", EnvironmentProvider(env))]
+    if credentials_file:
+        try:
+            providers.append(("credentials file", FileProvider(credentials_file)))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--credentials-file")
+    if password_command:
+        providers.append(("password command", CommandProvider(password_command)))
+    providers.append(
+        (
+            "OS Credential Manager",
+            lambda address, username: get_vault_password(address, username, verbose),
+        )
+    )
+    return CredentialResolver(providers)
+
+
+def write_csv(rows, out, start=1):
+    writer = csv.writer(out, lineterminator="\n")
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        if count == 1:
+            writer.writerow([""] + [*row])
+        writer.writerow([start + count - 1] + [*row.values()])
+    return count
+
+
+def write_json(rows, out):
+    count = 0
+    out.write("[")
+    for count, row in enumerate(rows, start=1):
+        out.write(",\n" if count > 1 else "\n")
+        out.write(json.dumps(row, default=str))
+    out.write("\n]\n")
+    return count
+
+
+def write_ndjson(rows, out, **columns):
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        out.write(json.dumps({**columns, **row}, default=str))
+        out.write("\n")
+    return count
+
+
+class JsonArray(io.TextIOBase):
+    """
+    stdout of --format json, rows written as ndjson by every address, in
+    --address order, are joined into one array, so whole output is one JSON
+    document, other lines (e.g. failure of address) go to stderr
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.line = ""
+        self.count = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        lines = (self.line + text).split("\n")
+        self.line = lines.pop()
+        for line in lines:
+            self.line_write(line)
+        return len(text)
+
+    def line_write(self, line):
+        if not line.startswith("{"):
+            if line:
+                print(line, file=sys.stderr)
+            return
+        self.out.write(",\n" if self.count else "[\n")
+        self.out.write(line)
+        self.count += 1
+
+    def flush(self):
+        self.out.flush()
+
+    def end(self):
+        self.line_write(self.line)
+        self.line = ""
+        self.out.write("\n]\n" if self.count else "[]\n")
+
+
+@contextlib.contextmanager
+def json_array():
+    array = JsonArray(sys.stdout)
+    with contextlib.redirect_stdout(array):
+        try:
+            yield
+        finally:
+            array.end()
+
+
+def write_columnar(records, writer, entity, fields, on_timing, address):
+    count = 0
+    records = iter(records)
+    while True:
+        started = time.perf_counter()
+        batch = [*itertools.islice(records, BATCH_SIZE)]
+        # empty batch is written only when there are no records at all, so
+        # file gets its schema anyway
+        if not batch and count:
+            break
+        table = schema.arrow_table(entity, batch, fields, address=address)
+        transform_seconds = time.perf_counter() - started
+        writer.write(table)
+        output_timings(on_timing, address, entity, started, transform_seconds)
+        count += len(batch)
+        if len(batch) < BATCH_SIZE:
+            break
+    return count
+
+
+@contextlib.contextmanager
+def data_destination(format, output, compression, pager=False):
+    """
+    columnar formats get writer shared by all addresses, other formats are
+    printed to stdout which is redirected to --output if given, or to pager
+    if asked for and stdout is terminal
+    """
+    from tsccm.modules.columnar import FORMATS
+
+    if format in FORMATS:
+        if not output:
+            raise click.UsageError("--format {} needs --output".format(format))
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise click.UsageError(
+                "--format {} needs pyarrow, install it with: "
+                "pip install tsccm[parquet]".format(format)
+            )
+        from tsccm.modules.columnar import ColumnarWriter
+
+        try:
+            writer = ColumnarWriter(output, format, compression)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--compression")
+        try:
+            yield writer
+        finally:
+            writer.close()
+
+    elif output:
+        with open(output, "w", newline="") as f, contextlib.redirect_stdout(f):
+            yield None
+
+    elif pager and sys.stdout.isatty():
+        from tsccm.modules.table import pager as table_pager
+
+        with table_pager():
+            yield None
+
+    else:
+        yield None
+
+
+def aggregation_write(aggregation, format, writer, limit=None, offset=0):
+    from tsccm.modules.aggregate import rows
+
+    # frames are put together in --address order, not in order of answers
+    hosts = click.get_current_context().params.get("address", ())
+    try:
+        df = aggregation.result(hosts)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    df = df.iloc[offset : None if limit is None else offset + limit]
+
+    if writer is not None:
+        import pyarrow as pa
+
+        writer.write(pa.Table.from_pandas(df, preserve_index=False))
+        print(len(df), writer.path)
+    elif format == "table":
+        render(rows(df), sys.stdout, [*df.columns], start=offset + 1)
+        print()
+    elif format == "ndjson":
+        write_ndjson(rows(df), sys.stdout)
+    elif format == "csv":
+        write_csv(rows(df), sys.stdout, start=offset + 1)
+    else:
+        write_json(rows(df), sys.stdout)
+
+
+@contextlib.contextmanager
+def data_output(
+    format,
+    output,
+    compression,
+    aggregation=None,
+    limit=None,
+    offset=0,
+    pager=False,
+):
+    """
+    destination of data, with aggregation frames of all addresses are
+    collected by print_data() and result is written once at the end
+    """
+    with data_destination(format, output, compression, pager) as writer:
+        if aggregation is None and format == "json":
+            with json_array():
+                yield writer
+            return
+        if aggregation is None:
+            yield writer
+            return
+        try:
+            yield aggregation
+        except SystemExit:
+            # failed addresses are already reported, the rest is aggregated
+            aggregation_write(aggregation, format, writer, limit, offset)
+            raise
+        aggregation_write(aggregation, format, writer, limit, offset)
+
+
+def output_timings(on_timing, one_address, entity, started, transform_seconds):
+    # rows are transformed while they are written, so time spent in
+    # transform is summed up by TimedIterator and the rest is render
+    if on_timing is None:
+        return
+    transformed = started + transform_seconds
+    on_timing(one_address, "transform", started, transformed, entity)
+    on_timing(one_address, "render", transformed, time.perf_counter(), entity)
+
+
+def print_data(
+    one_address,
+    entity,
+    records,
+    format,
+    out=None,
+    on_timing=None,
+    fields=None,
+    writer=None,
+    limit=None,
+    offset=0,
+    skipped=0,
+):
+    # table, csv, json and ndjson are written row by row as records are
+    # transformed, columnar formats batch by batch, aggregation needs all
+    # records at once and gets them as one typed frame, rows are numbered
+    # after offset and records skipped before they were requested
+    out = out or sys.stdout
+    if isinstance(writer, Aggregation):
+        started = time.perf_counter()
+        writer.add(one_address, schema.frame(entity, records, fields))
+        if on_timing is not None:
+            on_timing(one_address, "transform", started, time.perf_counter(), entity)
+        return
+
+    if limit is not None or offset:
+        records = itertools.islice(
+            records, offset, None if limit is None else offset + limit
+        )
+
+    if writer is not None:
+        count = write_columnar(
+            records, writer, entity, fields, on_timing, address=one_address
+        )
+        print(one_address, entity, count, writer.path, file=out)
+        return
+
+    started = time.perf_counter()
+    rows = TimedIterator(schema.rows(entity, records, fields))
+    if format in ("json", "ndjson"):
+        # json rows are joined into one array by JsonArray of data_output()
+        write_ndjson(rows, out, address=one_address)
+    else:
+        print(one_address, file=out)
+        start = skipped + offset + 1
+        if format == "table":
+            render(rows, out, schema_columns(entity, fields), start=start)
+            print(file=out)
+        else:
+            write_csv(rows, out, start=start)
+            print(file=out)
+    output_timings(on_timing, one_address, entity, started, rows.seconds)
+
+
+def print_changes(one_address, entity, changes, format, out=None, fields=None):
+    """added, changed and removed records with event column, nothing if there
+    are no changes"""
+    out = out or sys.stdout
+    if not changes:
+        return
+    events = [event for event, _ in changes]
+    records = [record for _, record in changes]
+    polled = datetime.datetime.now().isoformat(timespec="seconds")
+
+    rows = (
+        {"event": event, **row}
+        for event, row in zip(events, schema.rows(entity, records, fields))
+    )
+    if format in ("json", "ndjson"):
+        write_ndjson(rows, out, address=one_address, time=polled)
+    else:
+        print(one_address, polled, file=out)
+        if format == "table":
+            render(rows, out, ["event"] + schema_columns(entity, fields))
+            print(file=out)
+        else:
+            write_csv(rows, out)
+            print(file=out)
+
+
+def store_path(store):
+    return store or os.path.join(utilities.cache_dir(), "store.sqlite")
+
+
+def schema_columns(entity, fields=None):
+    return [column.name for column in schema.columns_get(entity, fields)]
+
+
+def ip_sets_check(format, list, contains, overlap):
+    from tsccm.modules.columnar import FORMATS
+
+    if sum([bool(list), contains is not None, overlap]) > 1:
+        raise click.UsageError("use only one of --list, --contains and --overlap")
+    if (contains is not None or overlap) and format in FORMATS:
+        raise click.UsageError(
+            "--contains and --overlap can't be used with --format {}".format(format)
+        )
+
+
+def ip_set_get(entity, record):
+    """IP addresses of record, from its first column of IP ranges"""
+    from tsccm.modules.ipset import IPSet
+
+    path, *_ = [
+        column.path
+        for column in schema.columns_get(entity)
+        if column.type == schema.IP_RANGES
+    ]
+    return IPSet.parse(schema.value_get(record, path))
+
+
+def ip_sets_rows(ip_sets, address, contains=None):
+    """
+    records (of ip_sets of every address, in --address order) which have
+    any of contains IP addresses, with those addresses and their count, or
+    without contains pairs of records which have common addresses
+    """
+    from tsccm.modules.ipset import overlaps
+
+    found = [
+        (one_address, record, ip_set)
+        for one_address in address
+        for record, ip_set in ip_sets.get(one_address, [])
+    ]
+    if contains is not None:
+        for one_address, record, ip_set in found:
+            common = ip_set & contains
+            if common:
+                yield {
+                    "address": one_address,
+                    "id": record.get("id"),
+                    "name": record.get("name"),
+                    "ipCount": ip_set.count,
+                    "containedIPs": str(common),
+                    "containedCount": common.count,
+                }
+        return
+
+    common = overlaps([ip_set for _, _, ip_set in found])
+    for (i, j), count in sorted(common.items()):
+        address_i, record_i, ip_set_i = found[i]
+        address_j, record_j, ip_set_j = found[j]
+        yield {
+            "address": address_i,
+            "id": record_i.get("id"),
+            "name": record_i.get("name"),
+            "ipCount": ip_set_i.count,
+            "otherAddress": address_j,
+            "otherId": record_j.get("id"),
+            "otherName": record_j.get("name"),
+            "otherIpCount": ip_set_j.count,
+            "commonCount": count,
+        }
+
+
+def ip_sets_write(ip_sets, contains, format, output, pager):
+    address = click.get_current_context().params.get("address", ())
+    with data_destination(format, output, None, pager):
+        write_rows(ip_sets_rows(ip_sets, address, contains), format, sys.stdout)
+
+
+def write_rows(rows, format, out):
+    if format == "table":
+        return render(rows, out)
+    elif format == "ndjson":
+        return write_ndjson(rows, out)
+    elif format == "csv":
+        return write_csv(rows, out)
+    else:
+        return write_json(rows, out)
+
+
+def write_data(rows, format, path):
+    with open(path, "w", newline="") as f:
+        if format == "csv":
+            return write_csv(rows, f)
+        else:
+            return write_json(rows, f)
+
+
+def run_on_address(one_address, connect, task, out, logout=True):
+    from oauthlib.oauth2.rfc6749.errors import CustomOAuth2Error
+    from requests.exceptions import RequestException
+    from tenable.errors import APIError, ConnectionError
+    from tsccm.modules.tscapi import AsyncApiError, AsyncLoginError
+
+    sccon = None
+    try:
+        sccon = connect(one_address)
+        task(sccon, one_address, out)
+    except (ConnectionError, RequestException) as e:
+        print(
+            "Can't reach Tenable.sc API via {}. Please check your connection.".format(
+                one_address
+            ),
+            file=out,
+        )
+        return False
+
+    except CircuitOpenError as e:
+        print(
+            "Tenable.sc API via {} keeps failing, giving up: {}".format(one_address, e),
+            file=out,
+        )
+        return False
+
+    except (CustomOAuth2Error, AsyncLoginError) as e:
+        print(
+            "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct.",
+            file=out,
+        )
+        return False
+
+    except (APIError, AsyncApiError) as e:
+        print(
+            "Tenable.sc API request via {} failed: {}".format(one_address, e), file=out
+        )
+        return False
+
+    except click.ClickException:
+        raise
+
+    except Exception as e:
+        # unexpected failure of one address doesn't take output of others
+        # with it, with --parallel they are still in their spools
+        print(
+            "Tenable.sc API via {} failed: {}: {}".format(
+                one_address, type(e).__name__, e
+            ),
+            file=out,
+        )
+        return False
+
+    finally:
+        if sccon is not None and logout:
+            try:
+                sccon.logout()
+            except Exception:
+                pass
+
+    return True
+
+
+def response_cache(cache_ttl, refresh, no_cache):
+    if no_cache or not cache_ttl:
+        return None
 
-    if not password:
-        password = click.prompt("password", hide_input=True, confirmation_prompt=True)
-        set_vault_password(address, username, password)
+    from tsccm.modules.cache import ResponseCache
+
+    path = os.path.join(utilities.cache_dir(), "responses.sqlite")
+    return ResponseCache(path, cache_ttl, refresh=refresh)
+
+
+def session_store(keep_session):
+    if not keep_session:
+        return None
+
+    from tsccm.modules.session import SessionStore
+
+    return SessionStore(os.path.join(utilities.cache_dir(), "sessions"))
+
+
+def secrets_get(
+    address,
+    username,
+    password,
+    access_key,
+    secret_key,
+    verbose,
+    timed=None,
+    credentials_file=None,
+    password_command=None,
+):
+    """
+    password, or secret key of --access-key, of every address, all found
+    before first request, only those which no provider has are prompted for
+    """
+    from tsccm.modules.credentials import PASSWORD_ENV, SECRET_KEY_ENV
+
+    if access_key:
+        username, password = access_key, secret_key
+        env, prompt = SECRET_KEY_ENV, "secret key"
+    else:
+        env, prompt = PASSWORD_ENV, "password"
 
     if password:
-        set_vault_password(address, username, password)
+        # given one is saved in OS Credential Manager for next runs
+        for one_address in dict.fromkeys(address):
+            set_vault_password(one_address, username, password)
+        return {one_address: password for one_address in address}
+
+    def on_lookup(one_address):
+        if timed is None:
+            return contextlib.nullcontext()
+        return timed(one_address, "credentials")
+
+    resolver = credential_resolver(env, credentials_file, password_command, verbose)
+    try:
+        found = resolver.resolve(address, username, on_lookup)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    secrets = {}
+    for one_address, (secret, source) in found.items():
+        if secret is None:
+            secret = password_prompt(one_address, username, prompt)
+        elif verbose:
+            print("{} of {} found in {}".format(prompt, one_address, source))
+        secrets[one_address] = secret
+    return secrets
+
+
+def async_engine(use_async, insecure):
+    """AsyncEngine shared by all addresses with --async, None without it"""
+    if not use_async:
+        return None
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise click.UsageError(
+            "--async needs httpx, install it with: pip install tsccm[async]"
+        )
+    from tsccm.modules.tscapi import AsyncEngine
 
-    return password
+    return AsyncEngine(insecure)
+
+
+def connector(port, username, access_key, secrets, insecure, engine=None, **kwargs):
+    """function which returns logged in TscApi of address, or BlockingTscApi
+    of AsyncTscApi run by engine"""
+    from tsccm.modules.tscapi import TscApi
 
+    def connect(one_address):
+        if engine is None:
+            sccon = TscApi(one_address, port, insecure, **kwargs)
+        else:
+            sccon = engine.tscapi(one_address, port, insecure, **kwargs)
+        if access_key:
+            sccon.login(access_key=access_key, secret_key=secrets[one_address])
+        else:
+            sccon.login(username, secrets[one_address])
+        return sccon
+
+    return connect
+
+
+# output of address kept in memory while other addresses are printed, bigger
+# one goes to temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def run_all(run, address, parallel):
+    """results of run(one_address, out) of every address, parallel at once"""
+    if parallel == 1:
+        return [run(one_address, sys.stdout) for one_address in address]
+
+    # every address writes to its own spool so output keeps the order of
+    # --address no matter which Tenable.SC answers first
+    outs = [
+        tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+")
+        for _ in address
+    ]
+    results = []
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [
+            executor.submit(run, one_address, out)
+            for one_address, out in zip(address, outs)
+        ]
+        for future, out in zip(futures, outs):
+            results.append(future.result())
+            out.seek(0)
+            shutil.copyfileobj(out, sys.stdout)
+            out.close()
+            sys.stdout.flush()
+    return results
+
+
+def run_on_addresses(
+    task,
+    address,
+    port,
+    username,
+    password,
+    access_key,
+    secret_key,
+    credentials_file,
+    password_command,
+    keep_session,
+    insecure,
+    verbose,
+    show_timings,
+    timings_file,
+    parallel,
+    timeout,
+    rate_limit,
+    max_in_flight,
+    retries,
+    use_async=False,
+    cache_ttl=None,
+    refresh=False,
+    no_cache=False,
+):
+    # logged in connections of tsccm shell are used instead of new login
+    pool = click.get_current_context().obj
+
+    def warm(one_address):
+        return pool is not None and one_address in pool
+
+    timings = None
+    if show_timings or timings_file:
+        from tsccm.modules.timings import Timings
+
+        timings = Timings(click.get_current_context().info_name)
+
+    def timed(one_address, phase):
+        if timings is None:
+            return contextlib.nullcontext()
+        return timings.phase(one_address, phase)
+
+    secrets = secrets_get(
+        [one_address for one_address in address if not warm(one_address)],
+        username,
+        password,
+        access_key,
+        secret_key,
+        verbose,
+        timed,
+        credentials_file,
+        password_command,
+    )
+    cache = response_cache(cache_ttl, refresh, no_cache)
+    on_timing = timings.record if timings is not None else None
+    engine = async_engine(use_async, insecure)
+    login = connector(
+        port,
+        username,
+        access_key,
+        secrets,
+        insecure,
+        engine,
+        timeout=timeout,
+        cache=cache,
+        sessions=session_store(keep_session),
+        on_timing=on_timing,
+        rate_limit=rate_limit,
+        max_in_flight=max_in_flight,
+        retries=retries,
+    )
+
+    def connect(one_address):
+        if not warm(one_address):
+            return login(one_address)
+        sccon = pool.get(one_address)
+        sccon.cache = cache
+        sccon.on_timing = on_timing
+        return sccon
+
+    def run(one_address, out):
+        with timed(one_address, "total"):
+            return run_on_address(
+                one_address, connect, task, out, logout=not warm(one_address)
+            )
 
-def dataframe_table(data, sortby=None, groupby=None, tablefmt=None):
-    pd.set_option("display.max_rows", None)
-    pd.set_option("display.max_columns", None)
-    pd.set_option("display.width", None)
-    pd.set_option("display.max_colwidth", None)
-    df = pd.DataFrame(data)
-    df.head()
-    if sortby:
-        df = df.sort_values(by=sortby)
-    if groupby:
-        df = df.groupby(groupby)[groupby[0]].count().reset_index(name="count")
-    s = pd.Series(list(range(1, len(df) + 1)))
-    df = df.set_index(s)
-    if tablefmt:
-        df = str(tabulate(df, headers="keys", tablefmt=tablefmt))
-    return df
+    try:
+        results = run_all(run, address, parallel)
+    finally:
+        if engine is not None:
+            engine.close()
+
+    if timings is not None:
+        if show_timings:
+            print(timings.summary(), file=sys.stderr)
+        if timings_file:
+            timings.trace_write(timings_file)
+
+    if not all(results):
+        sys.exit(1)
+
+
+def connection_pool(
+    address,
+    port,
+    username,
+    password,
+    access_key,
+    secret_key,
+    credentials_file,
+    password_command,
+    keep_session,
+    insecure,
+    verbose,
+    parallel,
+    timeout,
+    rate_limit,
+    max_in_flight,
+    retries,
+    use_async=False,
+    **kwargs,
+):
+    """
+    ConnectionPool with addresses logged in at the same time, which are
+    reported in order on stderr, other options of command are ignored
+    """
+    from tsccm.modules.pool import ConnectionPool
+
+    secrets = secrets_get(
+        address,
+        username,
+        password,
+        access_key,
+        secret_key,
+        verbose,
+        credentials_file=credentials_file,
+        password_command=password_command,
+    )
+    # session which ends while pool is idle is replaced with new login
+    engine = async_engine(use_async, insecure)
+    pool = ConnectionPool(
+        connector(
+            port,
+            username,
+            access_key,
+            secrets,
+            insecure,
+            engine,
+            timeout=timeout,
+            sessions=session_store(keep_session),
+            relogin=True,
+            rate_limit=rate_limit,
+            max_in_flight=max_in_flight,
+            retries=retries,
+        ),
+        engine,
+    )
+
+    def ready(sccon, one_address, out):
+        print(one_address, "ready", file=out)
+
+    def warm_up(one_address):
+        out = io.StringIO()
+        run_on_address(one_address, pool.get, ready, out, logout=False)
+        return out.getvalue()
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        for output in executor.map(warm_up, address):
+            sys.stderr.write(output)
+    return pool
+
+
+def connection_pool_close(pool):
+    from oauthlib.oauth2.rfc6749.errors import CustomOAuth2Error
+    from requests.exceptions import RequestException
+    from tenable.errors import APIError, ConnectionError
+    from tsccm.modules.tscapi import AsyncApiError
+
+    for one_address in pool:
+        try:
+            pool.pop(one_address).logout()
+        except (
+            ConnectionError,
+            RequestException,
+            APIError,
+            CustomOAuth2Error,
+            AsyncApiError,
+        ):
+            pass
+    if pool.engine is not None:
+        pool.engine.close()
+
+
+def run_watching(task, changes, watch, watch_max, **options):
+    """
+    task run on addresses every watch seconds, or less often up to watch_max
+    while changes finds nothing new, over sessions kept open until Ctrl+C
+    """
+    from tsccm.modules.watch import Interval
+
+    # tsccm shell has its own pool which stays open after watch
+    ctx = click.get_current_context()
+    pool = None
+    if ctx.obj is None:
+        ctx.obj = pool = connection_pool(**options)
+    # cached responses would hide changes
+    options["no_cache"] = True
+
+    interval = Interval(watch, watch_max)
+    try:
+        while True:
+            count = changes.count
+            started = time.monotonic()
+            try:
+                run_on_addresses(task, **options)
+            except SystemExit:
+                # address failed this time, its error is already printed
+                pass
+            sys.stdout.flush()
+            seconds = interval.next(changes.count > count)
+            time.sleep(max(seconds - (time.monotonic() - started), 0))
+    except KeyboardInterrupt:
+        print(file=sys.stderr)
+    finally:
+        if pool is not None:
+            connection_pool_close(pool)
+            ctx.obj = None
 
 
 PACKAGE_NAME = __about__.__package_name__
@@ -207,7 +1423,10 @@ def cli(ctx, update_check):
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--status", is_flag=True, help="Get server status")
 @click.option(
     "--ips",
@@ -215,31 +1434,14 @@ def cli(ctx, update_check):
     help="Use to see number of licensed IPs, active IPs and left IPs",
 )
 @click.option("--version", is_flag=True, help="Get server version")
-def server(
-    address, port, username, password, insecure, format, status, ips, version, verbose
-):
+@add_options(_watch_options)
+def server(format, status, ips, version, watch, watch_max, **options):
     """get Tenable.SC server info"""
+    from tsccm.modules.watch import Changes
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {} "
-                "Please check your connection.".format(one_address)
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. "
-                "Please make sure they are correct."
-            )
-            sys.exit(1)
+    changes = Changes()
 
+    def server_info(sccon, one_address, out):
         status_info = sccon.status_get()["response"]
         system_info = sccon.system_get()["response"]
 
@@ -249,7 +1451,12 @@ def server(
         left_ips_percentage = str(int(100 - 100 * int(active_ips) / int(licensed_ips)))
 
         if ips:
-            print(
+            info = {
+                "licensedIPs": int(licensed_ips),
+                "activeIPs": int(active_ips),
+                "leftIPs": left_ips,
+            }
+            line = (
                 one_address
                 + " "
                 + "{0:}".format(int(licensed_ips))
@@ -263,501 +1470,1384 @@ def server(
             )
         elif version:
             system_info_version = system_info["version"]
-            print(one_address, system_info_version)
+            info = {"version": system_info_version}
+            line = "{} {}".format(one_address, system_info_version)
         elif status:
             status_info_jobd = status_info["jobd"]
-            print(one_address, status_info_jobd)
+            info = {"jobd": status_info_jobd}
+            line = "{} {}".format(one_address, status_info_jobd)
         else:
-            print("No option given!")
+            print("No option given!", file=out)
+            return
+
+        if not watch:
+            print(line, file=out)
+            return
+        # server is one record which is printed again only when it changes
+        for event, record in changes.update(one_address, [{"id": one_address, **info}]):
+            if format == "ndjson":
+                polled = datetime.datetime.now().isoformat(timespec="seconds")
+                record = {"event": event, **info}
+                write_ndjson([record], out, address=one_address, time=polled)
+            else:
+                print(line, file=out)
 
-        sccon.logout()
+    if watch:
+        run_watching(server_info, changes, watch, watch_max, **options)
+    else:
+        run_on_addresses(server_info, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get users list")
-def user(address, port, username, password, insecure, format, list, verbose):
+def user(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC user info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {} "
-                "Please check your connection.".format(one_address)
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
-            )
-            sys.exit(1)
-
+    def user_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            users_on_tenablesc = sccon.user_get()["response"]
-            users_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "username": k["username"],
-                    "firstname": k["firstname"],
-                    "lastname": k["lastname"],
-                    "roleName": k["role"]["name"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "lastLogin": datetime.datetime.fromtimestamp(int(k["lastLogin"])),
-                    "locked": k["locked"],
-                    "failedLogins": k["failedLogins"],
-                }
-                for k in users_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(users_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(users_on_tenablesc).to_csv(), "\n")
-            else:
-                print(users_on_tenablesc)
+            response = sccon.user_get(fields=schema.fields("user", fields))
+            users_on_tenablesc = response["response"]
+            print_data(
+                one_address,
+                "user",
+                users_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
         else:
-            print("No option given!")
+            print("No option given!", file=out)
 
-        sccon.logout()
+    aggregation = aggregation_get("user", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(user_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get groups list")
-def group(address, port, username, password, insecure, format, list, verbose):
+def group(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC group info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
-                )
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
-            )
-            sys.exit(1)
-
+    def group_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            groups_on_tenablesc = sccon.group_get()["response"]
-            groups_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "userCount": k["userCount"],
-                }
-                for k in groups_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(groups_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(groups_on_tenablesc).to_csv(), "\n")
-            else:
-                print(groups_on_tenablesc)
+            response = sccon.group_get(fields=schema.fields("group", fields))
+            groups_on_tenablesc = response["response"]
+            print_data(
+                one_address,
+                "group",
+                groups_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
 
         else:
-            print("No option given!")
+            print("No option given!", file=out)
 
-        sccon.logout()
+    aggregation = aggregation_get("group", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(group_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get active scans list")
-def scan(address, port, username, password, insecure, format, list, verbose):
+def scan(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC active scan info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
-                )
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
-            )
-            sys.exit(1)
-
+    def scan_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            scans_on_tenablesc = sccon.scan_get()["response"]["manageable"]
-            scans_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "ownerUsername": k["owner"]["username"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "scheduleType": k["schedule"]["type"],
-                    "scheduleEnabled": k["schedule"]["enabled"],
-                    "scheduleRepeatRule": k["schedule"]["repeatRule"],
-                    "scheduleStart": k["schedule"]["start"],
-                    "scheduleNextRun": datetime.datetime.fromtimestamp(
-                        int(k["schedule"]["nextRun"])
-                    ),
-                }
-                for k in scans_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(scans_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(scans_on_tenablesc).to_csv(), "\n")
-            else:
-                print(scans_on_tenablesc)
+            response = sccon.scan_get(fields=schema.fields("scan", fields))
+            scans_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "scan",
+                scans_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
 
         else:
-            print("No option given!")
+            print("No option given!", file=out)
 
-        sccon.logout()
+    aggregation = aggregation_get("scan", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(scan_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get scans results list")
-def scan_result(address, port, username, password, insecure, format, list, verbose):
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Save scan results to local store requesting only those newer than "
+    "already stored or still running, with --list lists stored scan results",
+)
+@click.option(
+    "--store",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="local store file used by --sync",
+    show_default="store.sqlite in tsccm cache directory",
+)
+@click.option(
+    "--from",
+    "from_time",
+    type=click.DateTime(),
+    help="list scan results started since that local time",
+    show_default="--to minus 30 days",
+)
+@click.option(
+    "--to",
+    "to_time",
+    type=click.DateTime(),
+    help="list scan results started until that local time",
+    show_default="now",
+)
+@click.option(
+    "--window",
+    callback=duration_parse,
+    help="request --from/--to range in windows of that duration (e.g. 7d, 12h) "
+    "instead of in one request",
+)
+@click.option(
+    "--window-parallel",
+    default=4,
+    type=click.IntRange(min=1),
+    help="number of windows requested at the same time from one address",
+    show_default="4",
+)
+@click.option(
+    "--download",
+    multiple=True,
+    callback=ids_parse,
+    help="download files (zip with .nessus) of scan results of given "
+    "comma separated ids, can be repeated",
+)
+@click.option(
+    "--all-since",
+    type=click.DateTime(),
+    help="download files of all completed or partial scan results started "
+    "since that local time",
+)
+@click.option(
+    "--download-dir",
+    default="tsccm-downloads",
+    type=click.Path(file_okay=False),
+    help="directory to which files are downloaded, one subdirectory per "
+    "address, complete files (checked by checksum) are skipped and broken "
+    "ones resumed from their size",
+    show_default="tsccm-downloads",
+)
+@click.option(
+    "--download-parallel",
+    default=4,
+    type=click.IntRange(min=1),
+    help="number of files downloaded at the same time from one address",
+    show_default="4",
+)
+@click.option(
+    "--decompress",
+    is_flag=True,
+    help="keep .nessus file extracted from downloaded zip instead of zip",
+)
+@add_options(_watch_options)
+def scan_result(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    sync,
+    store,
+    from_time,
+    to_time,
+    window,
+    window_parallel,
+    download,
+    all_since,
+    download_dir,
+    download_parallel,
+    decompress,
+    watch,
+    watch_max,
+    **options,
+):
     """get Tenable.SC scan result info"""
+    from tsccm.modules.columnar import FORMATS
+    from tsccm.modules.watch import Changes
+
+    windowed = from_time is not None or to_time is not None or window is not None
+    if windowed:
+        if sync:
+            raise click.UsageError(
+                "--from, --to and --window can't be used with --sync"
+            )
+        range_end = int((to_time or datetime.datetime.now()).timestamp())
+        range_start = (
+            int(from_time.timestamp()) if from_time else range_end - 30 * 86400
+        )
+        if range_start > range_end:
+            raise click.UsageError("--from is later than --to")
+        # without --window whole range is one window
+        window = window or range_end - range_start + 1
+
+    if watch:
+        if not list or sync or windowed:
+            raise click.UsageError(
+                "--watch needs --list and can't be used with --sync, "
+                "--from, --to or --window"
+            )
+        if group_by or aggregations or sort_by or format in FORMATS:
+            raise click.UsageError(
+                "--watch can't be used with --group-by, --aggregate, --sort-by "
+                "nor --format {}".format(format)
+            )
+        if limit is not None or offset:
+            raise click.UsageError("--watch can't be used with --limit nor --offset")
+    changes = Changes()
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
+    if sync:
+        from tsccm.modules.store import Store
 
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
+        local_store = Store(store_path(store))
+
+    def scan_results_download(sccon, one_address, out):
+        from tsccm.modules.download import (
+            DOWNLOADABLE_STATUSES,
+            complete,
+            download as file_download,
+            extract,
+        )
+
+        ids = [*download]
+        if all_since is not None:
+            response = sccon.scan_results_get(
+                start_time=int(all_since.timestamp()), fields=["id", "status"]
+            )
+            ids += [
+                str(scan_result["id"])
+                for scan_result in response["response"]["manageable"]
+                if scan_result["status"] in DOWNLOADABLE_STATUSES
+            ]
+        ids = [*dict.fromkeys(ids)]
+        address_dir = os.path.join(download_dir, one_address)
+        os.makedirs(address_dir, exist_ok=True)
+
+        def download_one(scan_result_id):
+            archive = os.path.join(address_dir, "{}.zip".format(scan_result_id))
+            path = archive
+            if decompress:
+                path = os.path.join(address_dir, "{}.nessus".format(scan_result_id))
+            if complete(path):
+                return "skipped", os.path.getsize(path), path
+
+            # archive of run without --decompress is extracted, not downloaded
+            if not (decompress and complete(archive)):
+                size = file_download(
+                    lambda offset: sccon.scan_result_download(scan_result_id, offset),
+                    archive,
+                    sccon.scheduler.retries,
                 )
+            if decompress:
+                size = extract(archive, path)
+            return "downloaded", size, path
+
+        # files are streamed in chunks over the session of this login
+        with ThreadPoolExecutor(max_workers=download_parallel) as executor:
+            results = executor.map(download_one, ids)
+            for scan_result_id, (state, size, path) in zip(ids, results):
+                print(one_address, scan_result_id, state, size, path, file=out)
+
+    def scan_result_list(sccon, one_address, out):
+        if download or all_since is not None:
+            scan_results_download(sccon, one_address, out)
+            if not list and not sync:
+                return
+
+        if sync:
+            start_time = local_store.scan_results_since(one_address)
+            # nothing stored yet, whole history is requested
+            scan_results_on_tenablesc = sccon.scan_results_get(
+                start_time=start_time or 0
+            )["response"]["manageable"]
+            added, changed = local_store.save(
+                "scanResult", one_address, scan_results_on_tenablesc
+            )
+            if not list:
+                print(
+                    one_address,
+                    "{} new, {} changed scan results saved to {}".format(
+                        added, changed, local_store.path
+                    ),
+                    file=out,
+                )
+                return
+
+            scan_results_on_tenablesc = local_store.records("scanResult", one_address)
+            print_data(
+                one_address,
+                "scan_result",
+                scan_results_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
             )
-            sys.exit(1)
 
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
+        elif list and windowed:
+            scan_results_on_tenablesc = sccon.scan_results_windows(
+                range_start,
+                range_end,
+                window,
+                window_parallel,
+                schema.fields("scan_result", fields),
+            )
+            print_data(
+                one_address,
+                "scan_result",
+                scan_results_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
             )
-            sys.exit(1)
 
-        if list:
-            print(one_address)
-            scan_results_on_tenablesc = sccon.scan_results_get()["response"][
-                "manageable"
-            ]
-            scan_results_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "ownerUsername": k["owner"]["username"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "status": k["status"],
-                    "importStatus": k["importStatus"],
-                    "totalIPs": k["totalIPs"],
-                    "scannedIPs": k["scannedIPs"],
-                    "startTime": datetime.datetime.fromtimestamp(int(k["startTime"])),
-                    "finishTime": datetime.datetime.fromtimestamp(int(k["finishTime"])),
-                    "scanDuration": str(
-                        datetime.timedelta(
-                            seconds=int(
-                                0 if int(k["scanDuration"]) == -1 else k["scanDuration"]
-                            )
-                        )
-                    ),
-                }
-                for k in scan_results_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(scan_results_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(scan_results_on_tenablesc).to_csv(), "\n")
-            else:
-                print(scan_results_on_tenablesc)
+        elif list and watch:
+            response = sccon.scan_results_get(
+                fields=schema.fields("scan_result", fields)
+            )
+            print_changes(
+                one_address,
+                "scan_result",
+                changes.update(one_address, response["response"]["manageable"]),
+                format,
+                out,
+                fields,
+            )
 
-        else:
-            print("No option given!")
+        elif list:
+            response = sccon.scan_results_get(
+                fields=schema.fields("scan_result", fields)
+            )
+            scan_results_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "scan_result",
+                scan_results_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
 
-        sccon.logout()
+        else:
+            print("No option given!", file=out)
+
+    aggregation = aggregation_get(
+        "scan_result", fields, group_by, aggregations, sort_by
+    )
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        if watch:
+            run_watching(scan_result_list, changes, watch, watch_max, **options)
+        else:
+            run_on_addresses(scan_result_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get scan policies list")
-def policy(address, port, username, password, insecure, format, list, verbose):
+def policy(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC policy info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
-                )
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
-            )
-            sys.exit(1)
-
+    def policy_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            scan_policies_on_tenablesc = sccon.policy_get()["response"]["manageable"]
-            scan_policies_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "ownerUsername": k["owner"]["username"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "policyTemplateName": k["policyTemplate"]["name"],
-                }
-                for k in scan_policies_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(scan_policies_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(scan_policies_on_tenablesc).to_csv(), "\n")
-            else:
-                print(scan_policies_on_tenablesc)
+            response = sccon.policy_get(fields=schema.fields("policy", fields))
+            scan_policies_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "policy",
+                scan_policies_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
 
         else:
-            print("No option given!")
+            print("No option given!", file=out)
 
-        sccon.logout()
+    aggregation = aggregation_get("policy", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(policy_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get credentials list")
-def credential(address, port, username, password, insecure, format, list, verbose):
+def credential(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC credential info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
-                )
-            )
-            sys.exit(1)
-
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
-            )
-            sys.exit(1)
-
+    def credential_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            credentials_on_tenablesc = sccon.credential_get()["response"]["manageable"]
-            credentials_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "type": k["type"],
-                    "authType": k["typeFields"]["authType"],
-                    "ownerUsername": k["owner"]["username"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                }
-                for k in credentials_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(credentials_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(credentials_on_tenablesc).to_csv(), "\n")
-            else:
-                print(credentials_on_tenablesc)
+            response = sccon.credential_get(fields=schema.fields("credential", fields))
+            credentials_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "credential",
+                credentials_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
 
         else:
-            print("No option given!")
+            print("No option given!", file=out)
 
-        sccon.logout()
+    aggregation = aggregation_get("credential", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(credential_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
 @click.option("--list", is_flag=True, help="Get roles list")
-def role(address, port, username, password, insecure, format, list, verbose):
+def role(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
     """get Tenable.SC role info"""
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
-
-        try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
-                )
+    def role_list(sccon, one_address, out):
+        if list:
+            response = sccon.role_get(fields=schema.fields("role", fields))
+            roles_on_tenablesc = response["response"]
+            print_data(
+                one_address,
+                "role",
+                roles_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
             )
-            sys.exit(1)
 
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
+        else:
+            print("No option given!", file=out)
+
+    aggregation = aggregation_get("role", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(role_list, **options)
+
+
+@cli.command()
+@add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
+@click.option("--list", is_flag=True, help="Get audit files list")
+def audit_file(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    **options,
+):
+    """get Tenable.SC audit file info"""
+
+    def audit_file_list(sccon, one_address, out):
+        if list:
+            response = sccon.audit_file_get(fields=schema.fields("audit_file", fields))
+            audit_files_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "audit_file",
+                audit_files_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
             )
-            sys.exit(1)
 
+        else:
+            print("No option given!", file=out)
+
+    aggregation = aggregation_get("audit_file", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(audit_file_list, **options)
+
+
+@cli.command()
+@add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
+@click.option("--list", is_flag=True, help="Get asset lists")
+@add_options(_ip_set_options)
+def asset(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    contains,
+    overlap,
+    **options,
+):
+    """get Tenable.SC asset list info"""
+    ip_sets_check(format, list, contains, overlap)
+    ip_sets = {}
+
+    def asset_list(sccon, one_address, out):
         if list:
-            print(one_address)
-            roles_on_tenablesc = sccon.role_get()["response"]
-            roles_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "organizationCounts": k["organizationCounts"],
-                }
-                for k in roles_on_tenablesc
+            response = sccon.asset_get(fields=schema.fields("asset", fields))
+            assets_on_tenablesc = response["response"]["manageable"]
+            print_data(
+                one_address,
+                "asset",
+                assets_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
+        elif contains is not None or overlap:
+            assets_on_tenablesc = sccon.asset_get()["response"]["manageable"]
+            ip_sets[one_address] = [
+                (asset_record, ip_set_get("asset", asset_record))
+                for asset_record in assets_on_tenablesc
             ]
-            if format == "table":
-                print(dataframe_table(roles_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(roles_on_tenablesc).to_csv(), "\n")
-            else:
-                print(roles_on_tenablesc)
-
         else:
-            print("No option given!")
+            print("No option given!", file=out)
+
+    if contains is not None or overlap:
+        # addresses are compared with each other, so rows are written once
+        # all of them answered
+        try:
+            run_on_addresses(asset_list, **options)
+        except SystemExit:
+            # failed addresses are already reported, the rest is compared
+            ip_sets_write(ip_sets, contains, format, output, pager)
+            raise
+        ip_sets_write(ip_sets, contains, format, output, pager)
+        return
 
-        sccon.logout()
+    aggregation = aggregation_get("asset", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(asset_list, **options)
 
 
 @cli.command()
 @add_options(_login_options)
+@add_options(_format_options)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
 @add_options(_general_options)
-@click.option("--list", is_flag=True, help="Get audit files list")
-def audit_file(address, port, username, password, insecure, format, list, verbose):
-    """get Tenable.SC audit file info"""
+@add_options(_fanout_options)
+@add_options(_cache_options)
+@click.option("--list", is_flag=True, help="Get repositories list")
+@add_options(_ip_set_options)
+def repository(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    list,
+    contains,
+    overlap,
+    **options,
+):
+    """get Tenable.SC repository info"""
+    ip_sets_check(format, list, contains, overlap)
+    ip_sets = {}
 
-    for one_address in address:
-        one_password = password_check(one_address, username, password, verbose)
+    def repository_list(sccon, one_address, out):
+        if list:
+            response = sccon.repository_get(fields=schema.fields("repository", fields))
+            repositories_on_tenablesc = response["response"]
+            print_data(
+                one_address,
+                "repository",
+                repositories_on_tenablesc,
+                format,
+                out,
+                sccon.on_timing,
+                fields,
+                writer,
+                limit,
+                offset,
+            )
+        elif contains is not None or overlap:
+            repositories_on_tenablesc = sccon.repository_get()["response"]
+            ip_sets[one_address] = [
+                (repository_record, ip_set_get("repository", repository_record))
+                for repository_record in repositories_on_tenablesc
+            ]
+        else:
+            print("No option given!", file=out)
 
+    if contains is not None or overlap:
+        # addresses are compared with each other, so rows are written once
+        # all of them answered
         try:
-            sccon = TscApi(one_address, port, insecure)
-            sccon.login(username, one_password)
-        except ConnectionError as e:
-            print(
-                "Can't reach Tenable.sc API via {}. Please check your connection.".format(
-                    one_address
+            run_on_addresses(repository_list, **options)
+        except SystemExit:
+            # failed addresses are already reported, the rest is compared
+            ip_sets_write(ip_sets, contains, format, output, pager)
+            raise
+        ip_sets_write(ip_sets, contains, format, output, pager)
+        return
+
+    aggregation = aggregation_get("repository", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(repository_list, **options)
+
+
+snapshot_entities = {
+    "user": ("user_get", False),
+    "group": ("group_get", False),
+    "scan": ("scan_get", True),
+    "scan_result": ("scan_results_get", True),
+    "policy": ("policy_get", True),
+    "credential": ("credential_get", True),
+    "role": ("role_get", False),
+    "audit_file": ("audit_file_get", True),
+    "asset": ("asset_get", True),
+    "repository": ("repository_get", False),
+}
+
+
+@cli.command()
+@add_options(_login_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@add_options(_cache_options)
+@click.option(
+    "--output-dir",
+    "-o",
+    default="tsccm-snapshot",
+    type=click.Path(file_okay=False),
+    help="directory to which snapshot files are written, one subdirectory per address",
+    show_default="tsccm-snapshot",
+)
+@click.option(
+    "--format",
+    "-f",
+    default="csv",
+    type=click.Choice(["csv", "json"]),
+    help="data format of snapshot files",
+    show_default="csv",
+)
+def snapshot(output_dir, format, **options):
+    """get all Tenable.SC lists with one login per address"""
+
+    def snapshot_write(sccon, one_address, out):
+        address_dir = os.path.join(output_dir, one_address)
+        os.makedirs(address_dir, exist_ok=True)
+
+        # all lists are requested at once over the session of this login
+        with ThreadPoolExecutor(max_workers=len(snapshot_entities)) as executor:
+            futures = {
+                entity: executor.submit(getattr(sccon, getter))
+                for entity, (getter, _) in snapshot_entities.items()
+            }
+            for entity, (_, manageable) in snapshot_entities.items():
+                data = futures[entity].result()["response"]
+                if manageable:
+                    data = data["manageable"]
+                path = os.path.join(address_dir, "{}.{}".format(entity, format))
+                started = time.perf_counter()
+                rows = TimedIterator(schema.rows(entity, data))
+                count = write_data(rows, format, path)
+                output_timings(
+                    sccon.on_timing, one_address, entity, started, rows.seconds
                 )
-            )
-            sys.exit(1)
+                print(one_address, entity, count, path, file=out)
 
-        except CustomOAuth2Error as e:
-            print(
-                "Can't login to Tenable.sc API with supplied credentials. Please make sure they are correct."
+    run_on_addresses(snapshot_write, **options)
+
+
+@cli.command()
+@add_options(_login_options)
+@click.option(
+    "--format",
+    "-f",
+    default="csv",
+    type=click.Choice(
+        ["table", "csv", "json", "ndjson", "parquet", "feather", "arrow"]
+    ),
+    help="data format, written page by page in bounded memory, table keeps "
+    "first {} rows to size its columns and is shown in $PAGER with --pager, "
+    "parquet, feather (Arrow IPC file) and arrow (Arrow IPC stream) go to "
+    "--output".format(SAMPLE_ROWS),
+    show_default="csv",
+)
+@add_options(_fields_options)
+@add_options(_output_options)
+@add_options(_aggregate_options)
+@add_options(_page_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@click.option(
+    "--filter",
+    "filters",
+    multiple=True,
+    callback=analysis_filters_parse,
+    help="analysis filter NAME=VALUE (or !=, >=, <=, ~=), e.g. severity=3,4 "
+    "or lastSeen=0:30, can be repeated",
+)
+@click.option(
+    "--source-type",
+    default="cumulative",
+    type=click.Choice(["cumulative", "patched"]),
+    help="cumulative (current) or patched (mitigated) vulnerabilities",
+    show_default="cumulative",
+)
+@click.option(
+    "--page-size",
+    default=1000,
+    type=click.IntRange(min=1),
+    help="vulnerabilities requested at once",
+    show_default="1000",
+)
+@click.option(
+    "--page-parallel",
+    default=4,
+    type=click.IntRange(min=1),
+    help="number of next pages requested while current one is written",
+    show_default="4",
+)
+def analysis(
+    format,
+    fields,
+    output,
+    compression,
+    group_by,
+    aggregations,
+    sort_by,
+    limit,
+    offset,
+    pager,
+    filters,
+    source_type,
+    page_size,
+    page_parallel,
+    **options,
+):
+    """get Tenable.SC vulnerability analysis (vulndetails)"""
+
+    def analysis_export(sccon, one_address, out):
+        # only pages of --offset/--limit rows are requested, unless they
+        # are rows of aggregation result
+        aggregated = isinstance(writer, Aggregation)
+        pages = sccon.analysis_pages(
+            filters,
+            page_size,
+            page_parallel,
+            source_type=source_type,
+            start=0 if aggregated else offset,
+            end=None if aggregated or limit is None else offset + limit,
+        )
+        print_data(
+            one_address,
+            "analysis",
+            itertools.chain.from_iterable(pages),
+            format,
+            out,
+            sccon.on_timing,
+            fields,
+            writer,
+            skipped=0 if aggregated else offset,
+        )
+
+    aggregation = aggregation_get("analysis", fields, group_by, aggregations, sort_by)
+    with data_output(
+        format, output, compression, aggregation, limit, offset, pager
+    ) as writer:
+        run_on_addresses(analysis_export, **options)
+
+
+cli.add_command(analysis, name="vulns")
+
+
+@cli.command()
+@add_options(_login_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@click.option(
+    "--store",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="local store file which tsccm query reads",
+    show_default="store.sqlite in tsccm cache directory",
+)
+@click.option(
+    "--entity",
+    "entities",
+    multiple=True,
+    type=click.Choice([*snapshot_entities, "analysis"]),
+    help="list to save, can be repeated",
+    show_default="all but analysis",
+)
+def sync(store, entities, **options):
+    """save Tenable.SC lists to local store to query them offline"""
+    from tsccm.modules.store import Store
+
+    local_store = Store(store_path(store))
+    entities = [*dict.fromkeys(entities)] or [*snapshot_entities]
+
+    def fetch(sccon, one_address, entity):
+        if entity == "scan_result":
+            # only scan results which could change since last sync are
+            # requested, table gets all stored ones
+            start_time = local_store.scan_results_since(one_address)
+            scan_results = sccon.scan_results_get(start_time=start_time or 0)
+            local_store.save(
+                "scanResult", one_address, scan_results["response"]["manageable"]
             )
-            sys.exit(1)
+            return [*local_store.records("scanResult", one_address)]
+        if entity == "analysis":
+            return itertools.chain.from_iterable(sccon.analysis_pages())
+        getter, manageable = snapshot_entities[entity]
+        data = getattr(sccon, getter)()["response"]
+        return data["manageable"] if manageable else data
+
+    def sync_address(sccon, one_address, out):
+        # all lists are requested at once over the session of this login
+        with ThreadPoolExecutor(max_workers=len(entities)) as executor:
+            futures = {
+                entity: executor.submit(fetch, sccon, one_address, entity)
+                for entity in entities
+            }
+            for entity in entities:
+                started = time.perf_counter()
+                count = local_store.table_save(
+                    entity, one_address, futures[entity].result()
+                )
+                if sccon.on_timing is not None:
+                    sccon.on_timing(
+                        one_address, "render", started, time.perf_counter(), entity
+                    )
+                print(one_address, entity, count, local_store.path, file=out)
 
-        if list:
-            print(one_address)
-            audit_files_on_tenablesc = sccon.audit_file_get()["response"]["manageable"]
-            audit_files_on_tenablesc = [
-                {
-                    "id": k["id"],
-                    "name": k["name"],
-                    "createdTime": datetime.datetime.fromtimestamp(
-                        int(k["createdTime"])
-                    ),
-                    "modifiedTime": datetime.datetime.fromtimestamp(
-                        int(k["modifiedTime"])
-                    ),
-                    "filename": k["filename"],
-                    "originalFilename": k["originalFilename"],
-                }
-                for k in audit_files_on_tenablesc
-            ]
-            if format == "table":
-                print(dataframe_table(audit_files_on_tenablesc), "\n")
-            elif format == "csv":
-                print(dataframe_table(audit_files_on_tenablesc).to_csv(), "\n")
-            else:
-                print(audit_files_on_tenablesc)
+    run_on_addresses(sync_address, **options)
 
-        else:
+
+@cli.command()
+@add_options(_login_options)
+@add_options(_general_options)
+@add_options(_fanout_options)
+@click.option(
+    "--store",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="local store file with plugin index",
+    show_default="store.sqlite in tsccm cache directory",
+)
+@add_options(_local_output_options)
+@click.option(
+    "--update",
+    is_flag=True,
+    help="request plugins modified since last update and save them to local "
+    "index, index of address is built with all plugins on its first use",
+)
+@click.option(
+    "--id",
+    "ids",
+    multiple=True,
+    callback=ids_parse,
+    help="show plugins of given comma separated ids, can be repeated",
+)
+@click.option(
+    "--family",
+    "families",
+    multiple=True,
+    help='show plugins of family, e.g. "Web Servers", can be repeated',
+)
+@click.option(
+    "--search",
+    help='show plugins with all words of it in their names, e.g. "apache 2.4"',
+)
+@click.option("--list", is_flag=True, help="show all plugins")
+@click.option(
+    "--page-size",
+    default=1000,
+    type=click.IntRange(min=1),
+    help="plugins requested at once",
+    show_default="1000",
+)
+@click.option(
+    "--page-parallel",
+    default=4,
+    type=click.IntRange(min=1),
+    help="number of next pages requested while current one is saved",
+    show_default="4",
+)
+def plugin(
+    store,
+    format,
+    output,
+    pager,
+    update,
+    ids,
+    families,
+    search,
+    list,
+    page_size,
+    page_parallel,
+    **options,
+):
+    """get Tenable.SC plugins from local index which is updated only with
+    changed plugins"""
+    from tsccm.modules.store import Store
+
+    local_store = Store(store_path(store))
+    address = options["address"]
+
+    def plugin_update(sccon, one_address, out):
+        synced = local_store.sync_get(one_address, "plugin")
+        since = synced[2] if synced is not None else None
+        pages = sccon.plugin_pages(page_size, page_parallel, since)
+        # every page is saved on its own, so index is not locked while next
+        # pages are requested, until last page is saved index isn't updated
+        # and next update starts again from since
+        count = 0
+        for page in pages:
+            local_store.table_save(
+                "plugin", one_address, page, replace=since is None and not count
+            )
+            count += len(page)
+            since = max(
+                [since or 0]
+                + [int(one_plugin.get("modifiedTime") or 0) for one_plugin in page]
+            )
+        local_store.synced(one_address, "plugin", since or None)
+        print(one_address, "plugin", count, local_store.path, file=out)
+
+    outdated = [
+        one_address
+        for one_address in address
+        if update or local_store.sync_get(one_address, "plugin") is None
+    ]
+    if outdated:
+        # progress goes to stderr, so stdout has only found plugins
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                run_on_addresses(plugin_update, **dict(options, address=outdated))
+            except SystemExit:
+                if not (ids or families or search or list):
+                    raise
+
+    if not (ids or families or search or list):
+        if not outdated:
             print("No option given!")
+        return
+
+    rows = local_store.plugins_find(address, ids, families, (search or "").split())
+    with data_destination(format, output, None, pager):
+        write_rows(rows, format, sys.stdout)
+
+
+SYNC_QUERY = "SELECT * FROM sync ORDER BY address, entity"
+
+
+@cli.command(
+    epilog="Every list saved by tsccm sync is table named like it (user, group, "
+    "scan, scan_result, policy, credential, role, audit_file, analysis) with "
+    "address column and columns of --fields of its command. Table sync has "
+    "address, entity, updated_at and rows of every saved list.\n\n"
+    "Credentials of users who didn't login for 90 days:\n\n"
+    'tsccm query "SELECT c.address, c.name, c.ownerUsername FROM credential c '
+    "JOIN user u ON u.address = c.address AND u.username = c.ownerUsername "
+    "WHERE u.lastLogin IS NULL OR u.lastLogin < datetime('now', 'localtime', "
+    "'-90 days')\""
+)
+@click.argument("sql", required=False)
+@click.option(
+    "--store",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="local store file saved by tsccm sync",
+    show_default="store.sqlite in tsccm cache directory",
+)
+@add_options(_local_output_options)
+def query(sql, store, format, output, pager):
+    """run SQL query on local store saved by tsccm sync, without Tenable.SC,
+    without SQL show what is saved"""
+    import sqlite3
+    from tsccm.modules.store import Store
+
+    path = store_path(store)
+    if not os.path.exists(path):
+        raise click.UsageError("{} doesn't exist, run tsccm sync first".format(path))
+
+    rows = Store(path, readonly=True).query(sql or SYNC_QUERY)
+    try:
+        # wrong query fails on first row, before anything is printed
+        rows = itertools.chain([*itertools.islice(rows, 1)], rows)
+    except sqlite3.Error as e:
+        raise click.UsageError(str(e))
+
+    with data_destination(format, output, None, pager):
+        write_rows(rows, format, sys.stdout)
+
+
+SHELL_EXIT = ("exit", "quit")
+
+
+def shell_defaults(command, args, defaults):
+    """options of defaults which command has and which are not in args"""
+    given = {arg.split("=")[0] for arg in args if arg.startswith("-")}
+    options = {opt: param for param in command.params for opt in param.opts}
+    missing = []
+    for opt, value in defaults:
+        param = options.get(opt)
+        if param is None or given.intersection(param.opts):
+            continue
+        missing += [opt] if value is None else [opt, str(value)]
+    return missing
+
+
+@cli.command()
+@add_options(_login_options)
+@click.option("-v", "--verbose", count=True)
+@add_options(_fanout_options)
+def shell(
+    address,
+    port,
+    username,
+    password,
+    access_key,
+    secret_key,
+    credentials_file,
+    password_command,
+    keep_session,
+    insecure,
+    verbose,
+    parallel,
+    timeout,
+    rate_limit,
+    max_in_flight,
+    retries,
+    use_async,
+):
+    """run commands on addresses logged in only once, e.g. user --list"""
+    pool = connection_pool(
+        address,
+        port,
+        username,
+        password,
+        access_key,
+        secret_key,
+        credentials_file,
+        password_command,
+        keep_session,
+        insecure,
+        verbose,
+        parallel,
+        timeout,
+        rate_limit,
+        max_in_flight,
+        retries,
+        use_async,
+    )
+
+    # commands get logged in addresses and login options of shell unless
+    # they are given, prompts of login options would read next commands
+    defaults = [("--port", port), ("--username", username)]
+    defaults += [
+        ("--address", one_address) for one_address in address if one_address in pool
+    ]
+    if access_key:
+        defaults.append(("--access-key", access_key))
+    if credentials_file:
+        defaults.append(("--credentials-file", credentials_file))
+    if password_command:
+        defaults.append(("--password-command", password_command))
+    if insecure:
+        defaults.append(("--insecure", None))
+
+    try:
+        import readline  # noqa: F401 - line editing and history of input()
+    except ImportError:
+        pass
+
+    interactive = sys.stdin.isatty()
+    if interactive:
+        print(
+            'type command without "tsccm", e.g. user --list, or exit', file=sys.stderr
+        )
+    while True:
+        try:
+            line = input("tsccm> " if interactive else "")
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+            continue
+
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            print("Error: {}".format(e), file=sys.stderr)
+            continue
+        if not args:
+            continue
+        if args[0] in SHELL_EXIT:
+            break
+        if args[0] == "shell":
+            print("Error: already in tsccm shell", file=sys.stderr)
+            continue
+
+        command = cli.commands.get(args[0])
+        if command is not None and command is not shell:
+            args += shell_defaults(command, args[1:], defaults)
+        try:
+            cli.main(args, prog_name="tsccm", standalone_mode=False, obj=pool)
+        except click.ClickException as e:
+            e.show()
+        except click.Abort:
+            print("Aborted!", file=sys.stderr)
+        except SystemExit:
+            # command failed on some address, its error is already printed
+            pass
+        sys.stdout.flush()
 
-        sccon.logout()
+    connection_pool_close(pool)
 
 
 def main():
 
-    print("tsccm v.{}".format(__version__))
+    print("tsccm v.{}".format(__version__), file=sys.stderr)
     cli()
 
 
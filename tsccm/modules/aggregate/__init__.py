@@ -0,0 +1,153 @@
+import threading
+
+# column with address of every row of aggregated addresses
+HOST = "host"
+
+FUNCTIONS = ("count", "sum", "min", "max")
+
+DESCENDING = ":desc"
+
+
+def aggregation_parse(value):
+    """count or FUNCTION:COLUMN, e.g. sum:totalIPs, into (function, column)"""
+    function, _, column = value.partition(":")
+    if function not in FUNCTIONS or (function == "count") == bool(column):
+        raise ValueError(
+            "{} is not count nor FUNCTION:COLUMN with function {}".format(
+                value, ", ".join(FUNCTIONS[1:])
+            )
+        )
+    return function, column or None
+
+
+def aggregation_name(function, column):
+    return function if column is None else "{}_{}".format(function, column)
+
+
+def numeric(values):
+    """text column as numbers if all its values are numbers"""
+    import pandas as pd
+
+    if not pd.api.types.is_object_dtype(values) and not pd.api.types.is_string_dtype(
+        values
+    ):
+        return values
+    numbers = pd.to_numeric(values, errors="coerce").convert_dtypes()
+    if numbers.notna().sum() != values.notna().sum():
+        return values
+    return numbers
+
+
+class Aggregation:
+    """
+    frames of many addresses put together into one with host column, then
+    grouped, aggregated and sorted in one go instead of per address
+    """
+
+    def __init__(self, group_by=(), aggregations=(), sort_by=()):
+        self.group_by = list(group_by)
+        # (function, column) pairs, count of rows by default when grouped
+        self.aggregations = list(aggregations)
+        if self.group_by and not self.aggregations:
+            self.aggregations = [("count", None)]
+        self.sort_by = list(sort_by)
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def columns(self, columns):
+        """columns of result of frames with given columns, ValueError if
+        options refer to unknown ones"""
+        available = [HOST] + [column for column in columns if column != HOST]
+        if self.aggregations:
+            result = self.group_by + [
+                aggregation_name(*aggregation) for aggregation in self.aggregations
+            ]
+        else:
+            result = available
+
+        used = self.group_by + [column for _, column in self.aggregations if column]
+        unknown = [column for column in used if column not in available]
+        unknown += [column for column in self.sort_columns() if column not in result]
+        if unknown:
+            raise ValueError(
+                "unknown column {}, available columns: {}".format(
+                    ", ".join(dict.fromkeys(unknown)),
+                    ", ".join(
+                        column
+                        for column in dict.fromkeys(available + result)
+                        if column not in unknown
+                    ),
+                )
+            )
+        return result
+
+    def sort_columns(self):
+        return [column.removesuffix(DESCENDING) for column in self.sort_by]
+
+    def add(self, host, df):
+        df.insert(0, HOST, host)
+        with self.lock:
+            self.frames[host] = df
+
+    def result(self, hosts=()):
+        """one frame of all added ones, in order of hosts if given"""
+        import numpy as np
+        import pandas as pd
+
+        order = {host: i for i, host in enumerate(hosts)}
+        with self.lock:
+            frames = sorted(
+                self.frames.items(), key=lambda item: order.get(item[0], len(order))
+            )
+        if not frames:
+            return pd.DataFrame(columns=[HOST])
+        df = pd.concat([frame for _, frame in frames], ignore_index=True)
+        self.columns(df.columns)
+
+        if self.aggregations:
+            for function, column in self.aggregations:
+                if column is not None:
+                    df[column] = numeric(df[column])
+            keys = self.group_by or np.zeros(len(df), dtype=int)
+            grouped = df.groupby(keys, dropna=False, sort=bool(self.group_by))
+            aggregated = {}
+            for function, column in self.aggregations:
+                name = aggregation_name(function, column)
+                try:
+                    if function == "count":
+                        aggregated[name] = grouped.size()
+                    else:
+                        aggregated[name] = getattr(grouped[column], function)()
+                except TypeError:
+                    raise ValueError("can't {} column {}".format(function, column))
+            df = pd.DataFrame(aggregated)
+            df = df.reset_index() if self.group_by else df.reset_index(drop=True)
+
+        if self.sort_by:
+            df = df.sort_values(
+                by=self.sort_columns(),
+                ascending=[not column.endswith(DESCENDING) for column in self.sort_by],
+                kind="stable",
+                key=numeric,
+                ignore_index=True,
+            )
+        return df
+
+
+def rows(df):
+    """rows of frame with the same values as tsccm.modules.schema.rows()"""
+    import pandas as pd
+
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.Series(
+                list(values.dt.to_pydatetime()), index=values.index, dtype=object
+            )
+        elif pd.api.types.is_timedelta64_dtype(values):
+            values = pd.Series(
+                list(values.dt.to_pytimedelta()), index=values.index, dtype=object
+            )
+        columns[name] = values.astype(object).where(values.notna(), None)
+    return pd.DataFrame(columns, index=df.index).to_dict("records")
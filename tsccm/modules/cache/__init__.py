@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from tsccm.utilities import sqlite_connect
+
+# seconds for which response is valid if no TTL is given for its endpoint
+DEFAULT_TTL = 300
+
+# bytes of response bodies kept on disk, least recently used are evicted first
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# endpoints which change all the time are cached only with their own TTL
+VOLATILE_ENDPOINTS = {"status"}
+
+
+class ResponseCache:
+
+    def __init__(self, path, ttl=None, max_size=DEFAULT_MAX_SIZE, refresh=False):
+        self.path = path
+        self.ttl = ttl or {}
+        self.max_size = max_size
+        self.refresh = refresh
+
+        # responses (users, credentials, roles) are readable only by owner,
+        # like kept sessions, file is created before sqlite does it
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+        with self.connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS response ("
+                "key TEXT PRIMARY KEY, "
+                "stored_at REAL NOT NULL, "
+                "used_at REAL NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "body TEXT NOT NULL)"
+            )
+
+    def connect(self):
+        return sqlite_connect(self.path)
+
+    def endpoint_ttl(self, path):
+        endpoint = path.split("?")[0]
+        if endpoint in self.ttl:
+            return self.ttl[endpoint]
+        if endpoint in VOLATILE_ENDPOINTS:
+            return 0
+        return self.ttl.get(None, DEFAULT_TTL)
+
+    @staticmethod
+    def key(host, port, username, path):
+        return "{}:{}/{}@{}".format(host, port, path, username)
+
+    def get(self, host, port, username, path):
+        ttl = self.endpoint_ttl(path)
+        if self.refresh or ttl <= 0:
+            return None
+
+        key = self.key(host, port, username, path)
+        now = time.time()
+        with self.connect() as db:
+            row = db.execute(
+                "SELECT stored_at, body FROM response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[0] > ttl:
+                return None
+            db.execute("UPDATE response SET used_at = ? WHERE key = ?", (now, key))
+
+        return json.loads(row[1])
+
+    def set(self, host, port, username, path, response_json):
+        if self.endpoint_ttl(path) <= 0:
+            return
+
+        key = self.key(host, port, username, path)
+        body = json.dumps(response_json)
+        now = time.time()
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(body), body),
+            )
+            self.evict(db)
+
+    def evict(self, db):
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()
+        if total <= self.max_size:
+            return
+
+        evicted = []
+        for key, size in db.execute(
+            "SELECT key, size FROM response ORDER BY used_at"
+        ).fetchall():
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        db.executemany("DELETE FROM response WHERE key = ?", evicted)
+
+    def clear(self):
+        with self.connect() as db:
+            db.execute("DELETE FROM response")
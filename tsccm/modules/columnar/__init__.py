@@ -0,0 +1,62 @@
+import threading
+
+# parquet - Apache Parquet file, feather - Arrow IPC file (Feather v2),
+# arrow - Arrow IPC stream
+FORMATS = ("parquet", "feather", "arrow")
+
+DEFAULT_COMPRESSION = "zstd"
+
+# Arrow IPC compresses only with lz4 or zstd, Parquet with any of them
+COMPRESSIONS = {
+    "parquet": ("zstd", "lz4", "snappy", "gzip", "none"),
+    "feather": ("zstd", "lz4", "none"),
+    "arrow": ("zstd", "lz4", "none"),
+}
+
+# rows converted and written at once, one Parquet row group or IPC batch
+BATCH_SIZE = 10000
+
+
+class ColumnarWriter:
+    """pyarrow tables of many threads written to one file as they come"""
+
+    def __init__(self, path, format="parquet", compression=DEFAULT_COMPRESSION):
+        if compression not in COMPRESSIONS[format]:
+            raise ValueError(
+                "{} compression is not supported by {}, use one of: {}".format(
+                    compression, format, ", ".join(COMPRESSIONS[format])
+                )
+            )
+        self.path = path
+        self.format = format
+        self.compression = None if compression == "none" else compression
+        self.writer = None
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def open(self, schema):
+        import pyarrow as pa
+
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            return pq.ParquetWriter(self.path, schema, compression=self.compression)
+
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        if self.format == "feather":
+            return pa.ipc.new_file(self.path, schema, options=options)
+        return pa.ipc.new_stream(self.path, schema, options=options)
+
+    def write(self, table):
+        with self.lock:
+            # schema is known only from first table
+            if self.writer is None:
+                self.writer = self.open(table.schema)
+            self.writer.write_table(table)
+            self.rows += table.num_rows
+
+    def close(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
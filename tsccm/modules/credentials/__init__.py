@@ -0,0 +1,141 @@
+import netrc
+import os
+import re
+import stat
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# environment variables with password of one address, e.g.
+# TSCCM_PASSWORD_192_168_1_10, or of all addresses
+PASSWORD_ENV = "TSCCM_PASSWORD"
+SECRET_KEY_ENV = "TSCCM_SECRET_KEY"
+
+# seconds to wait for password command of one address
+COMMAND_TIMEOUT = 60
+
+
+def environment_name(prefix, address):
+    return "{}_{}".format(prefix, re.sub(r"\W", "_", address).upper())
+
+
+class EnvironmentProvider:
+    """secret from PREFIX_ADDRESS or PREFIX environment variable"""
+
+    def __init__(self, prefix=PASSWORD_ENV):
+        self.prefix = prefix
+
+    def __call__(self, address, username):
+        return os.environ.get(environment_name(self.prefix, address)) or os.environ.get(
+            self.prefix
+        )
+
+
+class FileProvider:
+    """secret from netrc file (machine ADDRESS login USERNAME password SECRET)
+    which only its owner can access"""
+
+    def __init__(self, path):
+        if os.name == "posix" and os.stat(path).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            raise ValueError(
+                "{} can be accessed by other users, run: chmod 600 {}".format(
+                    path, path
+                )
+            )
+        try:
+            self.netrc = netrc.netrc(path)
+        except netrc.NetrcParseError as e:
+            raise ValueError(str(e))
+
+    def __call__(self, address, username):
+        authenticators = self.netrc.authenticators(address)
+        if authenticators is None:
+            return None
+        login, _, password = authenticators
+        if login and login != username:
+            return None
+        return password
+
+
+class CommandProvider:
+    """secret from first line printed by shell command run with TSCCM_ADDRESS
+    and TSCCM_USERNAME environment variables, e.g. pass show tsc/$TSCCM_ADDRESS"""
+
+    def __init__(self, command, timeout=COMMAND_TIMEOUT):
+        self.command = command
+        self.timeout = timeout
+
+    def __call__(self, address, username):
+        try:
+            result = subprocess.run(
+                self.command,
+                shell=True,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+                env=dict(os.environ, TSCCM_ADDRESS=address, TSCCM_USERNAME=username),
+            )
+        except subprocess.TimeoutExpired:
+            raise ValueError(
+                "password command didn't finish in {} seconds for {}".format(
+                    self.timeout, address
+                )
+            )
+        if result.returncode:
+            raise ValueError(
+                "password command failed for {}: {}".format(
+                    address, result.stderr.strip() or result.returncode
+                )
+            )
+        lines = result.stdout.splitlines()
+        return lines[0] if lines else None
+
+
+class CredentialResolver:
+    """
+    secrets of many addresses found by first of providers which has them,
+    looked up at the same time, once per address and username, so run
+    never waits for them between requests
+    """
+
+    def __init__(self, providers, parallel=8):
+        # providers are (name, provider(address, username)) in order of use
+        self.providers = providers
+        self.parallel = parallel
+        self.found = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, address, username):
+        key = (address, username)
+        with self.lock:
+            if key in self.found:
+                return self.found[key]
+
+        found = (None, None)
+        for name, provider in self.providers:
+            secret = provider(address, username)
+            if secret:
+                found = (secret, name)
+                break
+
+        with self.lock:
+            return self.found.setdefault(key, found)
+
+    def resolve(self, addresses, username, on_lookup=None):
+        """{address: (secret, provider name)}, (None, None) if none has it,
+        on_lookup(address) returns context manager around lookup of address"""
+
+        def lookup(address):
+            if on_lookup is None:
+                return self.lookup(address, username)
+            with on_lookup(address):
+                return self.lookup(address, username)
+
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+        with ThreadPoolExecutor(
+            max_workers=min(self.parallel, len(addresses))
+        ) as executor:
+            return dict(zip(addresses, executor.map(lookup, addresses)))
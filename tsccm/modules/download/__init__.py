@@ -0,0 +1,135 @@
+import contextlib
+import hashlib
+import itertools
+import os
+import re
+import shutil
+import zipfile
+
+from requests.exceptions import ChunkedEncodingError, RequestException
+
+# bytes read from response or archive and written at once, so memory doesn't
+# depend on size of file
+CHUNK_SIZE = 1024 * 1024
+
+# file is written as FILE.part until it's complete, then its checksum is
+# written to FILE.sha256 (sha256sum format, can be checked with sha256sum -c)
+PART = ".part"
+CHECKSUM = ".sha256"
+
+DEFAULT_RETRIES = 3
+
+# statuses of scan results which have file to download
+DOWNLOADABLE_STATUSES = ("Completed", "Partial")
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def checksum_write(path, digest):
+    with open(path + CHECKSUM, "w") as f:
+        f.write("{}  {}\n".format(digest, os.path.basename(path)))
+
+
+def complete(path):
+    """
+    True if path was completely written before: its checksum file exists and
+    checksum of its content is the same
+    """
+    if not os.path.exists(path) or not os.path.exists(path + CHECKSUM):
+        return False
+    with open(path + CHECKSUM) as f:
+        digest = f.read().split(" ")[0]
+    return digest == file_sha256(path)
+
+
+def zip_valid(path):
+    """False if file is zip archive with broken content, e.g. parts of two
+    different archives when server built it again before transfer resumed"""
+    with open(path, "rb") as f:
+        if f.read(4) != b"PK\x03\x04":
+            return True
+    try:
+        with zipfile.ZipFile(path) as z:
+            return z.testzip() is None
+    except zipfile.BadZipFile:
+        return False
+
+
+def total_size(response, offset):
+    """size of whole file according to response headers, None if unknown"""
+    content_range = re.fullmatch(
+        r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", "")
+    )
+    if content_range:
+        return int(content_range.group(1))
+    length = response.headers.get("Content-Length")
+    if length is not None and "Content-Encoding" not in response.headers:
+        return offset + int(length)
+    return None
+
+
+def download(
+    request, path, retries=DEFAULT_RETRIES, chunk_size=CHUNK_SIZE, check=zip_valid
+):
+    """
+    body of streamed response of request(offset) written to path chunk by
+    chunk, through path.part which is continued from its size after broken
+    transfer (or in next run) if server answers with 206, and written again
+    otherwise or if check(path.part) fails, returns size of file
+    """
+    part = path + PART
+    for attempt in itertools.count():
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        try:
+            with contextlib.closing(request(offset)) as response:
+                if response.status_code != 206:
+                    # server sent whole file
+                    offset = 0
+                expected = total_size(response, offset)
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+            size = os.path.getsize(part)
+            if expected is not None and size != expected:
+                raise ChunkedEncodingError(
+                    "{} has {} of {} bytes".format(part, size, expected)
+                )
+            if check is not None and not check(part):
+                os.remove(part)
+                raise ChunkedEncodingError("{} is broken".format(part))
+        except RequestException:
+            if attempt >= retries:
+                raise
+            continue
+        break
+
+    os.replace(part, path)
+    checksum_write(path, file_sha256(path))
+    return size
+
+
+def extract(archive, path, chunk_size=CHUNK_SIZE):
+    """
+    first file of zip archive written to path chunk by chunk, or archive
+    moved to path if it's not zip, returns size of file
+    """
+    part = path + PART
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as z:
+            with z.open(z.infolist()[0]) as source, open(part, "wb") as f:
+                shutil.copyfileobj(source, f, chunk_size)
+        os.remove(archive)
+    else:
+        os.replace(archive, part)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(archive + CHECKSUM)
+
+    os.replace(part, path)
+    checksum_write(path, file_sha256(path))
+    return os.path.getsize(path)
@@ -0,0 +1,175 @@
+import bisect
+import functools
+import heapq
+import ipaddress
+import re
+
+# IPv6 addresses are numbered after all IPv4 ones, so intervals of both
+# versions are kept in one ordered space without overlapping
+IPV6_OFFSET = 2**32
+
+SEPARATORS = re.compile(r"[\s,]+")
+
+
+def address_int(text):
+    address = ipaddress.ip_address(text.strip())
+    return int(address) + (IPV6_OFFSET if address.version == 6 else 0)
+
+
+def int_address(value):
+    if value < IPV6_OFFSET:
+        return ipaddress.IPv4Address(value)
+    return ipaddress.IPv6Address(value - IPV6_OFFSET)
+
+
+def interval_parse(text):
+    """
+    (first, last) address of single address, CIDR network or range, e.g.
+    10.0.0.1, 10.0.0.0/24, 10.0.0.1-10.0.0.50 or 10.0.0.1-50
+    """
+    if "/" in text:
+        network = ipaddress.ip_network(text, strict=False)
+        offset = IPV6_OFFSET if network.version == 6 else 0
+        return (
+            int(network.network_address) + offset,
+            int(network.broadcast_address) + offset,
+        )
+    if "-" in text:
+        first, last = text.split("-", 1)
+        # last address of IPv4 range can be given only by its last octet
+        if last.strip().isdigit() and "." in first:
+            last = first.strip().rsplit(".", 1)[0] + "." + last.strip()
+        first, last = address_int(first), address_int(last)
+        if (first < IPV6_OFFSET) != (last < IPV6_OFFSET) or last < first:
+            raise ValueError("{} is not valid IP range".format(text))
+        return first, last
+    value = address_int(text)
+    return value, value
+
+
+def interval_text(first, last):
+    """interval as single address, CIDR network if it is one, or range"""
+    if first == last:
+        return str(int_address(first))
+    size = last - first + 1
+    base = IPV6_OFFSET if first >= IPV6_OFFSET else 0
+    if size & (size - 1) == 0 and (first - base) % size == 0:
+        bits = 128 if base else 32
+        return "{}/{}".format(int_address(first), bits - size.bit_length() + 1)
+    return "{}-{}".format(int_address(first), int_address(last))
+
+
+class IPSet:
+    """
+    IPv4 and IPv6 addresses kept as sorted, disjoint and not adjacent
+    intervals of integers, so memory and time of lookups depend on number of
+    ranges, not on number of addresses
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals=()):
+        starts, ends = [], []
+        for first, last in sorted(intervals):
+            # last IPv4 address and first IPv6 one are not adjacent
+            if ends and (
+                first <= ends[-1] or (first == ends[-1] + 1 and first != IPV6_OFFSET)
+            ):
+                ends[-1] = max(ends[-1], last)
+            else:
+                starts.append(first)
+                ends.append(last)
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def parse(cls, text):
+        """set of comma, space or newline separated addresses, CIDR networks
+        and ranges, e.g. definedIPs of Tenable.SC asset list"""
+        return cls(
+            interval_parse(item) for item in SEPARATORS.split(text or "") if item
+        )
+
+    def intervals(self):
+        return zip(self.starts, self.ends)
+
+    @property
+    def count(self):
+        """exact number of addresses, len() can't return more than
+        sys.maxsize which IPv6 networks easily have"""
+        return sum(last - first + 1 for first, last in self.intervals())
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __contains__(self, address):
+        value = address_int(address) if isinstance(address, str) else address
+        i = bisect.bisect_right(self.starts, value) - 1
+        return i >= 0 and value <= self.ends[i]
+
+    def common(self, other):
+        """intervals of both sets, in order"""
+        i = j = 0
+        while i < len(self.starts) and j < len(other.starts):
+            first = max(self.starts[i], other.starts[j])
+            last = min(self.ends[i], other.ends[j])
+            if first <= last:
+                yield first, last
+            if self.ends[i] < other.ends[j]:
+                i += 1
+            else:
+                j += 1
+
+    def __and__(self, other):
+        return IPSet(self.common(other))
+
+    def __or__(self, other):
+        return IPSet([*self.intervals(), *other.intervals()])
+
+    def overlaps(self, other):
+        return next(self.common(other), None) is not None
+
+    def __le__(self, other):
+        """every address of set is also in other"""
+        return (self & other).count == self.count
+
+    def __eq__(self, other):
+        if not isinstance(other, IPSet):
+            return NotImplemented
+        return self.starts == other.starts and self.ends == other.ends
+
+    def __str__(self):
+        return ",".join(interval_text(first, last) for first, last in self.intervals())
+
+    def __repr__(self):
+        return "IPSet({!r})".format(str(self))
+
+
+@functools.lru_cache(maxsize=64)
+def parsed(text):
+    """IPSet of text, parsed once for all columns of the same record"""
+    return IPSet.parse(text)
+
+
+def overlaps(ip_sets):
+    """
+    {(i, j): count} of addresses which ip_sets[i] and ip_sets[j] (i < j) have
+    in common, found in one sweep over intervals of all sets ordered by
+    start, instead of intersecting every pair of sets
+    """
+    intervals = sorted(
+        (first, last, i)
+        for i, ip_set in enumerate(ip_sets)
+        for first, last in ip_set.intervals()
+    )
+    common = {}
+    # (last, i) of intervals which started and may still overlap next ones
+    active = []
+    for first, last, i in intervals:
+        while active and active[0][0] < first:
+            heapq.heappop(active)
+        for other_last, j in active:
+            pair = (min(i, j), max(i, j))
+            common[pair] = common.get(pair, 0) + min(last, other_last) - first + 1
+        heapq.heappush(active, (last, i))
+    return common
@@ -0,0 +1,25 @@
+class ConnectionPool:
+    """logged in TscApi of every address kept open between commands"""
+
+    def __init__(self, connect, engine=None):
+        # connect(address) returns logged in TscApi, addresses are connected
+        # from many threads at the same time
+        self.connect = connect
+        # AsyncEngine which runs connections of --async, closed after them
+        self.engine = engine
+        self.connections = {}
+
+    def __contains__(self, address):
+        return address in self.connections
+
+    def __iter__(self):
+        return iter(list(self.connections))
+
+    def get(self, address):
+        sccon = self.connections.get(address)
+        if sccon is None:
+            sccon = self.connections.setdefault(address, self.connect(address))
+        return sccon
+
+    def pop(self, address):
+        return self.connections.pop(address, None)
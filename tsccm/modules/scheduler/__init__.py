@@ -0,0 +1,311 @@
+import contextlib
+import itertools
+import math
+import random
+import threading
+import time
+
+DEFAULT_RETRIES = 3
+
+# seconds of first backoff, every next one is up to twice as long, with full
+# jitter, so clients throttled at the same time don't come back together
+BACKOFF = 0.5
+BACKOFF_MAX = 30
+
+# kinds of retryable errors, host asks to slow down (e.g. 429) or fails
+THROTTLED = "throttled"
+FAILED = "failed"
+
+# steps of retry loop of Scheduler.steps(), done by call() of Scheduler and
+# AsyncScheduler, blocking or awaiting
+ACQUIRE = "acquire"
+SLEEP = "sleep"
+CALL = "call"
+RELEASE = "release"
+
+# failed attempts in a row after which host isn't requested for OPEN_SECONDS
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+
+
+class CircuitOpenError(Exception):
+    """host failed too many times in a row and is left alone for a while"""
+
+
+class TokenBucket:
+    """rate requests per second on average, up to burst of them at once"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """0 if token was taken, otherwise seconds until next one"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        wait = self.take()
+        while wait:
+            time.sleep(wait)
+            wait = self.take()
+
+
+class ConcurrencyLimit:
+    """
+    at most limit calls at once, limit is halved when host throttles them and
+    grows back by about one per limit successful calls, up to maximum
+    """
+
+    def __init__(self, maximum=None):
+        self.maximum = maximum or math.inf
+        self.limit = self.maximum
+        self.active = 0
+        self.condition = threading.Condition()
+
+    def full(self):
+        return self.limit < math.inf and self.active >= max(int(self.limit), 1)
+
+    def adjust(self, throttled):
+        if throttled:
+            self.limit = max(min(self.limit, self.active) / 2, 1)
+        elif self.limit < self.maximum:
+            self.limit = min(self.limit + 1 / self.limit, self.maximum)
+        self.active -= 1
+
+    def acquire(self):
+        with self.condition:
+            while self.full():
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        with self.condition:
+            self.adjust(throttled)
+            self.condition.notify_all()
+
+
+class AsyncConcurrencyLimit(ConcurrencyLimit):
+    """ConcurrencyLimit of coroutines of one event loop"""
+
+    def __init__(self, maximum=None):
+        # asyncio is imported only by async classes, CLI starts without it
+        import asyncio
+
+        super().__init__(maximum)
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.full())
+            self.active += 1
+
+    async def release(self, throttled=False):
+        async with self.condition:
+            self.adjust(throttled)
+            self.condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    closed until threshold failures in a row, then open (every call fails at
+    once) for open_seconds, then half open - one call tries if host is back
+    """
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trying = False
+        self.lock = threading.Lock()
+
+    def check(self):
+        """
+        raises CircuitOpenError while open, True if this call is the one
+        which tries if host is back, it has to end with success(), failure()
+        or settle()
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            if self.trying or time.monotonic() - self.opened_at < self.open_seconds:
+                raise CircuitOpenError(
+                    "{} failures in a row, next try in {:.0f} seconds".format(
+                        self.failures,
+                        max(self.open_seconds - time.monotonic() + self.opened_at, 0),
+                    )
+                )
+            self.trying = True
+            return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trying = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trying = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def settle(self):
+        """try which ended without telling if host is back (e.g. cancelled)
+        lets next call try again"""
+        with self.lock:
+            self.trying = False
+
+
+class Scheduler:
+    """
+    requests to one host: at most rate per second and max_in_flight at once,
+    fewer while host throttles them, retried with exponential backoff when
+    retryable(exception) says they can be, until circuit breaker gives up
+    on host which keeps failing
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        max_in_flight=None,
+        retries=DEFAULT_RETRIES,
+        retryable=None,
+        timed=None,
+        backoff=BACKOFF,
+        backoff_max=BACKOFF_MAX,
+        breaker=None,
+        answered=None,
+    ):
+        self.bucket = TokenBucket(rate) if rate else None
+        self.slots = ConcurrencyLimit(max_in_flight)
+        self.retries = retries
+        # retryable(exception) returns THROTTLED, FAILED or None if request
+        # can't be retried
+        self.retryable = retryable or (lambda exception: None)
+        # answered(exception) is True if host sent error response (e.g. 404),
+        # so it's alive even though request can't be retried
+        self.answered = answered or (lambda exception: False)
+        # timed(phase, detail) returns context manager measuring waits
+        self.timed = timed or (lambda phase, detail=None: contextlib.nullcontext())
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+    def steps(self):
+        """
+        retry loop of call() shared by Scheduler and AsyncScheduler, yields
+        what has to be done as (step, argument) - ACQUIRE slot, SLEEP seconds,
+        CALL function, RELEASE slot (argument is whether host throttled) -
+        result of step is sent back and its exception thrown in, returns
+        result of function or raises when it gives up
+        """
+        for attempt in itertools.count():
+            probe = self.breaker.check()
+            try:
+                with self.timed("wait", "in flight"):
+                    yield ACQUIRE, None
+                kind = None
+                try:
+                    if self.bucket is not None:
+                        with self.timed("wait", "rate"):
+                            wait = self.bucket.take()
+                            while wait:
+                                yield SLEEP, wait
+                                wait = self.bucket.take()
+                    result = yield CALL, None
+                except Exception as e:
+                    kind = self.retryable(e)
+                    if kind == FAILED:
+                        self.breaker.failure()
+                    elif kind == THROTTLED or self.answered(e):
+                        # host which throttles or refuses request is alive
+                        self.breaker.success()
+                    if kind is None or attempt >= self.retries:
+                        raise
+                else:
+                    self.breaker.success()
+                    return result
+                finally:
+                    yield RELEASE, kind == THROTTLED
+            finally:
+                # e.g. cancelled or failed before request was sent
+                if probe:
+                    self.breaker.settle()
+
+            with self.timed("wait", "retry"):
+                yield SLEEP, self.delay(attempt)
+
+    def step(self, step, argument, function, args, kwargs):
+        if step == CALL:
+            return function(*args, **kwargs)
+        if step == ACQUIRE:
+            return self.slots.acquire()
+        if step == RELEASE:
+            return self.slots.release(throttled=argument)
+        time.sleep(argument)
+
+    def call(self, function, *args, **kwargs):
+        steps = self.steps()
+        advance, value = steps.send, None
+        while True:
+            try:
+                step, argument = advance(value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value = self.step(step, argument, function, args, kwargs)
+            except BaseException as e:
+                advance, value = steps.throw, e
+            else:
+                advance = steps.send
+
+
+class AsyncScheduler(Scheduler):
+    """Scheduler of coroutines, which wait without blocking event loop"""
+
+    def __init__(self, rate=None, max_in_flight=None, *args, **kwargs):
+        super().__init__(rate, max_in_flight, *args, **kwargs)
+        self.slots = AsyncConcurrencyLimit(max_in_flight)
+
+    async def step(self, step, argument, function, args, kwargs):
+        import asyncio
+
+        if step == CALL:
+            return await function(*args, **kwargs)
+        if step == ACQUIRE:
+            return await self.slots.acquire()
+        if step == RELEASE:
+            return await self.slots.release(throttled=argument)
+        await asyncio.sleep(argument)
+
+    async def call(self, function, *args, **kwargs):
+        steps = self.steps()
+        advance, value = steps.send, None
+        while True:
+            try:
+                step, argument = advance(value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value = await self.step(step, argument, function, args, kwargs)
+            except BaseException as e:
+                advance, value = steps.throw, e
+            else:
+                advance = steps.send
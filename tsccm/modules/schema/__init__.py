@@ -0,0 +1,360 @@
+import datetime
+import math
+import operator
+import time
+from collections import namedtuple
+
+# column types which need conversion, other columns are passed as they are
+DATETIME = "datetime"
+DURATION = "duration"
+# comma separated IP addresses, networks and ranges, collapsed to as few
+# ranges as possible, and exact number of their addresses
+IP_RANGES = "ip_ranges"
+IP_COUNT = "ip_count"
+
+# name of column in output, dotted path of value in Tenable.SC record, type
+Column = namedtuple("Column", ["name", "path", "type"], defaults=[None])
+
+ENTITIES = {
+    "user": [
+        Column("id", "id"),
+        Column("username", "username"),
+        Column("firstname", "firstname"),
+        Column("lastname", "lastname"),
+        Column("roleName", "role.name"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("lastLogin", "lastLogin", DATETIME),
+        Column("locked", "locked"),
+        Column("failedLogins", "failedLogins"),
+    ],
+    "group": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("userCount", "userCount"),
+    ],
+    "scan": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("ownerUsername", "owner.username"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("scheduleType", "schedule.type"),
+        Column("scheduleEnabled", "schedule.enabled"),
+        Column("scheduleRepeatRule", "schedule.repeatRule"),
+        Column("scheduleStart", "schedule.start"),
+        Column("scheduleNextRun", "schedule.nextRun", DATETIME),
+    ],
+    "scan_result": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("ownerUsername", "owner.username"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("status", "status"),
+        Column("importStatus", "importStatus"),
+        Column("totalIPs", "totalIPs"),
+        Column("scannedIPs", "scannedIPs"),
+        Column("startTime", "startTime", DATETIME),
+        Column("finishTime", "finishTime", DATETIME),
+        Column("scanDuration", "scanDuration", DURATION),
+    ],
+    "policy": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("ownerUsername", "owner.username"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("policyTemplateName", "policyTemplate.name"),
+    ],
+    "credential": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("type", "type"),
+        Column("authType", "typeFields.authType"),
+        Column("ownerUsername", "owner.username"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+    ],
+    "role": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("organizationCounts", "organizationCounts"),
+    ],
+    "audit_file": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("filename", "filename"),
+        Column("originalFilename", "originalFilename"),
+    ],
+    "plugin": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("family", "family.name"),
+        Column("type", "type"),
+        Column("severity", "riskFactor"),
+        Column("pluginPubDate", "pluginPubDate", DATETIME),
+        Column("pluginModDate", "pluginModDate", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+    ],
+    # definedIPs are only in static asset lists, the rest is defined by rules
+    "asset": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("type", "type"),
+        Column("ownerUsername", "owner.username"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("definedIPs", "typeFields.definedIPs", IP_RANGES),
+        Column("ipCount", "typeFields.definedIPs", IP_COUNT),
+    ],
+    "repository": [
+        Column("id", "id"),
+        Column("name", "name"),
+        Column("type", "type"),
+        Column("dataFormat", "dataFormat"),
+        Column("createdTime", "createdTime", DATETIME),
+        Column("modifiedTime", "modifiedTime", DATETIME),
+        Column("ipRange", "typeFields.ipRange", IP_RANGES),
+        Column("ipCount", "typeFields.ipRange", IP_COUNT),
+    ],
+    # vulndetails tool of analysis
+    "analysis": [
+        Column("pluginID", "pluginID"),
+        Column("pluginName", "pluginName"),
+        Column("severity", "severity.name"),
+        Column("ip", "ip"),
+        Column("dnsName", "dnsName"),
+        Column("netbiosName", "netbiosName"),
+        Column("port", "port"),
+        Column("protocol", "protocol"),
+        Column("family", "family.name"),
+        Column("repository", "repository.name"),
+        Column("firstSeen", "firstSeen", DATETIME),
+        Column("lastSeen", "lastSeen", DATETIME),
+        Column("vprScore", "vprScore"),
+        Column("cvssV3BaseScore", "cvssV3BaseScore"),
+        Column("exploitAvailable", "exploitAvailable"),
+        Column("cve", "cve"),
+        Column("patchPubDate", "patchPubDate", DATETIME),
+        Column("hasBeenMitigated", "hasBeenMitigated"),
+    ],
+}
+
+# Tenable.SC sends -1 (or 0) as time of things which didn't happen yet (e.g.
+# finishTime of running scan), such times are left empty and such durations
+# are 0
+
+
+def value_get(record, path):
+    return value_get_keys(record, path.split("."))
+
+
+def value_get_keys(record, keys):
+    for key in keys:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def value_getter(path):
+    """value_get() of path with keys split once, top level key is plain get"""
+    keys = path.split(".")
+    if len(keys) == 1:
+        return operator.methodcaller("get", path)
+    return lambda record: value_get_keys(record, keys)
+
+
+def seconds_convert(value):
+    """
+    number of seconds, None if value is not a number, as in frame() where
+    pd.to_numeric(errors="coerce") makes it NaN
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(seconds) else seconds
+
+
+def value_convert(value, type):
+    if type == DATETIME:
+        seconds = seconds_convert(value)
+        if seconds is None or seconds <= 0:
+            return None
+        return datetime.datetime.fromtimestamp(int(seconds))
+    if type == DURATION:
+        seconds = seconds_convert(value)
+        if seconds is None:
+            return None
+        return datetime.timedelta(seconds=max(seconds, 0))
+    if type in (IP_RANGES, IP_COUNT):
+        if value is None:
+            return None
+        from tsccm.modules.ipset import parsed
+
+        ip_set = parsed(value)
+        return str(ip_set) if type == IP_RANGES else ip_set.count
+    return value
+
+
+def columns_get(entity, names=None):
+    """columns of entity, only given ones in given order if names are given"""
+    if not names:
+        return ENTITIES[entity]
+
+    by_name = {column.name: column for column in ENTITIES[entity]}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(
+            "unknown column {}, available columns: {}".format(
+                ", ".join(unknown), ", ".join(by_name)
+            )
+        )
+    return [by_name[name] for name in dict.fromkeys(names)]
+
+
+def fields(entity, names=None):
+    """Tenable.SC fields which have to be requested to fill given columns"""
+    # id is always returned by Tenable.SC anyway
+    return [
+        *dict.fromkeys(
+            ["id"]
+            + [column.path.split(".")[0] for column in columns_get(entity, names)]
+        )
+    ]
+
+
+def rows(entity, records, names=None):
+    """
+    records converted one by one, for output written as rows come, getter
+    and conversion of every column are looked up once, not for every value
+    """
+    columns = [
+        (column.name, value_getter(column.path), column.type)
+        for column in columns_get(entity, names)
+    ]
+    for record in records:
+        row = {}
+        for name, get, type in columns:
+            value = get(record)
+            row[name] = value if type is None else value_convert(value, type)
+        yield row
+
+
+def local_offsets(seconds):
+    """
+    UTC offsets of local time zone at given epoch seconds (numpy array), the
+    same as datetime.datetime.fromtimestamp() uses, looked up once per day
+    """
+    import numpy as np
+
+    days = seconds // 86400
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    day_starts = unique_days * 86400
+    first = np.array([time.localtime(t).tm_gmtoff for t in day_starts])
+    last = np.array([time.localtime(t + 86399).tm_gmtoff for t in day_starts])
+
+    # day in which offset changes (DST) gets exact second of change
+    changes = np.full(len(unique_days), np.iinfo(np.int64).max)
+    for i in np.flatnonzero(first != last):
+        low, high = int(day_starts[i]), int(day_starts[i]) + 86399
+        while low < high:
+            middle = (low + high) // 2
+            if time.localtime(middle).tm_gmtoff == first[i]:
+                low = middle + 1
+            else:
+                high = middle
+        changes[i] = low
+
+    return np.where(seconds >= changes[inverse], last[inverse], first[inverse])
+
+
+def seconds_get(values):
+    import pandas as pd
+
+    # Tenable.SC sends numbers as strings, plain cast is much faster than
+    # pd.to_numeric() which is needed only if some value is not a number
+    try:
+        return values.astype("float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors="coerce")
+
+
+def frame(entity, records, names=None):
+    """records converted column by column into pandas DataFrame"""
+    import numpy as np
+    import pandas as pd
+
+    columns = columns_get(entity, names)
+    # DataFrame of top level fields is built in one go, only nested fields of
+    # schema are picked from dicts (pd.json_normalize() flattens every nested
+    # field row by row, which is several times slower)
+    records = pd.DataFrame([*records])
+    df = pd.DataFrame(index=records.index)
+    for column in columns:
+        key, *keys = column.path.split(".")
+        if key in records:
+            values = records[key]
+        else:
+            values = pd.Series(None, index=records.index, dtype=object)
+        for key in keys:
+            values = pd.Series(
+                [
+                    value.get(key) if isinstance(value, dict) else None
+                    for value in values
+                ],
+                index=records.index,
+                dtype=object,
+            )
+
+        if column.type == DATETIME:
+            seconds = seconds_get(values)
+            seconds = seconds.where(seconds > 0)
+            known = seconds.notna().to_numpy()
+            known_seconds = seconds.to_numpy()[known].astype(np.int64)
+            local_seconds = np.full(len(seconds), np.nan)
+            local_seconds[known] = known_seconds + local_offsets(known_seconds)
+            values = pd.to_datetime(local_seconds, unit="s")
+        elif column.type == DURATION:
+            seconds = seconds_get(values).clip(lower=0)
+            values = pd.to_timedelta(seconds, unit="s")
+        elif column.type in (IP_RANGES, IP_COUNT):
+            # counts of IPv6 networks don't fit int64, so they stay objects
+            values = pd.Series(
+                [value_convert(value, column.type) for value in values],
+                index=records.index,
+                dtype=object,
+            )
+
+        df[column.name] = values
+    return df
+
+
+def arrow_table(entity, records, names=None, **constants):
+    """
+    records converted into pyarrow Table with constant text columns (e.g.
+    address) first, times and durations typed and all other columns text, so
+    every batch of the same columns has the same schema
+    """
+    import pyarrow as pa
+
+    df = frame(entity, records, names)
+    fields = [pa.field(name, pa.string()) for name in constants]
+    for column in columns_get(entity, names):
+        if column.type == DATETIME:
+            fields.append(pa.field(column.name, pa.timestamp("ms")))
+        elif column.type == DURATION:
+            fields.append(pa.field(column.name, pa.duration("s")))
+        else:
+            fields.append(pa.field(column.name, pa.string()))
+            df[column.name] = df[column.name].astype("string")
+    for position, (name, value) in enumerate(constants.items()):
+        df.insert(position, name, value)
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
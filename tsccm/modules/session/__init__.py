@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import time
+
+# seconds after last use for which kept session is reused, Tenable.SC ends
+# idle sessions after 60 minutes by default
+DEFAULT_SESSION_TTL = 1800
+
+# request headers which carry Tenable.SC session
+SESSION_HEADERS = ("X-SecurityCenter", "TNS_SESSIONID")
+
+
+class SessionStore:
+    """authenticated Tenable.SC sessions kept on disk between runs"""
+
+    def __init__(self, path, ttl=DEFAULT_SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def session_path(self, host, port, username):
+        name = hashlib.sha256(
+            "{}:{}@{}".format(host, port, username).encode()
+        ).hexdigest()
+        return os.path.join(self.path, name + ".json")
+
+    def load(self, host, port, username):
+        try:
+            with open(self.session_path(host, port, username)) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if session.get("expires_at", 0) < time.time():
+            self.delete(host, port, username)
+            return None
+        return session
+
+    def save(self, host, port, username, headers, cookies):
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        path = self.session_path(host, port, username)
+        # session token is as good as password, so only owner can read it
+        fd = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "headers": headers,
+                    "cookies": cookies,
+                    "expires_at": time.time() + self.ttl,
+                },
+                f,
+            )
+        os.replace(path + ".tmp", path)
+
+    def delete(self, host, port, username):
+        try:
+            os.remove(self.session_path(host, port, username))
+        except OSError:
+            pass
@@ -0,0 +1,285 @@
+import datetime
+import json
+import time
+from tsccm.modules import schema
+from tsccm.utilities import sqlite_connect
+
+# scan result statuses after which scan result doesn't change anymore
+SCAN_RESULT_FINISHED_STATUSES = ("Completed", "Partial", "Error", "Canceled")
+
+# import statuses which mean scan result is still being imported
+SCAN_RESULT_IMPORTING_STATUSES = ("Running", "Importing", "Pending", "Queued")
+
+
+# columns of entity tables which get index, if entity has them
+INDEXED_COLUMNS = (
+    "id",
+    "name",
+    "username",
+    "ownerUsername",
+    "family",
+    "modifiedTime",
+)
+
+
+def table_columns(entity):
+    """(name, SQLite type) of table of entity, times are local time text
+    (e.g. 2025-09-01 12:00:00), durations seconds, the rest numbers where
+    Tenable.SC sends numbers and text otherwise"""
+    types = {schema.DATETIME: "TEXT", schema.DURATION: "INTEGER"}
+    return [("address", "TEXT NOT NULL")] + [
+        (column.name, types.get(column.type, "NUMERIC"))
+        for column in schema.columns_get(entity)
+    ]
+
+
+def table_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, int) and not -(2**63) <= value < 2**63:
+        # e.g. number of addresses of IPv6 network, SQLite keeps it as REAL
+        return str(value)
+    return value
+
+
+def quoted(name):
+    # entity and column names, e.g. group, are SQL keywords
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+class Store:
+    """
+    local copy of Tenable.SC records, kept as JSON per entity, address and id,
+    and as table of columns of every entity, which can be queried offline
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            return
+
+        with self.connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS record ("
+                "entity TEXT NOT NULL, "
+                "address TEXT NOT NULL, "
+                "id TEXT NOT NULL, "
+                "body TEXT NOT NULL, "
+                "synced_at REAL NOT NULL, "
+                "PRIMARY KEY (entity, address, id))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sync ("
+                "address TEXT NOT NULL, "
+                "entity TEXT NOT NULL, "
+                "updated_at TEXT NOT NULL, "
+                "rows INTEGER NOT NULL, "
+                "since INTEGER, "
+                "PRIMARY KEY (address, entity))"
+            )
+            # store of earlier version has sync table without since column
+            if "since" not in [
+                name for _, name, *_ in db.execute("PRAGMA table_info(sync)")
+            ]:
+                db.execute("ALTER TABLE sync ADD COLUMN since INTEGER")
+
+    def connect(self):
+        return sqlite_connect(self.path, self.readonly)
+
+    def save(self, entity, address, records):
+        """insert or update records, returns number of added and changed ones"""
+        added = 0
+        changed = 0
+        now = time.time()
+        with self.connect() as db:
+            for record in records:
+                body = json.dumps(record, sort_keys=True)
+                row = db.execute(
+                    "SELECT body FROM record WHERE entity = ? AND address = ? AND id = ?",
+                    (entity, address, str(record["id"])),
+                ).fetchone()
+                if row is None:
+                    added += 1
+                elif row[0] != body:
+                    changed += 1
+                else:
+                    continue
+                db.execute(
+                    "INSERT OR REPLACE INTO record VALUES (?, ?, ?, ?, ?)",
+                    (entity, address, str(record["id"]), body, now),
+                )
+        return added, changed
+
+    def records(self, entity, address):
+        with self.connect() as db:
+            for (body,) in db.execute(
+                "SELECT body FROM record WHERE entity = ? AND address = ? "
+                "ORDER BY CAST(id AS INTEGER)",
+                (entity, address),
+            ):
+                yield json.loads(body)
+
+    def scan_results_since(self, address):
+        """
+        start time from which scan results have to be requested again: the
+        latest finish time seen (high-water mark) or the start time of the
+        oldest scan result which wasn't finished yet, None if nothing is stored
+        """
+        finished = ", ".join("?" * len(SCAN_RESULT_FINISHED_STATUSES))
+        importing = ", ".join("?" * len(SCAN_RESULT_IMPORTING_STATUSES))
+        with self.connect() as db:
+            (watermark,) = db.execute(
+                "SELECT MAX(CAST(json_extract(body, '$.finishTime') AS INTEGER)) "
+                "FROM record WHERE entity = 'scanResult' AND address = ?",
+                (address,),
+            ).fetchone()
+            (running,) = db.execute(
+                "SELECT MIN(CAST(json_extract(body, '$.startTime') AS INTEGER)) "
+                "FROM record WHERE entity = 'scanResult' AND address = ? AND ("
+                "json_extract(body, '$.status') NOT IN ({}) OR "
+                "json_extract(body, '$.importStatus') IN ({}))".format(
+                    finished, importing
+                ),
+                (
+                    address,
+                    *SCAN_RESULT_FINISHED_STATUSES,
+                    *SCAN_RESULT_IMPORTING_STATUSES,
+                ),
+            ).fetchone()
+
+        if watermark is None:
+            return None
+        if running is not None and running > 0:
+            return min(watermark, running)
+        return watermark
+
+    def table_create(self, db, entity):
+        """table of entity with indexes, created again if its columns changed"""
+        columns = table_columns(entity)
+        existing = [
+            (name, type)
+            for _, name, type, *_ in db.execute(
+                "PRAGMA table_info({})".format(quoted(entity))
+            )
+        ]
+        if existing and [name for name, _ in existing] != [name for name, _ in columns]:
+            db.execute("DROP TABLE {}".format(quoted(entity)))
+            db.execute("DELETE FROM sync WHERE entity = ?", (entity,))
+
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS {} ({})".format(
+                quoted(entity),
+                ", ".join("{} {}".format(quoted(name), type) for name, type in columns),
+            )
+        )
+        names = [name for name, _ in columns]
+        for name in ["address"] + [name for name in INDEXED_COLUMNS if name in names]:
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    quoted("{}_{}".format(entity, name)), quoted(entity), quoted(name)
+                )
+            )
+
+    def table_save(self, entity, address, records, replace=True):
+        """
+        rows of address in table of entity replaced with records, or only rows
+        of the same ids if not replace, returns number of saved rows, sync
+        table is updated only when all rows are replaced
+        """
+        columns = table_columns(entity)
+        insert = "INSERT INTO {} VALUES ({})".format(
+            quoted(entity), ", ".join("?" * len(columns))
+        )
+        delete = "DELETE FROM {} WHERE address = ? AND id = ?".format(quoted(entity))
+        count = 0
+        with self.connect() as db:
+            self.table_create(db, entity)
+            if replace:
+                db.execute(
+                    "DELETE FROM {} WHERE address = ?".format(quoted(entity)),
+                    (address,),
+                )
+            for count, row in enumerate(schema.rows(entity, records), start=1):
+                values = [table_value(value) for value in row.values()]
+                if not replace:
+                    db.execute(delete, (address, values[0]))
+                db.execute(insert, (address, *values))
+            if replace:
+                self.sync_set(db, address, entity)
+        return count
+
+    def sync_set(self, db, address, entity, since=None):
+        (count,) = db.execute(
+            "SELECT COUNT(*) FROM {} WHERE address = ?".format(quoted(entity)),
+            (address,),
+        ).fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO sync (address, entity, updated_at, rows, since) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                address,
+                entity,
+                datetime.datetime.now().isoformat(sep=" ", timespec="seconds"),
+                count,
+                since,
+            ),
+        )
+
+    def synced(self, address, entity, since=None):
+        """table of entity of address is up to date, since is time from which
+        next update can request only changed records"""
+        with self.connect() as db:
+            self.table_create(db, entity)
+            self.sync_set(db, address, entity, since)
+
+    def sync_get(self, address, entity):
+        """(updated_at, rows, since) of table of entity of address, None if it
+        wasn't saved yet"""
+        with self.connect() as db:
+            return db.execute(
+                "SELECT updated_at, rows, since FROM sync "
+                "WHERE address = ? AND entity = ?",
+                (address, entity),
+            ).fetchone()
+
+    def plugins_find(self, addresses, ids=(), families=(), words=()):
+        """rows of plugins of addresses with any of ids and families, if given,
+        and with all words in their names, case insensitive"""
+        conditions = ["address IN ({})".format(", ".join("?" * len(addresses)))]
+        parameters = [*addresses]
+        if ids:
+            conditions.append("id IN ({})".format(", ".join("?" * len(ids))))
+            parameters += [int(one_id) for one_id in ids]
+        if families:
+            conditions.append(
+                "({})".format(
+                    " OR ".join(["family = ? COLLATE NOCASE"] * len(families))
+                )
+            )
+            parameters += families
+        for word in words:
+            conditions.append("name LIKE ? ESCAPE '\\'")
+            parameters.append(
+                "%{}%".format(
+                    word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                )
+            )
+        return self.query(
+            "SELECT * FROM plugin WHERE {} ORDER BY id, address".format(
+                " AND ".join(conditions)
+            ),
+            parameters,
+        )
+
+    def query(self, sql, parameters=()):
+        """rows (dicts) of SQL query of tables of entities and sync"""
+        with self.connect() as db:
+            cursor = db.execute(sql, parameters)
+            names = [column[0] for column in cursor.description or ()]
+            for row in cursor:
+                yield dict(zip(names, row))
@@ -0,0 +1,90 @@
+import contextlib
+import itertools
+import os
+import shutil
+import subprocess
+
+# rows of which column widths are computed, value of later row which is wider
+# than its column stretches only its own line, so first rows are printed
+# before the rest is even fetched
+SAMPLE_ROWS = 1000
+
+COLUMN_GAP = " "
+
+
+def text(value):
+    if value is None:
+        return ""
+    return str(value).replace("\n", "\\n")
+
+
+def line(cells, widths):
+    return COLUMN_GAP.join(cell.rjust(width) for cell, width in zip(cells, widths))
+
+
+def render(rows, out, columns=None, sample=SAMPLE_ROWS, start=1):
+    """
+    rows (dicts) written to out as right aligned text table with row numbers
+    from start, as they come after first sample of them, columns are needed
+    only to print header of table without rows, returns count of rows
+    """
+    rows = iter(rows)
+    head = [*itertools.islice(rows, sample)]
+    if head:
+        columns = [*head[0]]
+    columns = columns or []
+
+    cells = [[text(row.get(column)) for column in columns] for row in head]
+    # count of rows is known only if all of them are in sample
+    last = start + (len(head) if len(head) < sample else sample * 1000) - 1
+    widths = [len(str(max(last, start)))]
+    widths += [len(column) for column in columns]
+    for row_cells in cells:
+        widths[1:] = [
+            max(width, len(cell)) for width, cell in zip(widths[1:], row_cells)
+        ]
+
+    if columns:
+        out.write(line([""] + columns, widths) + "\n")
+    for number, row_cells in enumerate(cells, start=start):
+        out.write(line([str(number)] + row_cells, widths) + "\n")
+
+    count = len(head)
+    for count, row in enumerate(rows, start=count + 1):
+        row_cells = [text(row.get(column)) for column in columns]
+        out.write(line([str(start + count - 1)] + row_cells, widths) + "\n")
+    return count
+
+
+def pager_command():
+    """$PAGER, or less which quits if all fits on one screen, or more"""
+    command = os.environ.get("PAGER")
+    if command:
+        return command
+    if shutil.which("less"):
+        return "less -FRSX"
+    return "more"
+
+
+@contextlib.contextmanager
+def pager(command=None):
+    """stdout written to pager while in context, until pager quits"""
+    process = subprocess.Popen(
+        command or pager_command(),
+        shell=True,
+        stdin=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+    try:
+        with contextlib.redirect_stdout(process.stdin):
+            yield
+    except BrokenPipeError:
+        # pager quit before all output was written
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
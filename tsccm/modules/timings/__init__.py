@@ -0,0 +1,162 @@
+import contextlib
+import json
+import math
+import threading
+import time
+
+# phases in order in which they happen for every address
+PHASES = (
+    "credentials",
+    "connect",
+    "login",
+    "cache",
+    "wait",
+    "get",
+    "post",
+    "json",
+    "transform",
+    "render",
+    "logout",
+)
+
+# whole run of one address, not a phase of its own
+TOTAL = "total"
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, p):
+    """nearest-rank percentile of sorted values"""
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+class Timings:
+    """monotonic timings of phases per address, collected from many threads"""
+
+    def __init__(self, command=None):
+        self.command = command
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def record(self, host, phase, started, finished, detail=None):
+        """hook with signature of TscApi.on_timing"""
+        with self.lock:
+            self.spans.append((host, phase, started, finished, detail))
+
+    @contextlib.contextmanager
+    def phase(self, host, phase, detail=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(host, phase, started, time.perf_counter(), detail)
+
+    def durations(self, phase=None, host=None):
+        return [
+            finished - started
+            for span_host, span_phase, started, finished, _ in self.spans
+            if (phase is None or span_phase == phase)
+            and (host is None or span_host == host)
+        ]
+
+    def summary(self, slowest=10):
+        """tables of phase percentiles and of slowest addresses"""
+        from tabulate import tabulate
+
+        phases = [
+            phase
+            for phase in PHASES + (TOTAL,)
+            if any(span[1] == phase for span in self.spans)
+        ]
+        phase_rows = []
+        for phase in phases:
+            durations = sorted(self.durations(phase))
+            phase_rows.append(
+                [phase, len(durations), sum(durations)]
+                + [percentile(durations, p) for p in PERCENTILES]
+                + [durations[-1]]
+            )
+        phase_table = tabulate(
+            phase_rows,
+            headers=["phase", "count", "sum s"]
+            + ["p{}".format(p) for p in PERCENTILES]
+            + ["max"],
+            floatfmt=".3f",
+        )
+
+        hosts = sorted(
+            {span[0] for span in self.spans},
+            key=lambda host: sum(self.durations(TOTAL, host))
+            or sum(self.durations(host=host)),
+            reverse=True,
+        )
+        host_rows = [
+            [host] + [sum(self.durations(phase, host)) for phase in phases]
+            for host in hosts[:slowest]
+        ]
+        host_table = tabulate(host_rows, headers=["address"] + phases, floatfmt=".3f")
+        return "{}\n\nslowest addresses:\n{}".format(phase_table, host_table)
+
+    def trace(self):
+        """spans in Trace Event Format, one thread per address, which can be
+        opened in chrome://tracing or https://ui.perfetto.dev"""
+        with self.lock:
+            spans = list(self.spans)
+
+        threads = {}
+        events = []
+        for host, phase, started, finished, detail in spans:
+            if host not in threads:
+                threads[host] = len(threads) + 1
+                events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": 1,
+                        "tid": threads[host],
+                        "args": {"name": host},
+                    }
+                )
+            event = {
+                "name": phase,
+                "cat": self.command or "tsccm",
+                "ph": "X",
+                "pid": 1,
+                "tid": threads[host],
+                "ts": (started - self.started) * 1e6,
+                "dur": (finished - started) * 1e6,
+            }
+            if detail is not None:
+                event["args"] = {"detail": detail}
+            events.append(event)
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"command": self.command, "started_at": self.started_at},
+        }
+
+    def trace_write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+
+class TimedIterator:
+    """iterator which sums up time spent in producing items of wrapped one,
+    to tell transform from render when rows are written as they come"""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - started
@@ -1,89 +1,1014 @@
 from tenable.sc import TenableSC
+from tenable.errors import (
+    APIError,
+    ForbiddenError,
+    TooManyRequestsError,
+    UnauthorizedError,
+)
+from tsccm.modules.scheduler import (
+    BACKOFF_MAX,
+    DEFAULT_RETRIES,
+    FAILED,
+    THROTTLED,
+    AsyncScheduler,
+    Scheduler,
+)
+from tsccm.modules.session import SESSION_HEADERS
+import requests
 import certstore
 import urllib3
+import collections
+import contextlib
+import inspect
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+# fields requested by default, getters accept list of other ones
+USER_FIELDS = "id,username,firstname,lastname,role,createdTime,modifiedTime,lastLogin,locked,failedLogins"
+GROUP_FIELDS = "id,name,createdTime,modifiedTime,userCount"
+SCAN_FIELDS = "id,name,owner,createdTime,modifiedTime,schedule"
+SCAN_RESULT_FIELDS = "id,name,owner,createdTime,status,importStatus,totalIPs,scannedIPs,startTime,finishTime,scanDuration"
+POLICY_FIELDS = "id,name,owner,createdTime,modifiedTime,policyTemplate"
+CREDENTIAL_FIELDS = "id,name,type,typeFields,owner,createdTime,modifiedTime"
+ROLE_FIELDS = "id,name,createdTime,modifiedTime,organizationCounts"
+AUDIT_FILE_FIELDS = "id,name,createdTime,modifiedTime,filename,originalFilename"
+ASSET_FIELDS = "id,name,type,owner,createdTime,modifiedTime,typeFields"
+REPOSITORY_FIELDS = "id,name,type,dataFormat,createdTime,modifiedTime,typeFields"
+PLUGIN_FIELDS = (
+    "id,name,family,type,riskFactor,pluginPubDate,pluginModDate,modifiedTime"
+)
 
-class TscApi:
 
-    def __init__(self, host="127.0.0.1", port=443, insecure=None):
+def retryable(exception):
+    """
+    whether request which failed with exception is worth retrying, pyTenable
+    has already waited for Retry-After header of the response if it had one
+    """
+    if isinstance(exception, TooManyRequestsError):
+        return THROTTLED
+    if isinstance(exception, APIError) and exception.retryable:
+        return FAILED
+    if isinstance(exception, requests.exceptions.ConnectionError):
+        return FAILED
+    return None
+
+
+def answered(exception):
+    """whether Tenable.SC sent error response, so it's up"""
+    return isinstance(exception, APIError)
+
+
+def prefetched(function, calls, parallel):
+    """
+    results of function called with every tuple of arguments from calls, in
+    order of calls, up to parallel of them computed ahead of the consumer, so
+    memory stays bounded however many calls there are
+    """
+    calls = iter(calls)
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        pending = collections.deque(
+            executor.submit(function, *arguments)
+            for arguments in itertools.islice(calls, parallel)
+        )
+        while pending:
+            result = pending.popleft().result()
+            for arguments in itertools.islice(calls, 1):
+                pending.append(executor.submit(function, *arguments))
+            yield result
+
+
+# paths, payloads and pages of requests are built here, TscApi and
+# AsyncTscApi only send them
+
+
+def list_path(endpoint, fields, default_fields):
+    """path of list of endpoint with given fields, or default ones"""
+    return "{}?fields={}".format(
+        endpoint, ",".join(fields) if fields else default_fields
+    )
+
+
+def plugin_path(start_offset=0, end_offset=1000, since=None, fields=None):
+    path = (
+        "plugin?fields={}&sortField=id&sortDirection=ASC"
+        "&startOffset={}&endOffset={}".format(
+            ",".join(fields) if fields else PLUGIN_FIELDS, start_offset, end_offset
+        )
+    )
+    # only plugins modified since that time
+    if since is not None:
+        path += "&since={}".format(int(since))
+    return path
+
+
+def plugin_calls(page_size, since=None, fields=None):
+    """arguments of plugin_get() of every page, until page which isn't full"""
+    return (
+        (start, start + page_size, since, fields)
+        for start in itertools.count(0, page_size)
+    )
+
+
+def scan_results_path(start_time=None, fields=None, end_time=None):
+    path = list_path("scanResult", fields, SCAN_RESULT_FIELDS)
+    # without startTime Tenable.SC returns scan results of last 30 days
+    if start_time is not None:
+        path += "&startTime={}".format(int(start_time))
+    if end_time is not None:
+        path += "&endTime={}".format(int(end_time))
+    return path
+
+
+def window_calls(start_time, end_time, window, fields=None):
+    """arguments of scan_results_get() of every window of window seconds"""
+    start_time, end_time, window = int(start_time), int(end_time), int(window)
+    # windows are inclusive on both ends in Tenable.SC
+    return (
+        (start, fields, min(start + window - 1, end_time))
+        for start in range(start_time, end_time + 1, window)
+    )
+
+
+def window_scan_results(response, seen):
+    """scan results of window in order of ids, without those already seen"""
+    scan_results = []
+    for scan_result in sorted(
+        response["response"]["manageable"], key=lambda r: int(r["id"])
+    ):
+        # scan result which spans windows is returned by each one
+        if scan_result["id"] in seen:
+            continue
+        seen.add(scan_result["id"])
+        scan_results.append(scan_result)
+    return scan_results
+
+
+def download_request(scan_result_id, offset=0):
+    """path and arguments of request of scan result file from offset byte on"""
+    headers = {"Range": "bytes={}-".format(offset)} if offset else {}
+    return "scanResult/{}/download".format(scan_result_id), {
+        "json": {"downloadType": "v2"},
+        "headers": headers,
+    }
+
+
+def analysis_query(start_offset, end_offset, filters, tool, source_type):
+    """payload of analysis request, filters are (name, operator, value)"""
+    return {
+        "type": "vuln",
+        "sourceType": source_type,
+        "query": {
+            "type": "vuln",
+            "tool": tool,
+            "startOffset": start_offset,
+            "endOffset": end_offset,
+            "filters": [
+                {
+                    "filterName": name,
+                    "operator": operator,
+                    "value": value,
+                    "type": "vuln",
+                }
+                for name, operator, value in filters or []
+            ],
+        },
+    }
+
+
+def analysis_first_end(start, page_size, end=None):
+    """end offset of first page of analysis, which tells how many there are"""
+    return start + page_size if end is None else min(start + page_size, end)
+
+
+def analysis_calls(first, first_end, page_size, end, filters, tool, source_type):
+    """arguments of analysis_get() of pages after first one until end"""
+    total = int(first["response"]["totalRecords"])
+    if end is not None:
+        total = min(total, end)
+    return (
+        (page_start, min(page_start + page_size, total), filters, tool, source_type)
+        for page_start in range(first_end, total, page_size)
+    )
+
+
+class BaseTscApi:
+    """
+    getters of TscApi and AsyncTscApi, which only build requests, get(),
+    post() and response() of client send them, so getters of AsyncTscApi
+    return awaitables
+    """
+
+    @contextlib.contextmanager
+    def timed(self, phase, detail=None):
+        if self.on_timing is None:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.on_timing(self.host, phase, started, time.perf_counter(), detail)
+
+    def credentials_set(self, sc_user, sc_pass, access_key, secret_key):
+        self.username = sc_user
+        self.password = sc_pass
+        self.access_key = access_key
+        self.secret_key = secret_key
+
+    def relogin_allowed(self):
+        # resumed session has already ended on Tenable.SC, login again,
+        # API keys are sent with every request and don't end
+        return self.session_resumed or (self.relogin and not self.access_key)
+
+    def cache_get(self, path):
+        """cached JSON of path, None if it isn't cached"""
+        if self.cache is None:
+            return None
+        with self.timed("cache", path.split("?")[0]):
+            return self.cache.get(
+                self.host, self.port, self.username or self.access_key, path
+            )
+
+    def cache_set(self, path, response_json):
+        if self.cache is not None:
+            self.cache.set(
+                self.host,
+                self.port,
+                self.username or self.access_key,
+                path,
+                response_json,
+            )
+
+    def plugin_get(self, start_offset=0, end_offset=1000, since=None, fields=None):
+        return self.get(plugin_path(start_offset, end_offset, since, fields))
+
+    def scan_result_download(self, scan_result_id, offset=0):
+        """
+        streamed response with zip archive of .nessus file of scan result,
+        from offset byte on if Tenable.SC answers Range request with 206,
+        body is read by caller in chunks and then closed
+        """
+        path, kwargs = download_request(scan_result_id, offset)
+        return self.response("post", path, stream=True, **kwargs)
+
+    def status_get(self):
+        return self.get("status")
+
+    def system_get(self):
+        return self.get("system")
+
+    def user_get(self, fields=None):
+        return self.get(list_path("user", fields, USER_FIELDS))
+
+    def group_get(self, fields=None):
+        return self.get(list_path("group", fields, GROUP_FIELDS))
+
+    def scan_get(self, fields=None):
+        return self.get(list_path("scan", fields, SCAN_FIELDS))
+
+    def scan_results_get(self, start_time=None, fields=None, end_time=None):
+        return self.get(scan_results_path(start_time, fields, end_time))
+
+    def policy_get(self, fields=None):
+        return self.get(list_path("policy", fields, POLICY_FIELDS))
+
+    def credential_get(self, fields=None):
+        return self.get(list_path("credential", fields, CREDENTIAL_FIELDS))
+
+    def role_get(self, fields=None):
+        return self.get(list_path("role", fields, ROLE_FIELDS))
+
+    def audit_file_get(self, fields=None):
+        return self.get(list_path("auditFile", fields, AUDIT_FILE_FIELDS))
+
+    def asset_get(self, fields=None):
+        return self.get(list_path("asset", fields, ASSET_FIELDS))
+
+    def repository_get(self, fields=None):
+        return self.get(list_path("repository", fields, REPOSITORY_FIELDS))
+
+    def analysis_get(
+        self,
+        start_offset=0,
+        end_offset=1000,
+        filters=None,
+        tool="vulndetails",
+        source_type="cumulative",
+    ):
+        return self.post(
+            "analysis",
+            analysis_query(start_offset, end_offset, filters, tool, source_type),
+        )
+
+
+class TscApi(BaseTscApi):
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=443,
+        insecure=None,
+        timeout=None,
+        cache=None,
+        sessions=None,
+        on_timing=None,
+        relogin=False,
+        rate_limit=None,
+        max_in_flight=None,
+        retries=DEFAULT_RETRIES,
+    ):
         self.host = host
         self.port = port
+        self.cache = cache
+        self.sessions = sessions
+        self.username = None
+        self.password = None
+        self.access_key = None
+        self.secret_key = None
+        self.logged_in = False
+        self.session_resumed = False
+        # session which ends on Tenable.SC while it's used, e.g. by idle
+        # timeout of long running tsccm shell, is replaced with new login
+        self.relogin = relogin
+        self.logins = 0
+        self.login_lock = threading.Lock()
+        # on_timing(host, phase, started, finished, detail) is called after
+        # every phase with time.perf_counter() values, e.g. Timings.record
+        self.on_timing = on_timing
         if not insecure:
             self.verify = certstore.ca_bundle
         else:
             self.verify = False
             urllib3.disable_warnings()
 
-        self.sc = TenableSC(self.host, self.port, ssl_verify=self.verify)
+        self.timeout = timeout
+
+        # requests of all threads using this TscApi, e.g. prefetched pages,
+        # go through one scheduler, so they are limited per host
+        self.scheduler = Scheduler(
+            rate_limit,
+            max_in_flight,
+            retries,
+            retryable=retryable,
+            timed=self.timed,
+            answered=answered,
+        )
 
-    def login(self, sc_user, sc_pass):
-        self.sc.login(sc_user, sc_pass)
+        # TenableSC asks server for its version already when it's created, so
+        # with cache even that is postponed until first response which is not
+        # cached
+        self.sc = None
+        if self.cache is None:
+            self.connect()
+
+    def connect(self):
+        with self.timed("connect"):
+            # retries and backoff are left to scheduler
+            self.sc = self.scheduler.call(
+                TenableSC,
+                self.host,
+                port=self.port,
+                ssl_verify=self.verify,
+                timeout=self.timeout,
+                retries=0,
+                backoff=0,
+            )
+
+    def login(self, sc_user=None, sc_pass=None, access_key=None, secret_key=None):
+        self.credentials_set(sc_user, sc_pass, access_key, secret_key)
+        if self.cache is None:
+            self.login_check()
+
+    def login_check(self):
+        with self.login_lock:
+            if self.logged_in:
+                return
+            if self.sc is None:
+                self.connect()
+            with self.timed("login"):
+                if not self.session_resume():
+                    self.scheduler.call(
+                        self.sc.login,
+                        self.username,
+                        self.password,
+                        access_key=self.access_key,
+                        secret_key=self.secret_key,
+                    )
+            self.logged_in = True
+            self.logins += 1
+
+    def session_resume(self):
+        # API keys are sent with every request, there is no session to keep
+        if self.sessions is None or self.access_key:
+            return False
+
+        session = self.sessions.load(self.host, self.port, self.username)
+        if session is None:
+            return False
+
+        self.sc._session.headers.update(session["headers"])
+        self.sc._session.cookies.update(session["cookies"])
+        self.sc._auth_mech = "session"
+        self.session_resumed = True
+        return True
+
+    def session_drop(self, logins):
+        with self.login_lock:
+            # other thread may have already replaced the ended session
+            if self.logins == logins:
+                if self.session_resumed:
+                    self.sessions.delete(self.host, self.port, self.username)
+                for header in SESSION_HEADERS:
+                    self.sc._session.headers.pop(header, None)
+                self.sc._session.cookies.clear()
+                self.session_resumed = False
+                self.logged_in = False
+        self.login_check()
 
     def logout(self):
-        self.sc.logout()
+        if not self.logged_in:
+            return
 
-    def status_get(self):
-        response = self.sc.get("status")
-        response_json = response.json()
-        return response_json
+        with self.timed("logout"):
+            if self.sc._auth_mech == "keys":
+                # API keys are sent with every request, there is no session
+                pass
+            elif self.sessions is not None and self.sc._auth_mech == "session":
+                # session stays open on Tenable.SC to be resumed by next run
+                self.sessions.save(
+                    self.host,
+                    self.port,
+                    self.username,
+                    {
+                        header: self.sc._session.headers[header]
+                        for header in SESSION_HEADERS
+                        if header in self.sc._session.headers
+                    },
+                    self.sc._session.cookies.get_dict(),
+                )
+            else:
+                self.sc.logout()
+        self.logged_in = False
 
-    def system_get(self):
-        response = self.sc.get("system")
-        response_json = response.json()
-        return response_json
+    def send(self, method, path, **kwargs):
+        # only the request itself, waits of scheduler are timed on their own
+        with self.timed(method, path.split("?")[0]):
+            return getattr(self.sc, method)(path, **kwargs)
 
-    def user_get(self):
-        response = self.sc.get(
-            "user?fields=id,username,firstname,lastname,role,createdTime,modifiedTime,lastLogin,locked,failedLogins"
-        )
-        response_json = response.json()
-        return response_json
+    def response(self, method, path, **kwargs):
+        self.login_check()
+        logins = self.logins
+        try:
+            return self.scheduler.call(self.send, method, path, **kwargs)
+        except (UnauthorizedError, ForbiddenError):
+            if not self.relogin_allowed():
+                raise
+            self.session_drop(logins)
+            return self.scheduler.call(self.send, method, path, **kwargs)
 
-    def group_get(self):
-        response = self.sc.get(
-            "group?fields=id,name,createdTime,modifiedTime,userCount"
-        )
-        response_json = response.json()
+    def request(self, method, path, **kwargs):
+        response = self.response(method, path, **kwargs)
+        with self.timed("json", path.split("?")[0]):
+            return response.json()
+
+    def get(self, path):
+        response_json = self.cache_get(path)
+        if response_json is not None:
+            return response_json
+
+        response_json = self.request("get", path)
+        self.cache_set(path, response_json)
         return response_json
 
-    def scan_get(self):
-        response = self.sc.get(
-            "scan?fields=id,name,owner,createdTime,modifiedTime,schedule"
+    def post(self, path, payload):
+        # POST requests (e.g. analysis queries) are never cached
+        return self.request("post", path, json=payload)
+
+    def plugin_pages(self, page_size=1000, parallel=4, since=None, fields=None):
+        """
+        pages (lists) of plugins in order of id, while one page is processed
+        next parallel pages are already requested, Tenable.SC doesn't say how
+        many plugins there are, so pages end with first page which isn't full
+        """
+        calls = plugin_calls(page_size, since, fields)
+        for response in prefetched(self.plugin_get, calls, parallel):
+            page = response["response"]
+            yield page
+            if len(page) < page_size:
+                break
+
+    def scan_results_windows(
+        self, start_time, end_time, window, parallel=4, fields=None
+    ):
+        """
+        scan results from start_time to end_time requested in windows of
+        window seconds, up to parallel windows at a time, yielded in order of
+        windows and ids, each scan result only once
+        """
+        calls = window_calls(start_time, end_time, window, fields)
+        seen = set()
+        for response in prefetched(self.scan_results_get, calls, parallel):
+            yield from window_scan_results(response, seen)
+
+    def analysis_pages(
+        self,
+        filters=None,
+        page_size=1000,
+        parallel=4,
+        tool="vulndetails",
+        source_type="cumulative",
+        start=0,
+        end=None,
+    ):
+        """
+        pages (lists) of vulnerability analysis results from start until end
+        (all by default), while one page is processed next parallel pages are
+        already requested
+        """
+        first_end = analysis_first_end(start, page_size, end)
+        first = self.analysis_get(start, first_end, filters, tool, source_type)
+        yield first["response"]["results"]
+
+        calls = analysis_calls(
+            first, first_end, page_size, end, filters, tool, source_type
         )
-        response_json = response.json()
-        return response_json
+        for response in prefetched(self.analysis_get, calls, parallel):
+            yield response["response"]["results"]
+
+
+# statuses of responses which AsyncTscApi retries, like pyTenable does
+RETRY_STATUSES = (502, 503, 504)
+
+# connections kept open by httpx client shared by AsyncTscApi of all hosts,
+# and seconds to wait for response when timeout isn't given (as pyTenable)
+ASYNC_MAX_CONNECTIONS = 256
+ASYNC_TIMEOUT = 300
 
-    def scan_results_get(self):
-        response = self.sc.get(
-            "scanResult?fields=id,name,owner,createdTime,status,importStatus,totalIPs,scannedIPs,startTime,finishTime,scanDuration"
+
+class AsyncApiError(Exception):
+    """Tenable.SC answered request of AsyncTscApi with error status"""
+
+    def __init__(self, response):
+        self.response = response
+        self.code = response.status_code
+        try:
+            message = response.json().get("error_msg", "")
+        except ValueError:
+            message = response.text[:200]
+        super().__init__(
+            "[{}: {}] {} {}".format(
+                self.code,
+                response.request.method,
+                response.request.url.path,
+                message,
+            ).strip()
         )
-        response_json = response.json()
-        return response_json
 
-    def policy_get(self):
-        response = self.sc.get(
-            "policy?fields=id,name,owner,createdTime,modifiedTime,policyTemplate"
+
+class AsyncLoginError(AsyncApiError):
+    """Tenable.SC refused credentials given to AsyncTscApi"""
+
+
+class AsyncConnectionError(requests.exceptions.ConnectionError):
+    """
+    request of AsyncTscApi got no response, it's requests' ConnectionError,
+    so it's handled the same way as lost connection of TscApi
+    """
+
+
+def async_retryable(exception):
+    if isinstance(exception, AsyncApiError) and exception.code == 429:
+        return THROTTLED
+    if isinstance(exception, AsyncApiError) and exception.code in RETRY_STATUSES:
+        return FAILED
+    if isinstance(exception, AsyncConnectionError):
+        return FAILED
+    return None
+
+
+def async_answered(exception):
+    return isinstance(exception, AsyncApiError)
+
+
+def async_json(response):
+    """
+    JSON of response of AsyncTscApi, which is error if Tenable.SC says so in
+    error_code even with success status, as pyTenable checks it
+    """
+    response_json = response.json()
+    if isinstance(response_json, dict) and response_json.get("error_code"):
+        raise AsyncApiError(response)
+    return response_json
+
+
+def async_client(insecure=None, max_connections=ASYNC_MAX_CONNECTIONS):
+    """
+    httpx client which can be shared by AsyncTscApi of many hosts, cookies
+    aren't kept in it, every AsyncTscApi sends cookies of its own session
+    """
+    import http.cookiejar
+    import ssl
+
+    import httpx
+
+    return httpx.AsyncClient(
+        verify=(
+            False
+            if insecure
+            else ssl.create_default_context(cafile=certstore.ca_bundle)
+        ),
+        timeout=ASYNC_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        cookies=http.cookiejar.CookieJar(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+        ),
+    )
+
+
+async def async_prefetched(function, calls, parallel):
+    """prefetched() of coroutine function, calls ahead of the consumer run
+    as tasks of event loop and are cancelled if the consumer stops"""
+    import asyncio
+
+    calls = iter(calls)
+    pending = collections.deque(
+        asyncio.ensure_future(function(*arguments))
+        for arguments in itertools.islice(calls, parallel)
+    )
+    try:
+        while pending:
+            result = await pending.popleft()
+            for arguments in itertools.islice(calls, 1):
+                pending.append(asyncio.ensure_future(function(*arguments)))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class AsyncTscApi(BaseTscApi):
+    """
+    TscApi for asyncio, the same getters return awaitables and pages are
+    async generators, requests are sent by httpx client which AsyncTscApi of
+    many hosts can share (see async_client()), so one event loop drives
+    requests to all of them over one connection pool
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=443,
+        insecure=None,
+        timeout=None,
+        cache=None,
+        sessions=None,
+        on_timing=None,
+        relogin=False,
+        rate_limit=None,
+        max_in_flight=None,
+        retries=DEFAULT_RETRIES,
+        client=None,
+    ):
+        # asyncio is imported only when it's used, CLI starts without it
+        import asyncio
+
+        self.host = host
+        self.port = port
+        self.url = "https://{}:{}/rest/".format(host, port)
+        self.insecure = insecure
+        self.timeout = timeout
+        self.cache = cache
+        self.sessions = sessions
+        self.on_timing = on_timing
+        self.relogin = relogin
+        self.username = None
+        self.password = None
+        self.access_key = None
+        self.secret_key = None
+        self.logged_in = False
+        self.session_resumed = False
+        self.logins = 0
+        self.login_lock = asyncio.Lock()
+        # headers and cookies of session, or API keys, sent with every request
+        self.headers = {}
+        self.cookies = {}
+        # client of other hosts isn't closed on logout
+        self.client = client
+        self.own_client = client is None
+        self.scheduler = AsyncScheduler(
+            rate_limit,
+            max_in_flight,
+            retries,
+            retryable=async_retryable,
+            timed=self.timed,
+            answered=async_answered,
         )
-        response_json = response.json()
-        return response_json
 
-    def credential_get(self):
-        response = self.sc.get(
-            "credential?fields=id,name,type,typeFields,owner,createdTime,modifiedTime"
+    async def login(self, sc_user=None, sc_pass=None, access_key=None, secret_key=None):
+        self.credentials_set(sc_user, sc_pass, access_key, secret_key)
+        if self.cache is None:
+            await self.login_check()
+
+    async def login_check(self):
+        async with self.login_lock:
+            if self.logged_in:
+                return
+            if self.client is None:
+                self.client = async_client(self.insecure)
+            with self.timed("login"):
+                if self.access_key:
+                    self.headers = {
+                        "x-apikey": "accesskey={}; secretkey={};".format(
+                            self.access_key, self.secret_key
+                        )
+                    }
+                elif not self.session_resume():
+                    await self.session_create()
+            self.logged_in = True
+            self.logins += 1
+
+    async def session_create(self):
+        # the same login as pyTenable does for TscApi, other sessions of the
+        # user (e.g. browser or kept session) stay open
+        self.headers, self.cookies = {}, {}
+        try:
+            response = await self.scheduler.call(
+                self.send,
+                "post",
+                "token",
+                json={"username": self.username, "password": self.password},
+            )
+            token = async_json(response)["response"]["token"]
+        except AsyncApiError as e:
+            if e.code not in (401, 403):
+                raise
+            raise AsyncLoginError(e.response) from None
+        self.headers = {"X-SecurityCenter": str(token)}
+        self.cookies = dict(response.cookies)
+
+    def session_resume(self):
+        if self.sessions is None:
+            return False
+
+        session = self.sessions.load(self.host, self.port, self.username)
+        if session is None:
+            return False
+
+        self.headers = dict(session["headers"])
+        self.cookies = dict(session["cookies"])
+        self.session_resumed = True
+        return True
+
+    async def session_drop(self, logins):
+        async with self.login_lock:
+            # other coroutine may have already replaced the ended session
+            if self.logins == logins:
+                if self.session_resumed:
+                    self.sessions.delete(self.host, self.port, self.username)
+                self.headers, self.cookies = {}, {}
+                self.session_resumed = False
+                self.logged_in = False
+        await self.login_check()
+
+    async def logout(self):
+        if not self.logged_in:
+            return
+
+        with self.timed("logout"):
+            if self.access_key:
+                # API keys are sent with every request, there is no session
+                pass
+            elif self.sessions is not None:
+                # session stays open on Tenable.SC to be resumed by next run
+                self.sessions.save(
+                    self.host,
+                    self.port,
+                    self.username,
+                    {
+                        header: self.headers[header]
+                        for header in SESSION_HEADERS
+                        if header in self.headers
+                    },
+                    self.cookies,
+                )
+            else:
+                await self.send("delete", "token")
+        self.logged_in = False
+        if self.own_client:
+            await self.client.aclose()
+            self.client = None
+
+    async def send(self, method, path, headers=None, stream=False, **kwargs):
+        import asyncio
+
+        import httpx
+
+        headers = {**self.headers, **(headers or {})}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                "{}={}".format(name, value) for name, value in self.cookies.items()
+            )
+        request = self.client.build_request(
+            method.upper(),
+            self.url + path,
+            headers=headers,
+            timeout=self.timeout or httpx.USE_CLIENT_DEFAULT,
+            **kwargs,
         )
-        response_json = response.json()
+        # only the request itself, waits of scheduler are timed on their own
+        with self.timed(method, path.split("?")[0]):
+            try:
+                response = await self.client.send(request, stream=stream)
+                if response.status_code >= 400 and stream:
+                    await response.aread()
+            except httpx.TransportError as e:
+                raise AsyncConnectionError(
+                    "{} {}: {!r}".format(method.upper(), path, e)
+                ) from e
+
+        if response.status_code >= 400:
+            retry_after = response.headers.get("Retry-After", "")
+            if response.status_code == 429 and retry_after.isdigit():
+                await asyncio.sleep(min(int(retry_after), BACKOFF_MAX))
+            raise AsyncApiError(response)
+        return response
+
+    async def response(self, method, path, **kwargs):
+        await self.login_check()
+        logins = self.logins
+        try:
+            return await self.scheduler.call(self.send, method, path, **kwargs)
+        except AsyncApiError as e:
+            if e.code not in (401, 403) or not self.relogin_allowed():
+                raise
+            await self.session_drop(logins)
+            return await self.scheduler.call(self.send, method, path, **kwargs)
+
+    async def request(self, method, path, **kwargs):
+        response = await self.response(method, path, **kwargs)
+        with self.timed("json", path.split("?")[0]):
+            return async_json(response)
+
+    async def get(self, path):
+        response_json = self.cache_get(path)
+        if response_json is not None:
+            return response_json
+
+        response_json = await self.request("get", path)
+        self.cache_set(path, response_json)
         return response_json
 
-    def role_get(self):
-        response = self.sc.get(
-            "role?fields=id,name,createdTime,modifiedTime,organizationCounts"
+    async def post(self, path, payload):
+        # POST requests (e.g. analysis queries) are never cached
+        return await self.request("post", path, json=payload)
+
+    async def plugin_pages(self, page_size=1000, parallel=4, since=None, fields=None):
+        calls = plugin_calls(page_size, since, fields)
+        async for response in async_prefetched(self.plugin_get, calls, parallel):
+            page = response["response"]
+            yield page
+            if len(page) < page_size:
+                break
+
+    async def scan_results_windows(
+        self, start_time, end_time, window, parallel=4, fields=None
+    ):
+        calls = window_calls(start_time, end_time, window, fields)
+        seen = set()
+        async for response in async_prefetched(self.scan_results_get, calls, parallel):
+            for scan_result in window_scan_results(response, seen):
+                yield scan_result
+
+    async def analysis_pages(
+        self,
+        filters=None,
+        page_size=1000,
+        parallel=4,
+        tool="vulndetails",
+        source_type="cumulative",
+        start=0,
+        end=None,
+    ):
+        first_end = analysis_first_end(start, page_size, end)
+        first = await self.analysis_get(start, first_end, filters, tool, source_type)
+        yield first["response"]["results"]
+
+        calls = analysis_calls(
+            first, first_end, page_size, end, filters, tool, source_type
         )
-        response_json = response.json()
-        return response_json
+        async for response in async_prefetched(self.analysis_get, calls, parallel):
+            yield response["response"]["results"]
+
+
+class AsyncEngine:
+    """
+    event loop running in its own thread with httpx client shared by
+    AsyncTscApi of all hosts, which other threads use through
+    BlockingTscApi the same way as TscApi, e.g. run_on_addresses() of CLI
+    """
+
+    def __init__(self, insecure=None, max_connections=ASYNC_MAX_CONNECTIONS):
+        import asyncio
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.client = async_client(insecure, max_connections)
+
+    def run(self, coroutine):
+        """result of coroutine run on event loop, waited for in this thread"""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
 
-    def audit_file_get(self):
-        response = self.sc.get(
-            "auditFile?fields=id,name,createdTime,modifiedTime,filename,originalFilename"
+    def iterate(self, generator):
+        """items of async generator, each one awaited on event loop"""
+
+        async def step():
+            try:
+                return False, await generator.__anext__()
+            except StopAsyncIteration:
+                return True, None
+
+        try:
+            while True:
+                done, item = self.run(step())
+                if done:
+                    return
+                yield item
+        finally:
+            self.run(generator.aclose())
+
+    def tscapi(self, *args, **kwargs):
+        """BlockingTscApi of AsyncTscApi(*args, **kwargs) using shared client"""
+        return BlockingTscApi(AsyncTscApi(*args, client=self.client, **kwargs), self)
+
+    def close(self):
+        self.run(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class BlockingTscApi:
+    """
+    AsyncTscApi used from threads like TscApi, awaitables and async
+    generators returned by its methods run on event loop of AsyncEngine,
+    other attributes are those of AsyncTscApi
+    """
+
+    def __init__(self, sccon, engine):
+        object.__setattr__(self, "sccon", sccon)
+        object.__setattr__(self, "engine", engine)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.sccon, name)
+        if not inspect.ismethod(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if inspect.isasyncgen(result):
+                return self.engine.iterate(result)
+            if inspect.isawaitable(result):
+                return self.engine.run(result)
+            return result
+
+        return call
+
+    def __setattr__(self, name, value):
+        # e.g. cache and on_timing of connection of tsccm shell
+        setattr(self.sccon, name, value)
+
+    def scan_result_download(self, scan_result_id, offset=0):
+        return BlockingResponse(
+            self.engine.run(self.sccon.scan_result_download(scan_result_id, offset)),
+            self.engine,
         )
-        response_json = response.json()
-        return response_json
+
+
+class BlockingResponse:
+    """streamed httpx response read like streamed requests response"""
+
+    def __init__(self, response, engine):
+        self.response = response
+        self.engine = engine
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def iter_content(self, chunk_size=None):
+        import httpx
+
+        try:
+            yield from self.engine.iterate(self.response.aiter_bytes(chunk_size))
+        except httpx.TransportError as e:
+            raise AsyncConnectionError(repr(e)) from e
+
+    def close(self):
+        self.engine.run(self.response.aclose())
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import threading
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+def digest(record):
+    """hash of record which doesn't depend on order of its keys"""
+    return hashlib.sha1(
+        json.dumps(record, sort_keys=True, default=str).encode()
+    ).digest()
+
+
+class Changes:
+    """
+    records of every address compared by id with those of its previous
+    poll, hash and last version of every record is kept to report removal
+    """
+
+    def __init__(self, key="id"):
+        self.key = key
+        self.previous = {}
+        # changes found so far, poll which found none doesn't increase it
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def update(self, address, records):
+        """(event, record) of records added, changed or removed since previous
+        update of address, on first update all records are added"""
+        with self.lock:
+            previous = self.previous.get(address, {})
+
+        current = {}
+        changes = []
+        for record in records:
+            key = str(record[self.key])
+            hashed = digest(record)
+            current[key] = (hashed, record)
+            if key not in previous:
+                changes.append((ADDED, record))
+            elif previous[key][0] != hashed:
+                changes.append((CHANGED, record))
+        changes += [
+            (REMOVED, record)
+            for key, (_, record) in previous.items()
+            if key not in current
+        ]
+
+        with self.lock:
+            self.previous[address] = current
+            self.count += len(changes)
+        return changes
+
+
+class Interval:
+    """
+    seconds between polls, doubled after every poll without changes up to
+    maximum, back to minimum as soon as something changes
+    """
+
+    def __init__(self, minimum, maximum=None):
+        self.minimum = minimum
+        self.maximum = max(maximum or minimum, minimum)
+        self.seconds = minimum
+
+    def next(self, changed):
+        if changed:
+            self.seconds = self.minimum
+        else:
+            self.seconds = min(self.seconds * 2, self.maximum)
+        return self.seconds
@@ -1,10 +1,48 @@
-import requests
-from packaging import version
+import os
+import platform
+from contextlib import contextmanager
 from tsccm._version import __version__ as current_version
 from tsccm import __about__
 
 
+def cache_dir():
+    """directory for data kept between runs, TSCCM_CACHE_DIR overrides it"""
+    if os.environ.get("TSCCM_CACHE_DIR"):
+        return os.environ["TSCCM_CACHE_DIR"]
+
+    if platform.system() == "Windows":
+        base_dir = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif platform.system() == "Darwin":
+        base_dir = os.path.expanduser(os.path.join("~", "Library", "Caches"))
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+            os.path.join("~", ".cache")
+        )
+    return os.path.join(base_dir, __about__.__package_name__)
+
+
+@contextmanager
+def sqlite_connect(path, readonly=False):
+    """sqlite3 connection which commits or rolls back and closes on exit"""
+    import pathlib
+    import sqlite3
+
+    if readonly:
+        uri = pathlib.Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+        db = sqlite3.connect(uri, uri=True, timeout=30)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        db = sqlite3.connect(path, timeout=30)
+    try:
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
 def check_for_update():
+    import requests
+    from packaging import version
 
     PACKAGE_NAME = __about__.__package_name__
 